@@ -0,0 +1,4 @@
+import time
+
+# Reference point for reporting how long the worker takes to import and become ready
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,155 @@
+"""Hot/cold archival of ``assignments`` and ``audit_logs``.
+
+Returned and expired assignments whose last change (``updated_at``) is older
+than ``ARCHIVE_ASSIGNMENTS_AFTER_DAYS``, and audit rows older than
+``ARCHIVE_AUDIT_AFTER_DAYS``, move to ``assignments_archive`` and
+``audit_logs_archive`` with their ids. Each batch of ``ARCHIVE_BATCH_SIZE`` rows
+is its own transaction (``INSERT ... SELECT`` into the archive, ``DELETE`` by
+id, commit), with ``ARCHIVE_BATCH_PAUSE_SECONDS`` between batches, so row locks
+are short and other writers get in between. A batch moves entirely or not at
+all, so an interrupted run is just continued by the next one.
+
+Batches walk the primary key. Assignments are found through the status index.
+Audit rows are appended in id order, so that walk stops at the first row that
+is still too young instead of scanning the rest of the table.
+
+Moving a row doesn't change the record, so it stays out of the change journal
+(which has long dropped anything this old anyway).
+
+Read endpoints take ``include_archived=true``; :func:`with_archive` then gives
+them an alias of the model over ``hot UNION ALL archive`` that filters, sorts
+and pages like the model itself.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import DateTime, delete, func, insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from .config import settings
+from .metrics import Counter
+from .models import Assignment, AssignmentArchive, AssignmentStatus, AuditLog, AuditLogArchive
+
+ARCHIVES = {Assignment: AssignmentArchive, AuditLog: AuditLogArchive}
+DONE_STATUSES = (AssignmentStatus.RETURNED, AssignmentStatus.EXPIRED)
+
+archived_rows = Counter("archived_rows_total", "Rows moved to the archive tables", ("table",))
+
+_combined: dict[Any, Any] = {}
+
+
+def with_archive(model, include_archived: bool):
+    """``model``, or an alias of it that also reads the model's archive table."""
+    if not include_archived:
+        return model
+    if model not in _combined:
+        hot, cold = model.__table__, ARCHIVES[model].__table__
+        names = [c.name for c in hot.columns]
+        rows = union_all(select(*(hot.c[n] for n in names)), select(*(cold.c[n] for n in names)))
+        _combined[model] = aliased(model, rows.subquery(f"{hot.name}_all"))
+    return _combined[model]
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything is stored in UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+async def _move(session: AsyncSession, model, ids: list[int], now: datetime) -> int:
+    hot, cold = model.__table__, ARCHIVES[model].__table__
+    names = [c.name for c in hot.columns]
+    await session.execute(
+        insert(cold).from_select(
+            [*names, "archived_at"],
+            select(*(hot.c[n] for n in names), literal(now, DateTime(timezone=True))).where(hot.c.id.in_(ids)),
+        )
+    )
+    result = await session.execute(delete(hot).where(hot.c.id.in_(ids)).execution_options(journal=False))
+    await session.commit()
+    archived_rows.inc(hot.name, amount=result.rowcount)
+    return result.rowcount
+
+
+async def archive_assignments(
+    session: AsyncSession, older_than_days: int, batch_size: int, dry_run: bool = False
+) -> dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=older_than_days)
+    criteria = (Assignment.status.in_(DONE_STATUSES), Assignment.updated_at < cutoff)
+    if dry_run:
+        count = await session.scalar(select(func.count()).select_from(Assignment).where(*criteria))
+        return {"cutoff": cutoff, "rows": count or 0, "batches": 0}
+
+    moved = batches = last = 0
+    while True:
+        ids = (
+            await session.execute(
+                select(Assignment.id).where(*criteria, Assignment.id > last).order_by(Assignment.id).limit(batch_size)
+            )
+        ).scalars().all()
+        if not ids:
+            break
+        moved += await _move(session, Assignment, list(ids), now)
+        batches += 1
+        last = ids[-1]
+        await asyncio.sleep(settings.archive_batch_pause_seconds)
+    await session.commit()
+    return {"cutoff": cutoff, "rows": moved, "batches": batches}
+
+
+async def archive_audit_logs(
+    session: AsyncSession, older_than_days: int, batch_size: int, dry_run: bool = False
+) -> dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=older_than_days)
+    if dry_run:
+        count = await session.scalar(select(func.count()).select_from(AuditLog).where(AuditLog.created_at < cutoff))
+        return {"cutoff": cutoff, "rows": count or 0, "batches": 0}
+
+    moved = batches = last = 0
+    while True:
+        rows = (
+            await session.execute(
+                select(AuditLog.id, AuditLog.created_at).where(AuditLog.id > last).order_by(AuditLog.id).limit(batch_size)
+            )
+        ).all()
+        ids = []
+        for row in rows:
+            if _utc(row.created_at) >= cutoff:
+                break
+            ids.append(row.id)
+        if not ids:
+            break
+        moved += await _move(session, AuditLog, ids, now)
+        batches += 1
+        last = ids[-1]
+        if len(ids) < len(rows):
+            break
+        await asyncio.sleep(settings.archive_batch_pause_seconds)
+    await session.commit()
+    return {"cutoff": cutoff, "rows": moved, "batches": batches}
+
+
+async def run_archive(
+    session: AsyncSession,
+    dry_run: bool = False,
+    assignments_after_days: Optional[int] = None,
+    audit_after_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> dict[str, Any]:
+    """Move old rows to the archive tables; with ``dry_run`` only count what would move."""
+    batch_size = batch_size or settings.archive_batch_size
+    return {
+        "dry_run": dry_run,
+        "assignments": await archive_assignments(
+            session, assignments_after_days or settings.archive_assignments_after_days, batch_size, dry_run
+        ),
+        "audit_logs": await archive_audit_logs(
+            session, audit_after_days or settings.archive_audit_after_days, batch_size, dry_run
+        ),
+    }
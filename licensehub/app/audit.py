@@ -0,0 +1,222 @@
+"""Audit trail captured from ORM flushes and written in batches off the request path.
+
+Changes are collected per session in ``after_flush`` and handed to the
+:class:`AuditWriter` only once the transaction commits, so rolled-back work
+never shows up in ``audit_logs``. The writer flushes multi-row INSERTs when a
+batch fills up or the flush interval passes, and drains completely on shutdown.
+Bulk UPDATE/INSERT statements (expiration job, bulk import) bypass the unit of
+work and are not audited row by row.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import AuditLog, JobState, TableVersion
+
+logger = logging.getLogger(__name__)
+
+# Set by get_current_user for the duration of the request
+current_actor: ContextVar[Optional[int]] = ContextVar("audit_actor", default=None)
+
+_PENDING = "audit_pending"
+_SKIP_TABLES = {AuditLog.__tablename__, JobState.__tablename__, TableVersion.__tablename__}
+_SKIP_COLUMNS = {"created_at", "updated_at"}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _dumps(values: dict[str, Any]) -> Optional[str]:
+    if not values:
+        return None
+    return json.dumps({k: _plain(v) for k, v in values.items()}, separators=(",", ":"), sort_keys=True)
+
+
+def _columns(obj) -> list[str]:
+    return [c.key for c in inspect(obj).mapper.column_attrs if c.key not in _SKIP_COLUMNS]
+
+
+def _snapshot(obj) -> dict[str, Any]:
+    state = inspect(obj)
+    return {key: state.dict[key] for key in _columns(obj) if state.dict.get(key) is not None}
+
+
+def _diff(obj) -> tuple[dict[str, Any], dict[str, Any]]:
+    state = inspect(obj)
+    before: dict[str, Any] = {}
+    after: dict[str, Any] = {}
+    for key in _columns(obj):
+        history = state.attrs[key].history
+        if not history.has_changes():
+            continue
+        old = history.deleted[0] if history.deleted else None
+        new = history.added[0] if history.added else None
+        if old != new:
+            before[key] = old
+            after[key] = new
+    return before, after
+
+
+def _record(obj, action: str, before: Optional[dict], after: Optional[dict], actor, at) -> Optional[dict[str, Any]]:
+    table = obj.__table__.name
+    target_id = getattr(obj, "id", None)
+    if table in _SKIP_TABLES or not isinstance(target_id, int):
+        return None
+    return {
+        "actor_user_id": actor,
+        "action": action,
+        "target_type": table,
+        "target_id": target_id,
+        "before": _dumps(before or {}),
+        "after": _dumps(after or {}),
+        "created_at": at,
+        "updated_at": at,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _capture(session: Session, flush_context) -> None:
+    actor = current_actor.get()
+    now = datetime.now(timezone.utc)
+    records = []
+    for obj in session.new:
+        records.append(_record(obj, "create", None, _snapshot(obj), actor, now))
+    for obj in session.dirty:
+        before, after = _diff(obj)
+        if after:
+            records.append(_record(obj, "update", before, after, actor, now))
+    for obj in session.deleted:
+        records.append(_record(obj, "delete", _snapshot(obj), None, actor, now))
+    records = [r for r in records if r is not None]
+    if records:
+        session.info.setdefault(_PENDING, []).extend(records)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit(session: Session) -> None:
+    records = session.info.pop(_PENDING, None)
+    if records:
+        audit_writer.submit(records)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+class AuditWriter:
+    def __init__(self, batch_size: int, flush_interval: float, high_water: int, enabled: bool = True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_water = high_water
+        self.enabled = enabled
+        self._buffer: deque[dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed_flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def submit(self, records: list[dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+        self._buffer.extend(records)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        if len(self._buffer) >= self.high_water:
+            self._drained.clear()
+
+    async def wait_for_capacity(self, timeout: float = 5.0) -> None:
+        """Hold back new writes while the backlog is above the high-water mark."""
+        if len(self._buffer) < self.high_water:
+            return
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Audit log backlog, retry shortly", headers={"Retry-After": "5"})
+
+    async def flush(self) -> int:
+        from .db import engine
+
+        written = 0
+        async with self._lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(insert(AuditLog.__table__).values(batch))
+                except BaseException:
+                    # Put the batch back in order; nothing is dropped on a failed write
+                    self._buffer.extendleft(reversed(batch))
+                    self.failed_flushes += 1
+                    raise
+                written += len(batch)
+                if len(self._buffer) < self.high_water:
+                    self._drained.set()
+        self.written += written
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("audit flush failed; %d records kept for retry", len(self._buffer))
+                await asyncio.sleep(self.flush_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audit-writer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict[str, int]:
+        return {"queued": len(self._buffer), "written": self.written, "failed_flushes": self.failed_flushes}
+
+
+audit_writer = AuditWriter(
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval_seconds,
+    high_water=settings.audit_queue_high_water,
+    enabled=settings.audit_enabled,
+)
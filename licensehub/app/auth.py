@@ -1,19 +1,25 @@
 from __future__ import annotations
 
-import asyncio
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from ldap3 import ALL, Connection, Server, Tls
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
+from .audit import current_actor
+from .cache import TTLCache
 from .config import settings
 from .db import get_db_session
+from .directory_sync import directory_sync
+from .ldap_client import LdapUnavailable, get_ldap_client, sam_account_name
+from .metrics import observe_ldap
 from .models import User
 from .schemas import LoginRequest, TokenResponse, CurrentUserResponse
 
@@ -27,60 +33,70 @@ class TokenData(BaseModel):
     exp: int
 
 
-async def _ldap_bind_and_fetch(username: str, password: str) -> dict[str, Optional[str]]:
-    user_dn_value = settings.ad_user_dn_format.format(username=username)
-
-    server = Server(settings.ad_server_uri, get_info=ALL, use_ssl=settings.ad_use_ssl)
-
-    def sync_bind_and_search() -> dict[str, Optional[str]]:
-        with Connection(server, user=user_dn_value, password=password, auto_bind=True) as user_conn:
-            # If a service account is provided, use it for the search to get attributes
-            if settings.ad_service_account_dn and settings.ad_service_account_password:
-                with Connection(
-                    server,
-                    user=settings.ad_service_account_dn,
-                    password=settings.ad_service_account_password,
-                    auto_bind=True,
-                ) as svc_conn:
-                    svc_conn.search(
-                        search_base=settings.ad_base_dn,
-                        search_filter=f"(sAMAccountName={username.split('\\\\')[-1].split('@')[0]})",
-                        attributes=[
-                            "displayName",
-                            "mail",
-                            "department",
-                            "sAMAccountName",
-                        ],
-                        size_limit=1,
-                    )
-                    if not svc_conn.entries:
-                        return {}
-                    entry = svc_conn.entries[0]
-                    return {
-                        "sam": str(entry.sAMAccountName) if hasattr(entry, "sAMAccountName") else None,
-                        "display_name": str(entry.displayName) if hasattr(entry, "displayName") else None,
-                        "email": str(entry.mail) if hasattr(entry, "mail") else None,
-                        "department": str(entry.department) if hasattr(entry, "department") else None,
-                    }
-            else:
-                # Use the bound user for self lookup
-                user_conn.search(
-                    search_base=settings.ad_base_dn,
-                    search_filter=f"(sAMAccountName={username.split('\\\\')[-1].split('@')[0]})",
-                    attributes=["displayName", "mail", "department", "sAMAccountName"],
-                    size_limit=1,
-                )
-                if not user_conn.entries:
-                    return {}
-                entry = user_conn.entries[0]
-                return {
-                    "sam": str(entry.sAMAccountName) if hasattr(entry, "sAMAccountName") else None,
-                    "display_name": str(entry.displayName) if hasattr(entry, "displayName") else None,
-                    "email": str(entry.mail) if hasattr(entry, "mail") else None,
-                    "department": str(entry.department) if hasattr(entry, "department") else None,
-                }
-
-    return await asyncio.to_thread(sync_bind_and_search)
+# token sha256 -> subject, kept until the token's own exp
+token_cache = TTLCache(maxsize=settings.auth_token_cache_size)
+# sam_account_name -> User column values, short TTL so other workers' logins show up
+user_cache = TTLCache(maxsize=settings.auth_user_cache_size, ttl=settings.auth_user_cache_ttl_seconds)
+
+_USER_COLUMNS = (
+    "id",
+    "sam_account_name",
+    "display_name",
+    "email",
+    "department",
+    "is_admin",
+    "is_active",
+    "directory_synced_at",
+)
+
+
+def _cache_user(user: User) -> None:
+    user_cache.set(user.sam_account_name, {k: getattr(user, k) for k in _USER_COLUMNS})
+
+
+def _cached_user(subject: str) -> Optional[User]:
+    values = user_cache.get(subject)
+    if values is None:
+        return None
+    # Fresh detached instance per request so handlers never share a mutable object
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def _decode_subject(token: str) -> Optional[str]:
+    key = hashlib.sha256(token.encode()).digest()
+    subject = token_cache.get(key)
+    if subject is not None:
+        return subject
+    try:
+        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    exp = payload.get("exp")
+    if subject is not None and isinstance(exp, (int, float)):
+        token_cache.set(key, subject, ttl=exp - time.time())
+    return subject
+
+
+def auth_cache_stats() -> dict[str, dict[str, int]]:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+
+async def _ldap_bind_and_fetch(username: str, password: str, fetch_profile: bool = True) -> dict[str, Optional[str]]:
+    started = time.perf_counter()
+    try:
+        profile = await get_ldap_client().authenticate(username, password, fetch_profile=fetch_profile)
+    except LdapUnavailable:
+        observe_ldap(time.perf_counter() - started, "unavailable")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Directory service unavailable, try again shortly",
+            headers={"Retry-After": "2"},
+        )
+    observe_ldap(time.perf_counter() - started, "success" if profile else "rejected")
+    return profile
 
 
 def _create_access_token(subject: str) -> str:
@@ -91,6 +107,20 @@ def _create_access_token(subject: str) -> str:
 
 @router.post("/login", response_model=TokenResponse)
 async def login(data: LoginRequest, session: AsyncSession = Depends(get_db_session)) -> TokenResponse:
+    sam_name = sam_account_name(data.username)
+    user: Optional[User] = _cached_user(sam_name)
+    if user is None:
+        result = await session.execute(select(User).where(User.sam_account_name == sam_name))
+        user = result.scalar_one_or_none()
+
+    # Accounts the directory sync keeps current only need their password checked
+    if user is not None and user.is_active and user.directory_synced_at is not None:
+        if not await _ldap_bind_and_fetch(data.username, data.password, fetch_profile=False):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+        _cache_user(user)
+        return TokenResponse(access_token=_create_access_token(subject=user.sam_account_name))
+
+    # Not synced yet (or flagged inactive but AD just let them bind): fetch the profile and upsert
     profile = await _ldap_bind_and_fetch(data.username, data.password)
     if not profile or not profile.get("sam"):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
@@ -98,7 +128,7 @@ async def login(data: LoginRequest, session: AsyncSession = Depends(get_db_sessi
     sam_name = profile.get("sam") or data.username
 
     result = await session.execute(select(User).where(User.sam_account_name == sam_name))
-    user: Optional[User] = result.scalar_one_or_none()
+    user = result.scalar_one_or_none()
 
     if user is None:
         user = User(
@@ -107,14 +137,19 @@ async def login(data: LoginRequest, session: AsyncSession = Depends(get_db_sessi
             email=profile.get("email"),
             department=profile.get("department"),
             is_admin=False,
+            is_active=True,
         )
         session.add(user)
     else:
+        current_actor.set(user.id)
         user.display_name = profile.get("display_name")
         user.email = profile.get("email")
         user.department = profile.get("department")
+        user.is_active = True
 
     await session.commit()
+    # Replace, not just drop, the cached record: the caller's next request will need it
+    _cache_user(user)
 
     token = _create_access_token(subject=user.sam_account_name)
     return TokenResponse(access_token=token)
@@ -128,21 +163,57 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        subject: str | None = payload.get("sub")
-        if subject is None:
-            raise credentials_exception
-    except JWTError:
+    subject = _decode_subject(token)
+    if subject is None:
         raise credentials_exception
 
-    result = await session.execute(select(User).where(User.sam_account_name == subject))
-    user = result.scalar_one_or_none()
+    user = _cached_user(subject)
     if user is None:
+        result = await session.execute(select(User).where(User.sam_account_name == subject))
+        user = result.scalar_one_or_none()
+        if user is None:
+            raise credentials_exception
+        _cache_user(user)
+    if not user.is_active:
+        # Disabled or removed in AD since the token was issued
         raise credentials_exception
+    current_actor.set(user.id)
     return user
 
 
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return current_user
+
+
 @router.get("/me", response_model=CurrentUserResponse)
 async def me(current_user: User = Depends(get_current_user)) -> CurrentUserResponse:
-    return CurrentUserResponse.model_validate(current_user)
\ No newline at end of file
+    return CurrentUserResponse.model_validate(current_user)
+
+
+@router.get("/cache-stats")
+async def cache_stats() -> dict[str, dict[str, int]]:
+    return auth_cache_stats()
+
+
+@router.get("/ldap-stats")
+async def ldap_stats() -> dict:
+    return get_ldap_client().stats.snapshot()
+
+
+@router.post("/directory-sync")
+async def run_directory_sync(full: bool = False, current_user: User = Depends(get_current_admin)) -> dict:
+    try:
+        return await directory_sync.run(full=full)
+    except LdapUnavailable as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
+
+
+@router.get("/directory-sync")
+async def directory_sync_status() -> dict:
+    return {
+        "interval_seconds": directory_sync.interval,
+        "last_success": directory_sync.last_success,
+        "last_result": directory_sync.last_result,
+    }
\ No newline at end of file
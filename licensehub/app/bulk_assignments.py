@@ -0,0 +1,185 @@
+"""Assign or return many seats in one transaction.
+
+Licenses and users are checked with one query each, and the license rows are locked
+(``FOR UPDATE`` where the dialect has it) before any seat is counted. Seat counters
+move by one conditional UPDATE per distinct license, not per assignment. New
+assignments are flushed together (batched ``INSERT ... RETURNING`` on MariaDB; SQLite
+can't match RETURNING rows to parameters, so there it's one INSERT per row) and are
+audited like single creates. Returns are one multi-row UPDATE and, like the other
+bulk statements, are not audited row by row.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .models import LEASED_TYPES, Assignment, AssignmentStatus, License, User
+from .schemas import AssignmentCreate, BulkAssignmentOutcome, BulkAssignmentResult, BulkReturnRequest
+from .seats import claim_seats, release_seats
+
+
+def _seats_changed() -> HTTPException:
+    # Only reachable where the lock is a no-op (SQLite) and another writer got in between
+    return HTTPException(status_code=409, detail="Seat counts changed during the request; retry")
+
+
+def _finish(result: BulkAssignmentResult, outcomes: dict[int, BulkAssignmentOutcome]) -> BulkAssignmentResult:
+    result.results = [outcomes[row] for row in sorted(outcomes)]
+    result.succeeded = sum(1 for o in result.results if o.status in ("assigned", "returned"))
+    result.failed = sum(1 for o in result.results if o.status == "failed")
+    return result
+
+
+async def bulk_assign(
+    session: AsyncSession, items: list[AssignmentCreate], atomic: bool = False
+) -> BulkAssignmentResult:
+    """Create assignments for every item that fits; the caller commits."""
+    result = BulkAssignmentResult(received=len(items))
+    license_ids = {item.license_id for item in items}
+    user_ids = {item.assigned_to_user_id for item in items}
+
+    licenses = await session.execute(
+        select(License.id, License.license_type, License.seat_count, License.seats_in_use)
+        .where(License.id.in_(license_ids))
+        .with_for_update()
+    )
+    rows = licenses.all()
+    free = {row.id: row.seat_count - row.seats_in_use for row in rows}
+    leased = {row.id for row in rows if row.license_type in LEASED_TYPES}
+    known_users = set((await session.execute(select(User.id).where(User.id.in_(user_ids)))).scalars())
+
+    outcomes: dict[int, BulkAssignmentOutcome] = {}
+    granted: list[tuple[int, AssignmentCreate]] = []
+    for row, item in enumerate(items, start=1):
+        error: Optional[str] = None
+        if item.license_id not in free:
+            error = "License not found"
+        elif item.license_id in leased:
+            error = "License is checked out, not assigned"
+        elif item.assigned_to_user_id not in known_users:
+            error = "User not found"
+        elif free[item.license_id] <= 0:
+            error = "No seats available on this license"
+        if error:
+            outcomes[row] = BulkAssignmentOutcome(row=row, status="failed", license_id=item.license_id, error=error)
+            continue
+        free[item.license_id] -= 1
+        granted.append((row, item))
+
+    if atomic and len(granted) < len(items):
+        for row, item in granted:
+            outcomes[row] = BulkAssignmentOutcome(row=row, status="skipped", license_id=item.license_id)
+        return _finish(result, outcomes)
+
+    for license_id, count in Counter(item.license_id for _, item in granted).items():
+        if not await claim_seats(session, license_id, count):
+            raise _seats_changed()
+
+    created = [
+        Assignment(
+            license_id=item.license_id,
+            assigned_to_user_id=item.assigned_to_user_id,
+            assigned_machine=item.assigned_machine,
+            due_back_at=item.due_back_at,
+            status=AssignmentStatus.ASSIGNED,
+        )
+        for _, item in granted
+    ]
+    session.add_all(created)
+    await session.flush()
+    for (row, item), assignment in zip(granted, created):
+        outcomes[row] = BulkAssignmentOutcome(
+            row=row, status="assigned", assignment_id=assignment.id, license_id=item.license_id
+        )
+    return _finish(result, outcomes)
+
+
+async def _targets_by_filter(session: AsyncSession, request: BulkReturnRequest) -> list[tuple[int, int]]:
+    filters = [Assignment.status == AssignmentStatus.ASSIGNED]
+    if request.license_id is not None:
+        filters.append(Assignment.license_id == request.license_id)
+    if request.assigned_to_user_id is not None:
+        filters.append(Assignment.assigned_to_user_id == request.assigned_to_user_id)
+    if request.assigned_machine is not None:
+        filters.append(Assignment.assigned_machine == request.assigned_machine)
+    if len(filters) == 1:
+        raise HTTPException(status_code=400, detail="Pass ids or at least one filter")
+
+    limit = settings.bulk_assignment_max_items
+    rows = (
+        await session.execute(
+            select(Assignment.id, Assignment.license_id)
+            .where(*filters)
+            .order_by(Assignment.id)
+            .limit(limit + 1)
+            .with_for_update()
+        )
+    ).all()
+    if len(rows) > limit:
+        raise HTTPException(
+            status_code=400, detail=f"Filters match more than {limit} active assignments; narrow them or pass ids"
+        )
+    return [(row.id, row.license_id) for row in rows]
+
+
+async def bulk_return(session: AsyncSession, request: BulkReturnRequest) -> BulkAssignmentResult:
+    """Mark assignments returned and free their seats; the caller commits."""
+    outcomes: dict[int, BulkAssignmentOutcome] = {}
+    targets: list[tuple[int, int, int]] = []  # (row, assignment id, license id)
+
+    if request.ids is not None:
+        ids = list(dict.fromkeys(request.ids))
+        found = {
+            row.id: row
+            for row in (
+                await session.execute(
+                    select(Assignment.id, Assignment.license_id, Assignment.status)
+                    .where(Assignment.id.in_(ids))
+                    .with_for_update()
+                )
+            ).all()
+        }
+        for row, assignment_id in enumerate(ids, start=1):
+            current = found.get(assignment_id)
+            if current is None:
+                outcomes[row] = BulkAssignmentOutcome(
+                    row=row, status="failed", assignment_id=assignment_id, error="Assignment not found"
+                )
+            elif current.status != AssignmentStatus.ASSIGNED:
+                outcomes[row] = BulkAssignmentOutcome(
+                    row=row,
+                    status="failed",
+                    assignment_id=assignment_id,
+                    license_id=current.license_id,
+                    error=f"Assignment is {current.status.value}",
+                )
+            else:
+                targets.append((row, assignment_id, current.license_id))
+        result = BulkAssignmentResult(received=len(ids))
+    else:
+        matched = await _targets_by_filter(session, request)
+        targets = [(row, assignment_id, license_id) for row, (assignment_id, license_id) in enumerate(matched, start=1)]
+        result = BulkAssignmentResult(received=len(targets))
+
+    if targets:
+        moved = await session.execute(
+            update(Assignment)
+            .where(Assignment.id.in_([t[1] for t in targets]), Assignment.status == AssignmentStatus.ASSIGNED)
+            .values(status=AssignmentStatus.RETURNED)
+            .execution_options(synchronize_session=False)
+        )
+        if moved.rowcount != len(targets):
+            raise _seats_changed()
+        for license_id, count in Counter(t[2] for t in targets).items():
+            await release_seats(session, license_id, count)
+        for row, assignment_id, license_id in targets:
+            outcomes[row] = BulkAssignmentOutcome(
+                row=row, status="returned", assignment_id=assignment_id, license_id=license_id
+            )
+    return _finish(result, outcomes)
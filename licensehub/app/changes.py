@@ -0,0 +1,382 @@
+"""Change journal behind ``/changes`` and ``/changes/stream``.
+
+Every write to licenses, assignments and purchase orders appends
+``(entity, entity_id, op)`` rows to ``change_journal`` inside the writer's own
+transaction. ORM flushes are captured in ``after_flush``. Bulk UPDATE/DELETE
+statements are captured in ``do_orm_execute``, at the cost of one ``SELECT id``
+with the statement's WHERE clause. The license importer's upserts go through
+:func:`record_changes`. The journal id is the cursor.
+
+Payloads aren't stored in the journal. They are read from the source tables
+when entries are served, one query per entity type per page, so a consumer
+always gets a record as it is now (``data`` is null for deletes).
+
+An entry is only served once it is ``CHANGE_FEED_SETTLE_SECONDS`` old, so a
+transaction that took a journal id early and committed later isn't skipped by
+a cursor that already moved past it, as long as it commits within that window.
+One that commits later still (a long import batch, a stalled connection) can
+be skipped; a consumer that must not miss anything re-syncs from the list
+endpoints now and then, or the window is raised to cover its longest writes.
+
+For streaming, one :class:`ChangeFeed` task per process polls the journal and
+keeps recent events, payloads included, in memory. SSE subscribers read from
+that buffer, so they cost no queries unless they have to catch up from a cursor
+older than the buffer.
+
+The same task runs the maintenance. Entries older than
+``CHANGE_JOURNAL_RETENTION_HOURS`` are deleted, and a cursor from before them
+gets 410. Entries older than ``CHANGE_JOURNAL_COMPACT_AFTER_HOURS`` are
+compacted to the latest one per record.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, event, exists, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .job_state import get_state, set_state
+from .metrics import Gauge
+from .models import Assignment, ChangeEntry, License, PurchaseOrder
+from .projection import Projection, dumps
+from .schemas import AssignmentRead, LicenseRead, PurchaseOrderRead
+
+logger = logging.getLogger(__name__)
+
+JOURNAL = ChangeEntry.__table__
+FEEDS = {
+    "licenses": Projection(License, LicenseRead),
+    "assignments": Projection(Assignment, AssignmentRead),
+    "purchase_orders": Projection(PurchaseOrder, PurchaseOrderRead),
+}
+HORIZON_KEY = "change_journal_horizon"
+MAINTENANCE_BATCH_SIZE = 5000
+
+
+def _entry(entity: str, entity_id: int, op: str, at: datetime) -> dict[str, Any]:
+    return {"entity": entity, "entity_id": entity_id, "op": op, "created_at": at, "updated_at": at}
+
+
+@event.listens_for(Session, "after_flush")
+def _journal_flush(session: Session, flush_context) -> None:
+    now = datetime.now(timezone.utc)
+    entries = []
+    for op, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            entity = obj.__table__.name
+            if entity not in FEEDS:
+                continue
+            if op == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            entries.append(_entry(entity, obj.id, op, now))
+    if entries:
+        session.connection().execute(insert(JOURNAL), entries)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _journal_bulk(state) -> Any:
+    # Bulk UPDATE/DELETE bypass the flush; pass execution_options(journal=False) to opt out
+    if not (state.is_update or state.is_delete):
+        return None
+    table = getattr(state.statement, "table", None)
+    if table is None or table.name not in FEEDS or not state.execution_options.get("journal", True):
+        return None
+    target = select(table.c.id)
+    if state.statement.whereclause is not None:
+        target = target.where(state.statement.whereclause)
+    ids = state.session.execute(target).scalars().all()
+    result = state.invoke_statement()
+    if ids:
+        now = datetime.now(timezone.utc)
+        op = "update" if state.is_update else "delete"
+        state.session.connection().execute(insert(JOURNAL), [_entry(table.name, i, op, now) for i in ids])
+    return result
+
+
+async def record_changes(session: AsyncSession, entity: str, changes: dict[int, str]) -> None:
+    """Journal writes the session events can't see (Core INSERTs); ``changes`` maps id -> op."""
+    if not changes:
+        return
+    now = datetime.now(timezone.utc)
+    conn = await session.connection()
+    await conn.execute(insert(JOURNAL), [_entry(entity, i, op, now) for i, op in changes.items()])
+
+
+def parse_entities(value: Optional[str]) -> Optional[set[str]]:
+    if not value:
+        return None
+    wanted = {e.strip() for e in value.split(",") if e.strip()}
+    unknown = wanted - FEEDS.keys()
+    if unknown:
+        detail = f"Unknown entity {', '.join(sorted(unknown))}. Allowed: {', '.join(FEEDS)}"
+        raise HTTPException(status_code=400, detail=detail)
+    return wanted
+
+
+async def check_horizon(session: AsyncSession, since: int) -> None:
+    horizon = int(await get_state(session, HORIZON_KEY) or 0)
+    if since < horizon:
+        raise HTTPException(
+            status_code=410,
+            detail=f"Cursor {since} is older than the journal's retention; re-sync from the list endpoints",
+        )
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything is stored in UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+async def _payloads(session: AsyncSession, rows) -> dict[tuple[str, int], dict[str, Any]]:
+    wanted: dict[str, set[int]] = {}
+    for row in rows:
+        if row.op != "delete":
+            wanted.setdefault(row.entity, set()).add(row.entity_id)
+    payloads = {}
+    for entity, ids in wanted.items():
+        projection = FEEDS[entity]
+        names = list(projection.columns)
+        result = await session.execute(
+            select(*projection.columns.values()).where(projection.model.id.in_(ids))
+        )
+        for item in projection.rows_to_dicts(result.all(), names):
+            payloads[(entity, item["id"])] = item
+    return payloads
+
+
+async def read_changes(
+    session: AsyncSession, since: int, limit: int, entities: Optional[set[str]] = None
+) -> tuple[list[dict[str, Any]], int, bool]:
+    """Settled entries after ``since`` with current payloads: ``(events, cursor, has_more)``."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.change_feed_settle_seconds)
+    stmt = select(JOURNAL.c.id, JOURNAL.c.entity, JOURNAL.c.entity_id, JOURNAL.c.op, JOURNAL.c.created_at).where(
+        JOURNAL.c.id > since, JOURNAL.c.created_at <= cutoff
+    )
+    if entities:
+        stmt = stmt.where(JOURNAL.c.entity.in_(entities))
+    rows = (await session.execute(stmt.order_by(JOURNAL.c.id).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    payloads = await _payloads(session, rows)
+    events = [
+        {
+            "cursor": row.id,
+            "entity": row.entity,
+            "id": row.entity_id,
+            "op": row.op,
+            "at": _utc(row.created_at),
+            "data": payloads.get((row.entity, row.entity_id)),
+        }
+        for row in rows
+    ]
+    return events, (rows[-1].id if rows else since), has_more
+
+
+async def head_cursor(session: AsyncSession) -> int:
+    """The newest settled entry: where a consumer that just loaded the lists starts following."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.change_feed_settle_seconds)
+    return await session.scalar(select(func.max(JOURNAL.c.id)).where(JOURNAL.c.created_at <= cutoff)) or 0
+
+
+async def compact_journal(session: AsyncSession, now: Optional[datetime] = None) -> dict[str, int]:
+    """Apply retention, then drop superseded entries; one transaction per batch."""
+    now = now or datetime.now(timezone.utc)
+    horizon = int(await get_state(session, HORIZON_KEY) or 0)
+
+    expired = 0
+    cutoff = now - timedelta(hours=settings.change_journal_retention_hours)
+    while True:
+        ids = list(
+            (
+                await session.execute(
+                    select(JOURNAL.c.id)
+                    .where(JOURNAL.c.created_at < cutoff)
+                    .order_by(JOURNAL.c.id)
+                    .limit(MAINTENANCE_BATCH_SIZE)
+                )
+            ).scalars()
+        )
+        if not ids:
+            break
+        await session.execute(delete(JOURNAL).where(JOURNAL.c.id.in_(ids)))
+        # Consumers behind the horizon have lost entries for good and must re-sync
+        horizon = max(horizon, ids[-1])
+        await set_state(session, HORIZON_KEY, str(horizon))
+        await session.commit()
+        expired += len(ids)
+
+    compacted = 0
+    cutoff = now - timedelta(hours=settings.change_journal_compact_after_hours)
+    later = JOURNAL.alias("later")
+    superseded = exists().where(
+        later.c.entity == JOURNAL.c.entity, later.c.entity_id == JOURNAL.c.entity_id, later.c.id > JOURNAL.c.id
+    )
+    while True:
+        # Ids first: MariaDB can't DELETE from a table its own subquery reads
+        ids = list(
+            (
+                await session.execute(
+                    select(JOURNAL.c.id)
+                    .where(JOURNAL.c.created_at < cutoff, superseded)
+                    .order_by(JOURNAL.c.id)
+                    .limit(MAINTENANCE_BATCH_SIZE)
+                )
+            ).scalars()
+        )
+        if not ids:
+            break
+        await session.execute(delete(JOURNAL).where(JOURNAL.c.id.in_(ids)))
+        await session.commit()
+        compacted += len(ids)
+    return {"expired": expired, "compacted": compacted, "horizon": horizon}
+
+
+def _sse(event: dict[str, Any]) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (event["cursor"], dumps(event))
+
+
+class ChangeFeed:
+    def __init__(self, poll_interval: float, buffer_size: int, keepalive: float, maintenance_interval: float):
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.keepalive = keepalive
+        self.maintenance_interval = maintenance_interval
+        # Sorted by cursor; holds every event after _floor
+        self._events: list[dict[str, Any]] = []
+        self._cursors: list[int] = []
+        self._floor = 0
+        self._head = 0
+        self._changed = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self._last_maintenance = 0.0
+        self.subscribers = 0
+
+    async def poll(self) -> int:
+        from .db import AsyncSessionLocal
+
+        added = 0
+        async with AsyncSessionLocal() as session:
+            while True:
+                events, cursor, has_more = await read_changes(session, self._head, settings.max_page_size)
+                self._events.extend(events)
+                self._cursors.extend(e["cursor"] for e in events)
+                self._head = cursor
+                added += len(events)
+                if not has_more:
+                    break
+        excess = len(self._events) - self.buffer_size
+        if excess > 0:
+            self._floor = self._cursors[excess - 1]
+            del self._events[:excess]
+            del self._cursors[:excess]
+        if added:
+            self._wake()
+        return added
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def maintain(self) -> dict[str, int]:
+        from .db import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as session:
+            return await compact_journal(session)
+
+    async def subscribe(self, cursor: Optional[int], entities: Optional[set[str]]) -> AsyncIterator[bytes]:
+        """SSE frames from ``cursor`` on; only a cursor older than the buffer costs queries."""
+        from .db import AsyncSessionLocal
+
+        self.subscribers += 1
+        try:
+            if cursor is None:
+                cursor = self._head
+            while not self._closing:
+                if cursor < self._floor:
+                    async with AsyncSessionLocal() as session:
+                        await check_horizon(session, cursor)
+                        events, cursor, has_more = await read_changes(
+                            session, cursor, settings.max_page_size, entities
+                        )
+                    if not has_more:
+                        cursor = max(cursor, self._floor)
+                    for event in events:
+                        yield _sse(event)
+                    continue
+
+                changed = self._changed
+                start = bisect.bisect_right(self._cursors, cursor)
+                for event in self._events[start:]:
+                    if entities is None or event["entity"] in entities:
+                        yield _sse(event)
+                cursor = max(cursor, self._head)
+                try:
+                    await asyncio.wait_for(changed.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        except HTTPException as exc:
+            yield b"event: reset\ndata: %s\n\n" % dumps({"detail": exc.detail})
+        finally:
+            self.subscribers -= 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("change feed poll failed")
+            if time.monotonic() - self._last_maintenance >= self.maintenance_interval:
+                self._last_maintenance = time.monotonic()
+                try:
+                    result = await self.maintain()
+                    if result["expired"] or result["compacted"]:
+                        logger.info("change journal maintenance: %s", result)
+                except Exception:
+                    logger.exception("change journal maintenance failed")
+
+    async def start(self) -> None:
+        from .db import AsyncSessionLocal
+
+        if self._task is not None:
+            return
+        # Subscribers start from now; history is read from the journal on demand
+        async with AsyncSessionLocal() as session:
+            self._head = self._floor = await head_cursor(session)
+        self._closing = False
+        self._last_maintenance = time.monotonic()
+        self._task = asyncio.create_task(self._run(), name="change-feed")
+
+    async def stop(self) -> None:
+        self._closing = True
+        self._wake()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict[str, int]:
+        return {"subscribers": self.subscribers, "buffered": len(self._events), "head": self._head}
+
+
+change_feed = ChangeFeed(
+    poll_interval=settings.change_feed_poll_seconds,
+    buffer_size=settings.change_feed_buffer_size,
+    keepalive=settings.change_feed_keepalive_seconds,
+    maintenance_interval=settings.change_journal_maintenance_seconds,
+)
+
+Gauge("change_feed_subscribers", "Open /changes/stream connections", callback=lambda: change_feed.subscribers)
@@ -0,0 +1,129 @@
+"""Administrative commands.
+
+Run from the project root so `.env` is picked up, e.g.::
+
+    python -m app.cli import-licenses trueup.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from .archive import run_archive
+from .changes import compact_journal
+from .compliance import reconcile_file
+from .db import AsyncSessionLocal, engine
+from .directory_sync import directory_sync
+from .importer import csv_rows, import_licenses
+from .search import rebuild_search_index
+from .seats import reconcile_seat_counters
+
+
+async def _import_licenses(args: argparse.Namespace) -> dict:
+    path = Path(args.path)
+    fmt = args.format or ("json" if path.suffix.lower() == ".json" else "csv")
+    async with AsyncSessionLocal() as session:
+        if fmt == "json":
+            rows = json.loads(path.read_text(encoding="utf-8-sig"))
+            if not isinstance(rows, list):
+                raise SystemExit("Expected a JSON array of licenses")
+            result = await import_licenses(session, rows, batch_size=args.batch_size)
+        else:
+            with path.open("rb") as fh:
+                result = await import_licenses(session, csv_rows(fh), batch_size=args.batch_size)
+    return result.model_dump()
+
+
+async def _reconcile_seats(args: argparse.Namespace) -> dict:
+    async with AsyncSessionLocal() as session:
+        return await reconcile_seat_counters(session)
+
+
+async def _compact_changes(args: argparse.Namespace) -> dict:
+    async with AsyncSessionLocal() as session:
+        return await compact_journal(session)
+
+
+async def _reconcile_inventory(args: argparse.Namespace) -> dict:
+    path = Path(args.path)
+    fmt = args.format or ("ndjson" if path.suffix.lower() in (".ndjson", ".jsonl") else "csv")
+
+    def progress(run) -> None:
+        print(f"{run.status}: {run.rows_read} rows, {run.rows_matched} matched", file=sys.stderr)
+
+    run = await reconcile_file(str(path), fmt, on_progress=progress)
+    return {"run_id": run.id, "status": run.status, "rows_read": run.rows_read, "rows_unmatched": run.rows_unmatched}
+
+
+async def _sync_directory(args: argparse.Namespace) -> dict:
+    return await directory_sync.run(full=args.full)
+
+
+async def _archive(args: argparse.Namespace) -> dict:
+    async with AsyncSessionLocal() as session:
+        return await run_archive(
+            session,
+            dry_run=args.dry_run,
+            assignments_after_days=args.assignments_after_days,
+            audit_after_days=args.audit_after_days,
+            batch_size=args.batch_size,
+        )
+
+
+async def _reindex_search(args: argparse.Namespace) -> dict:
+    if engine.dialect.name != "sqlite":
+        return {"indexed": None, "detail": "MariaDB FULLTEXT indexes are maintained by the server"}
+    async with engine.begin() as conn:
+        return {"indexed": await conn.run_sync(rebuild_search_index)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import-licenses", help="Bulk upsert licenses from a CSV or JSON file")
+    p.add_argument("path")
+    p.add_argument("--format", choices=["csv", "json"], help="Defaults to the file extension")
+    p.add_argument("--batch-size", type=int, default=None)
+    p.set_defaults(func=_import_licenses)
+
+    p = sub.add_parser("reconcile-seats", help="Rebuild licenses.seats_in_use from active assignments")
+    p.set_defaults(func=_reconcile_seats)
+
+    p = sub.add_parser("reindex-search", help="Rebuild the SQLite full-text index from the source tables")
+    p.set_defaults(func=_reindex_search)
+
+    p = sub.add_parser("compact-changes", help="Apply retention and compaction to the change journal now")
+    p.set_defaults(func=_compact_changes)
+
+    p = sub.add_parser("archive", help="Move old returned/expired assignments and audit rows to the archive tables")
+    p.add_argument("--dry-run", action="store_true", help="Only count the rows that would move")
+    p.add_argument("--assignments-after-days", type=int, default=None)
+    p.add_argument("--audit-after-days", type=int, default=None)
+    p.add_argument("--batch-size", type=int, default=None)
+    p.set_defaults(func=_archive)
+
+    p = sub.add_parser("reconcile-inventory", help="Compare a machine inventory with licenses and assignments")
+    p.add_argument("path")
+    p.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    p.set_defaults(func=_reconcile_inventory)
+
+    p = sub.add_parser("sync-directory", help="Upsert users changed in AD since the last sync")
+    p.add_argument("--full", action="store_true", help="Walk the whole directory and deactivate users not found")
+    p.set_defaults(func=_sync_directory)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    result = asyncio.run(args.func(args))
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
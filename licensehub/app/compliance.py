@@ -0,0 +1,409 @@
+"""Inventory reconciliation: installs against licenses and active assignments.
+
+An inventory export has one row per (machine, user, product, version); only
+``machine`` and ``product`` are used. It is read as CSV or NDJSON on a worker
+thread, ``COMPLIANCE_CHUNK_ROWS`` rows at a time, and the run's counters are
+committed after every chunk so ``GET /compliance/runs/{id}`` shows progress.
+
+Product names are normalized (case, punctuation, version numbers and
+architecture tags dropped) and matched against ``SoftwareProduct`` names, with
+and without the vendor's name in front. The longest leading run of words that
+names a product wins, so "Microsoft Visio Professional 2021 (x64)" finds "Visio
+Professional 2021" from vendor "Microsoft". Matches are cached per raw name.
+
+Memory stays bounded by aggregating in two passes. Pass one appends each
+matched row's ``(product_id, machine)`` to one of ``COMPLIANCE_PARTITIONS``
+spill files, picked by a hash of the machine. All rows of a machine land in the
+same partition, so pass two counts distinct installs one partition at a time
+and checks them against the active assignments hashed the same way. Only the
+product catalogue, the active assignments and one partition's pairs are held
+at once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import date, datetime, timezone
+from itertools import islice
+from typing import IO, Callable, Iterable, Iterator, Optional
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .config import settings
+from .models import (
+    Assignment,
+    AssignmentStatus,
+    ComplianceReportRow,
+    ComplianceRun,
+    ComplianceStaleAssignment,
+    License,
+    SoftwareProduct,
+    Vendor,
+)
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_FORMATS = ("csv", "ndjson")
+MATCH_CACHE_SIZE = 200000
+MAX_UNMATCHED_NAMES = 10000
+REPORTED_UNMATCHED_NAMES = 50
+WRITE_BATCH_SIZE = 1000
+
+_NOISE = re.compile(r"\b(?:v?\d+(?:\.\d+)+|x64|x86|amd64|arm64|(?:32|64)[- ]?bit)\b")
+_WORDS = re.compile(r"[0-9a-z+#]+")
+
+InventoryRow = Optional[tuple[str, str]]  # (machine, product); None for a row that can't be read
+Progress = Callable[[ComplianceRun], None]
+
+_tasks: set[asyncio.Task] = set()
+
+
+def normalize_product(name: str) -> str:
+    return " ".join(_WORDS.findall(_NOISE.sub(" ", name.casefold())))
+
+
+def machine_key(name: str) -> str:
+    """Host names compare case-insensitively and without their DNS suffix; IPv4 addresses stay whole."""
+    name = "".join(name.split()).casefold()
+    if name.replace(".", "").isdigit():
+        return name
+    return name.split(".", 1)[0]
+
+
+def _columns(header: list[str]) -> tuple[int, int]:
+    names = [h.strip().casefold() for h in header]
+    if "machine" not in names or "product" not in names:
+        raise ValueError("Inventory needs 'machine' and 'product' columns")
+    return names.index("machine"), names.index("product")
+
+
+def csv_inventory(stream: IO[bytes]) -> Iterator[InventoryRow]:
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    header = next(reader, None)
+    if header is None:
+        return
+    machine_col, product_col = _columns(header)
+    width = max(machine_col, product_col)
+    for row in reader:
+        yield (row[machine_col], row[product_col]) if len(row) > width else None
+
+
+def ndjson_inventory(stream: IO[bytes]) -> Iterator[InventoryRow]:
+    for line in io.TextIOWrapper(stream, encoding="utf-8-sig"):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield str(record["machine"]), str(record["product"])
+        except (ValueError, KeyError, TypeError):
+            yield None
+
+
+def inventory_rows(stream: IO[bytes], fmt: str) -> Iterator[InventoryRow]:
+    return csv_inventory(stream) if fmt == "csv" else ndjson_inventory(stream)
+
+
+class ProductMatcher:
+    """Maps inventory product names to ``SoftwareProduct`` ids."""
+
+    def __init__(self, products: Iterable[tuple[int, str, Optional[str]]]):
+        self.by_name: dict[str, int] = {}
+        for product_id, name, vendor in products:
+            for variant in (name, f"{vendor} {name}" if vendor else None):
+                key = normalize_product(variant) if variant else ""
+                if key:
+                    self.by_name.setdefault(key, product_id)
+        self._cache: dict[str, Optional[int]] = {}
+
+    def match(self, raw: str) -> Optional[int]:
+        try:
+            return self._cache[raw]
+        except KeyError:
+            pass
+        words = normalize_product(raw).split()
+        product_id = None
+        for end in range(len(words), 0, -1):
+            product_id = self.by_name.get(" ".join(words[:end]))
+            if product_id is not None:
+                break
+        if len(self._cache) < MATCH_CACHE_SIZE:
+            self._cache[raw] = product_id
+        return product_id
+
+
+class _Spill:
+    """Partition files of ``product_id<TAB>machine`` lines, partitioned by machine."""
+
+    def __init__(self, directory: str, partitions: int):
+        self.paths = [os.path.join(directory, f"part-{i:04d}") for i in range(partitions)]
+        self._files = [open(path, "w", encoding="utf-8", newline="\n") for path in self.paths]
+
+    def partition(self, machine: str) -> int:
+        return hash(machine) % len(self.paths)
+
+    def write(self, product_id: int, machine: str) -> None:
+        self._files[self.partition(machine)].write(f"{product_id}\t{machine}\n")
+
+    def close(self) -> None:
+        for fh in self._files:
+            fh.close()
+
+    def read(self, index: int) -> set[tuple[int, str]]:
+        pairs: set[tuple[int, str]] = set()
+        with open(self.paths[index], encoding="utf-8") as fh:
+            for line in fh:
+                product_id, machine = line.rstrip("\n").split("\t", 1)
+                pairs.add((int(product_id), machine))
+        return pairs
+
+
+class _Ingest:
+    """Pass one: match rows to products and spill the pairs."""
+
+    def __init__(self, matcher: ProductMatcher, spill: _Spill):
+        self.matcher = matcher
+        self.spill = spill
+        self.rows_read = 0
+        self.rows_matched = 0
+        self.rows_unmatched = 0
+        self.rows_invalid = 0
+        self.unmatched: Counter[str] = Counter()
+
+    def consume(self, rows: Iterator[InventoryRow], limit: int) -> int:
+        """Read up to ``limit`` rows; returns how many were read, 0 at the end."""
+        # Pairs repeat within a chunk (one row per user or version); don't spill them twice
+        spilled: set[tuple[int, str]] = set()
+        count = 0
+        for row in islice(rows, limit):
+            count += 1
+            machine, product = row if row is not None else ("", "")
+            machine, product = machine.strip(), product.strip()
+            if not machine or not product:
+                self.rows_invalid += 1
+                continue
+            product_id = self.matcher.match(product)
+            if product_id is None:
+                self.rows_unmatched += 1
+                if product in self.unmatched or len(self.unmatched) < MAX_UNMATCHED_NAMES:
+                    self.unmatched[product] += 1
+                continue
+            self.rows_matched += 1
+            pair = (product_id, machine_key(machine))
+            if pair not in spilled:
+                spilled.add(pair)
+                self.spill.write(*pair)
+        self.rows_read += count
+        return count
+
+
+def _aggregate(
+    spill: _Spill, index: int, assignments: list[tuple[int, int, str]]
+) -> tuple[Counter[int], Counter[int], list[tuple[int, int, str]]]:
+    """Pass two for one partition: installs and unassigned installs per product, and stale assignments."""
+    installs = spill.read(index)
+    assigned = {(product_id, machine) for _, product_id, machine in assignments}
+    counts = Counter(product_id for product_id, _ in installs)
+    unassigned = Counter(product_id for product_id, machine in installs if (product_id, machine) not in assigned)
+    stale = [a for a in assignments if (a[1], a[2]) not in installs]
+    return counts, unassigned, stale
+
+
+async def _load_matcher(session: AsyncSession) -> ProductMatcher:
+    rows = await session.execute(
+        select(SoftwareProduct.id, SoftwareProduct.name, Vendor.name).outerjoin(
+            Vendor, SoftwareProduct.vendor_id == Vendor.id
+        )
+    )
+    return ProductMatcher(rows.tuples())
+
+
+async def _seats_by_product(session: AsyncSession) -> dict[int, tuple[int, int]]:
+    rows = await session.execute(
+        select(License.product_id, func.sum(License.seat_count), func.sum(License.seats_in_use))
+        .where(or_(License.end_date.is_(None), License.end_date >= date.today()))
+        .group_by(License.product_id)
+    )
+    return {product_id: (int(seats or 0), int(in_use or 0)) for product_id, seats, in_use in rows.all()}
+
+
+async def _active_assignments(session: AsyncSession) -> list[tuple[int, int, str]]:
+    rows = await session.execute(
+        select(Assignment.id, License.product_id, Assignment.assigned_machine)
+        .join(License, Assignment.license_id == License.id)
+        .where(Assignment.status == AssignmentStatus.ASSIGNED, Assignment.assigned_machine.is_not(None))
+    )
+    return [(assignment_id, product_id, machine_key(machine)) for assignment_id, product_id, machine in rows.all()]
+
+
+async def _progress(session: AsyncSession, run: ComplianceRun, ingest: _Ingest, on_progress: Optional[Progress]) -> None:
+    counters = {
+        "rows_read": ingest.rows_read,
+        "rows_matched": ingest.rows_matched,
+        "rows_unmatched": ingest.rows_unmatched,
+        "rows_invalid": ingest.rows_invalid,
+    }
+    # Core UPDATE: the counters move every chunk, and the ORM would audit each move
+    table = ComplianceRun.__table__
+    await session.execute(update(table).where(table.c.id == run.id).values(**counters))
+    for name, value in counters.items():
+        set_committed_value(run, name, value)
+    await session.commit()
+    if on_progress is not None:
+        on_progress(run)
+
+
+async def _write_report(
+    session: AsyncSession,
+    run: ComplianceRun,
+    installs: Counter[int],
+    unassigned: Counter[int],
+    stale: list[tuple[int, int, str]],
+    seats: dict[int, tuple[int, int]],
+) -> None:
+    stale_counts = Counter(product_id for _, product_id, _ in stale)
+    report = []
+    for product_id in sorted(installs.keys() | seats.keys()):
+        seat_count, assigned = seats.get(product_id, (0, 0))
+        installed = installs.get(product_id, 0)
+        report.append(
+            {
+                "run_id": run.id,
+                "product_id": product_id,
+                "installs": installed,
+                "seats": seat_count,
+                "assigned": assigned,
+                "over_deployed": max(installed - seat_count, 0),
+                "unused_seats": max(seat_count - installed, 0),
+                "unassigned_installs": unassigned.get(product_id, 0),
+                "stale_assignments": stale_counts.get(product_id, 0),
+            }
+        )
+    listed = [
+        {"run_id": run.id, "assignment_id": assignment_id, "product_id": product_id, "machine": machine}
+        for assignment_id, product_id, machine in sorted(stale)
+    ]
+    for table, rows in ((ComplianceReportRow.__table__, report), (ComplianceStaleAssignment.__table__, listed)):
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            await session.execute(insert(table), rows[start : start + WRITE_BATCH_SIZE])
+
+
+async def reconcile_inventory(
+    session: AsyncSession,
+    run: ComplianceRun,
+    rows: Iterator[InventoryRow],
+    on_progress: Optional[Progress] = None,
+) -> ComplianceRun:
+    """Read the inventory into ``run``'s report; commits progress as it goes."""
+    matcher = await _load_matcher(session)
+    await session.commit()
+
+    with tempfile.TemporaryDirectory(prefix="compliance-") as directory:
+        spill = _Spill(directory, settings.compliance_partitions)
+        ingest = _Ingest(matcher, spill)
+        try:
+            while await asyncio.to_thread(ingest.consume, rows, settings.compliance_chunk_rows):
+                await _progress(session, run, ingest, on_progress)
+        finally:
+            spill.close()
+
+        run.status = "aggregating"
+        run.unmatched_products = json.dumps(
+            [{"product": name, "rows": n} for name, n in ingest.unmatched.most_common(REPORTED_UNMATCHED_NAMES)]
+        )
+        await _progress(session, run, ingest, on_progress)
+
+        # Read after the inventory, so a long read compares against current assignments
+        seats = await _seats_by_product(session)
+        by_partition: dict[int, list[tuple[int, int, str]]] = {}
+        for assignment in await _active_assignments(session):
+            by_partition.setdefault(spill.partition(assignment[2]), []).append(assignment)
+        installs: Counter[int] = Counter()
+        unassigned: Counter[int] = Counter()
+        stale: list[tuple[int, int, str]] = []
+        for index in range(len(spill.paths)):
+            counts, free, gone = await asyncio.to_thread(_aggregate, spill, index, by_partition.get(index, []))
+            installs.update(counts)
+            unassigned.update(free)
+            stale.extend(gone)
+
+    await _write_report(session, run, installs, unassigned, stale, seats)
+    run.status = "completed"
+    run.finished_at = datetime.now(timezone.utc)
+    await session.commit()
+    if on_progress is not None:
+        on_progress(run)
+    return run
+
+
+async def _run_file(
+    run_id: int, path: str, fmt: str, remove: bool = False, on_progress: Optional[Progress] = None
+) -> ComplianceRun:
+    from .db import AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            run = await session.get(ComplianceRun, run_id)
+            try:
+                with open(path, "rb") as fh:
+                    await reconcile_inventory(session, run, inventory_rows(fh, fmt), on_progress)
+            except BaseException as exc:
+                await session.rollback()
+                run.status = "failed"
+                run.error = str(exc) or type(exc).__name__
+                run.finished_at = datetime.now(timezone.utc)
+                await session.commit()
+                raise
+            return run
+    finally:
+        if remove:
+            os.unlink(path)
+
+
+async def reconcile_file(
+    path: str, fmt: str, source: Optional[str] = None, on_progress: Optional[Progress] = None
+) -> ComplianceRun:
+    """Reconcile an inventory file now, in this task."""
+    from .db import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        run = ComplianceRun(source=source or os.path.basename(path), status="reading")
+        session.add(run)
+        await session.commit()
+    return await _run_file(run.id, path, fmt, on_progress=on_progress)
+
+
+async def start_run(session: AsyncSession, path: str, fmt: str, source: Optional[str]) -> ComplianceRun:
+    """Register a run for an uploaded file and reconcile it in the background; the file is removed afterwards."""
+    run = ComplianceRun(source=source, status="reading")
+    session.add(run)
+    await session.commit()
+
+    async def background() -> None:
+        try:
+            await _run_file(run.id, path, fmt, remove=True)
+        except ValueError as exc:
+            logger.warning("compliance run %s failed: %s", run.id, exc)
+        except Exception:
+            logger.exception("compliance run %s failed", run.id)
+
+    task = asyncio.create_task(background(), name=f"compliance-run-{run.id}")
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return run
+
+
+async def stop_runs() -> None:
+    """Cancel runs still in progress; they are recorded as failed."""
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
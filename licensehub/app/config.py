@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -9,11 +11,89 @@ class Settings(BaseSettings):
     site_name: str = Field(default="LicenseHub", alias="SITE_NAME")
 
     database_url: str = Field(..., alias="DATABASE_URL")
+    # Comma-separated replica URLs that serve GET requests; empty sends everything to DATABASE_URL
+    database_read_urls: str = Field(default="", alias="DATABASE_READ_URLS")
+    # After a client commits a write, its reads go to the primary for this long
+    read_your_writes_seconds: float = Field(default=5, alias="READ_YOUR_WRITES_SECONDS")
+    replica_health_check_seconds: float = Field(default=10, alias="REPLICA_HEALTH_CHECK_SECONDS")
+    # create: create_all on every start; fingerprint: only when the model DDL changed; skip: never
+    schema_startup_mode: Literal["create", "fingerprint", "skip"] = Field(
+        default="fingerprint", alias="SCHEMA_STARTUP_MODE"
+    )
+    db_pool_warmup: int = Field(default=2, alias="DB_POOL_WARMUP")
+    db_precompile: bool = Field(default=True, alias="DB_PRECOMPILE")
+
+    default_page_size: int = Field(default=50, alias="DEFAULT_PAGE_SIZE")
+    max_page_size: int = Field(default=500, alias="MAX_PAGE_SIZE")
+    # Items per /assignments/bulk or /assignments/bulk-return call
+    bulk_assignment_max_items: int = Field(default=1000, alias="BULK_ASSIGNMENT_MAX_ITEMS")
+
+    # Serialized list responses keyed by ETag; 0 disables the cache (ETags still work)
+    response_cache_size: int = Field(default=256, alias="RESPONSE_CACHE_SIZE")
+    response_cache_ttl_seconds: float = Field(default=300, alias="RESPONSE_CACHE_TTL_SECONDS")
+    response_cache_max_bytes: int = Field(default=1024 * 1024, alias="RESPONSE_CACHE_MAX_BYTES")
+
+    # Per entity type (products, vendors, users); rows beyond this are left out of /suggest
+    typeahead_max_entries: int = Field(default=100000, alias="TYPEAHEAD_MAX_ENTRIES")
+    # How often to check table_versions for writes made by other worker processes
+    typeahead_refresh_seconds: float = Field(default=30, alias="TYPEAHEAD_REFRESH_SECONDS")
+
+    # Floating/concurrent checkouts: a lease lapses this long after its last heartbeat
+    lease_ttl_seconds: float = Field(default=120, alias="LEASE_TTL_SECONDS")
+    lease_sweep_interval_seconds: float = Field(default=5, alias="LEASE_SWEEP_INTERVAL_SECONDS")
+    # How often the lease table is written to license_leases (also written on shutdown)
+    lease_persist_interval_seconds: float = Field(default=15, alias="LEASE_PERSIST_INTERVAL_SECONDS")
+    # Upper bound for a checkout's wait_seconds while queued for a seat
+    lease_max_wait_seconds: float = Field(default=60, alias="LEASE_MAX_WAIT_SECONDS")
+
+    # /changes: entries are served once they are this old, so a transaction that commits late isn't skipped
+    change_feed_settle_seconds: float = Field(default=1, alias="CHANGE_FEED_SETTLE_SECONDS")
+    # How often each worker polls change_journal for its /changes/stream subscribers
+    change_feed_poll_seconds: float = Field(default=1, alias="CHANGE_FEED_POLL_SECONDS")
+    # Recent events each worker keeps in memory for stream subscribers
+    change_feed_buffer_size: int = Field(default=10000, alias="CHANGE_FEED_BUFFER_SIZE")
+    change_feed_keepalive_seconds: float = Field(default=15, alias="CHANGE_FEED_KEEPALIVE_SECONDS")
+    # Entries older than this are deleted; a cursor from before then gets 410 and must re-sync
+    change_journal_retention_hours: float = Field(default=168, alias="CHANGE_JOURNAL_RETENTION_HOURS")
+    # Entries older than this are compacted to the latest one per record
+    change_journal_compact_after_hours: float = Field(default=1, alias="CHANGE_JOURNAL_COMPACT_AFTER_HOURS")
+    change_journal_maintenance_seconds: float = Field(default=3600, alias="CHANGE_JOURNAL_MAINTENANCE_SECONDS")
+
+    # Archival (app.archive): returned/expired assignments and audit rows older than this move to *_archive
+    archive_assignments_after_days: int = Field(default=365, ge=1, alias="ARCHIVE_ASSIGNMENTS_AFTER_DAYS")
+    archive_audit_after_days: int = Field(default=180, ge=1, alias="ARCHIVE_AUDIT_AFTER_DAYS")
+    # Rows per archival transaction, and the pause between them so other writers get the locks
+    archive_batch_size: int = Field(default=500, ge=1, alias="ARCHIVE_BATCH_SIZE")
+    archive_batch_pause_seconds: float = Field(default=0.05, alias="ARCHIVE_BATCH_PAUSE_SECONDS")
+
+    # Inventory compliance runs (app.compliance): rows read per progress update, and spill
+    # partitions; one partition's distinct (product, machine) pairs are held in memory at a time
+    compliance_chunk_rows: int = Field(default=50000, alias="COMPLIANCE_CHUNK_ROWS")
+    compliance_partitions: int = Field(default=64, ge=1, alias="COMPLIANCE_PARTITIONS")
+
+    # Statements at least this slow are logged (with the issuing route) to app.slow_sql; 0 disables
+    slow_query_seconds: float = Field(default=0.5, alias="SLOW_QUERY_SECONDS")
+    slow_query_max_chars: int = Field(default=2000, alias="SLOW_QUERY_MAX_CHARS")
+
+    report_base_currency: str = Field(default="USD", alias="REPORT_BASE_CURRENCY")
+    fiscal_year_start_month: int = Field(default=1, ge=1, le=12, alias="FISCAL_YEAR_START_MONTH")
+    # Report results keyed by the versions of the tables they read
+    report_cache_size: int = Field(default=128, alias="REPORT_CACHE_SIZE")
+    report_cache_ttl_seconds: float = Field(default=3600, alias="REPORT_CACHE_TTL_SECONDS")
+
+    audit_enabled: bool = Field(default=True, alias="AUDIT_ENABLED")
+    audit_batch_size: int = Field(default=200, alias="AUDIT_BATCH_SIZE")
+    audit_flush_interval_seconds: float = Field(default=1.0, alias="AUDIT_FLUSH_INTERVAL_SECONDS")
+    audit_queue_high_water: int = Field(default=10000, alias="AUDIT_QUEUE_HIGH_WATER")
 
     jwt_secret: str = Field(..., alias="JWT_SECRET")
     jwt_algorithm: str = Field(default="HS256", alias="JWT_ALGORITHM")
     jwt_expire_minutes: int = Field(default=480, alias="JWT_EXPIRE_MINUTES")
 
+    auth_token_cache_size: int = Field(default=10000, alias="AUTH_TOKEN_CACHE_SIZE")
+    auth_user_cache_size: int = Field(default=10000, alias="AUTH_USER_CACHE_SIZE")
+    auth_user_cache_ttl_seconds: float = Field(default=60, alias="AUTH_USER_CACHE_TTL_SECONDS")
+
     ad_server_uri: str = Field(..., alias="AD_SERVER_URI")
     ad_base_dn: str = Field(..., alias="AD_BASE_DN")
     ad_user_dn_format: str = Field(default="{username}", alias="AD_USER_DN_FORMAT")
@@ -21,6 +101,22 @@ class Settings(BaseSettings):
     ad_service_account_dn: str | None = Field(default=None, alias="AD_SERVICE_ACCOUNT_DN")
     ad_service_account_password: str | None = Field(default=None, alias="AD_SERVICE_ACCOUNT_PASSWORD")
 
+    ldap_pool_size: int = Field(default=4, alias="LDAP_POOL_SIZE")
+    ldap_max_workers: int = Field(default=8, alias="LDAP_MAX_WORKERS")
+    ldap_max_queue: int = Field(default=32, alias="LDAP_MAX_QUEUE")
+    ldap_connect_timeout: float = Field(default=5, alias="LDAP_CONNECT_TIMEOUT")
+    ldap_receive_timeout: float = Field(default=10, alias="LDAP_RECEIVE_TIMEOUT")
+
+    # Bulk user sync from AD (app.directory_sync); needs the service account. 0 = only on demand
+    directory_sync_interval_seconds: float = Field(default=0, alias="DIRECTORY_SYNC_INTERVAL_SECONDS")
+    directory_sync_page_size: int = Field(default=1000, alias="DIRECTORY_SYNC_PAGE_SIZE")
+    directory_sync_batch_size: int = Field(default=1000, alias="DIRECTORY_SYNC_BATCH_SIZE")
+    directory_sync_filter: str = Field(
+        default="(&(objectCategory=person)(objectClass=user))", alias="DIRECTORY_SYNC_FILTER"
+    )
+    # uSNChanged (per domain controller) or whenChanged (replicated, one-second resolution)
+    directory_sync_watermark: str = Field(default="uSNChanged", alias="DIRECTORY_SYNC_WATERMARK")
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,13 +1,224 @@
+"""Engines, sessions and read-replica routing.
+
+Writes always go to ``DATABASE_URL``. When ``DATABASE_READ_URLS`` lists replicas,
+GET requests read from them round-robin, skipping any that failed their last
+``SELECT 1`` health check; with none healthy, reads fall back to the primary.
+The engine is chosen once per request and kept in the request state, so the
+ETag lookup in ``app.versioning`` and the handler read the same database.
+
+Read-your-writes: a request that commits a write marks its client for
+``READ_YOUR_WRITES_SECONDS``. It gets a short-lived cookie, and its bearer token
+is remembered by this worker. GETs from a marked client, or with an
+``X-Read-Primary: 1`` (or ``true``) header, are served by the primary.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import math
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
+from .audit import audit_writer
+from .cache import TTLCache
 from .config import settings
+from .metrics import Counter, Gauge, instrument_engine
+
+logger = logging.getLogger(__name__)
 
 engine: AsyncEngine = create_async_engine(settings.database_url, echo=False, pool_pre_ping=True)
+instrument_engine(engine)
 
 AsyncSessionLocal = sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
 
+db_sessions = Counter("db_request_sessions_total", "Request sessions by the pool they read from", ("pool",))
+
+STICKY_COOKIE = "lh_read_primary"
+READ_METHODS = ("GET", "HEAD")
+TRUTHY = (b"1", b"true")  # X-Read-Primary values that ask for the primary
+
+
+class ReplicaSet:
+    def __init__(self, urls: list[str], check_interval: float):
+        self.check_interval = check_interval
+        self.engines: dict[str, AsyncEngine] = {}
+        for i, url in enumerate(urls):
+            name = f"replica{i}"
+            self.engines[name] = create_async_engine(url, echo=False, pool_pre_ping=True)
+            instrument_engine(self.engines[name], name)
+        self.healthy = {name: True for name in self.engines}
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def pick(self) -> Optional[tuple[str, AsyncEngine]]:
+        names = [name for name, ok in self.healthy.items() if ok]
+        if not names:
+            return None
+        name = names[next(self._turn) % len(names)]
+        return name, self.engines[name]
+
+    @staticmethod
+    async def _ping(db: AsyncEngine) -> None:
+        async with db.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def check(self) -> dict[str, bool]:
+        for name, db in self.engines.items():
+            try:
+                await asyncio.wait_for(self._ping(db), self.check_interval)
+                ok = True
+            except Exception as exc:
+                ok = False
+                if self.healthy[name]:
+                    logger.warning("read replica %s failed its health check: %s", name, exc)
+            if ok and not self.healthy[name]:
+                logger.info("read replica %s is back", name)
+            self.healthy[name] = ok
+        return dict(self.healthy)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def start(self) -> None:
+        if self.engines and self._task is None:
+            await self.check()
+            self._task = asyncio.create_task(self._run(), name="replica-health")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for db in self.engines.values():
+            await db.dispose()
+
+
+replicas = ReplicaSet(
+    [url.strip() for url in settings.database_read_urls.split(",") if url.strip()],
+    settings.replica_health_check_seconds,
+)
+Gauge(
+    "db_replica_healthy",
+    "1 while a read replica passes its health check",
+    ("pool",),
+    callback=lambda: {(name,): float(ok) for name, ok in replicas.healthy.items()},
+)
+
+# sha256 of an Authorization header -> True, for clients that don't keep cookies
+_sticky_tokens = TTLCache(maxsize=10000, ttl=settings.read_your_writes_seconds)
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value
+    return None
+
+
+def _token_key(scope) -> Optional[bytes]:
+    authorization = _header(scope, b"authorization")
+    return hashlib.sha256(authorization).digest() if authorization else None
+
+
+def _reads_primary(scope) -> bool:
+    if (_header(scope, b"x-read-primary") or b"").strip().lower() in TRUTHY:
+        return True
+    key = _token_key(scope)
+    if key is not None and _sticky_tokens.get(key):
+        return True
+    cookie = _header(scope, b"cookie")
+    return cookie is not None and STICKY_COOKIE.encode() + b"=" in cookie
+
+
+def request_engine(scope) -> AsyncEngine:
+    """The engine this request reads from; decided on first use and kept in the request state."""
+    state = scope.setdefault("state", {})
+    chosen = state.get("db_engine")
+    if chosen is None:
+        chosen, name = engine, "primary"
+        if replicas and scope.get("method") in READ_METHODS and not _reads_primary(scope):
+            picked = replicas.pick()
+            if picked is not None:
+                name, chosen = picked
+        state["db_engine"] = chosen
+        db_sessions.inc(name)
+    return chosen
+
+
+def _check_writable(session: Session) -> None:
+    if session.info.get("replica"):
+        raise RuntimeError("GET requests read from a replica and must not write")
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_write(session: Session, flush_context) -> None:
+    _check_writable(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        _check_writable(state.session)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_write(session: Session) -> None:
+    request_state = session.info.get("request_state")
+    if session.info.pop("wrote", False) and request_state is not None:
+        request_state["db_committed"] = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+class ReadYourWritesMiddleware:
+    """Sends a client's reads to the primary for a while after it committed a write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replicas or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def mark(message):
+            if message["type"] == "http.response.start" and scope.get("state", {}).get("db_committed"):
+                window = math.ceil(settings.read_your_writes_seconds)
+                cookie = f"{STICKY_COOKIE}=1; Max-Age={window}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+                key = _token_key(scope)
+                if key is not None:
+                    _sticky_tokens.set(key, True)
+            await send(message)
+
+        await self.app(scope, receive, mark)
+
 
-async def get_db_session() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+async def get_db_session(request: Request) -> AsyncSession:
+    if request.method != "GET":
+        # Backpressure: writes wait while the audit backlog is above its high-water mark
+        await audit_writer.wait_for_capacity()
+    bind = request_engine(request.scope)
+    async with AsyncSessionLocal(bind=bind) as session:
+        session.info["request_state"] = request.scope["state"]
+        session.info["replica"] = bind is not engine
+        yield session
@@ -0,0 +1,240 @@
+"""Bulk user sync from Active Directory.
+
+Walks ``AD_BASE_DN`` with the service account using simple paged results
+(``DIRECTORY_SYNC_PAGE_SIZE`` entries per page) and upserts ``users`` in batches
+of ``DIRECTORY_SYNC_BATCH_SIZE``, keyed on ``sam_account_name``; ``is_admin``
+is never touched. Runs are incremental: only entries whose watermark attribute
+(``uSNChanged`` by default) moved past the highest value of the last run are
+fetched. The watermark is saved only after every batch has committed, so a run
+that fails part way is simply repeated by the next one.
+
+Disabled accounts (``userAccountControl`` bit 0x2) are stored with
+``is_active`` false. Deleted accounts never match an incremental search, so a
+full run (the first one, or ``full=True``) also deactivates every active user
+it didn't see.
+
+``uSNChanged`` is local to a domain controller: point ``AD_SERVER_URI`` at one DC,
+or use ``whenChanged``, which replicates but only has one-second resolution (the
+last second is read again on the next run).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, or_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .job_state import get_state, set_state
+from .ldap_client import LdapClient, get_ldap_client
+from .metrics import Counter, Gauge
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+SYNC_ATTRIBUTES = ["sAMAccountName", "displayName", "mail", "department", "userAccountControl"]
+UPSERT_UPDATE_COLUMNS = ("display_name", "email", "department", "is_active", "directory_synced_at")
+ACCOUNTDISABLE = 0x2
+
+sync_runs = Counter("directory_sync_runs_total", "Directory sync runs by outcome", ("outcome",))
+synced_users = Counter("directory_sync_users_total", "Directory entries upserted into users")
+
+
+def _first(value: Any) -> Any:
+    # Attributes come back as lists unless the schema marks them single-valued
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    return value
+
+
+def _text(attrs: dict, name: str) -> Optional[str]:
+    value = _first(attrs.get(name))
+    return str(value) if value not in (None, "") else None
+
+
+def _mark(attribute: str, value: Any) -> Any:
+    """A watermark value in a form that orders correctly: int for USNs, GeneralizedTime text otherwise."""
+    value = _first(value)
+    if value is None:
+        return None
+    if attribute == "uSNChanged":
+        return int(value)
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).strftime("%Y%m%d%H%M%S.0Z")
+    return str(value)
+
+
+def search_filter(attribute: str, watermark: Any) -> str:
+    base = settings.directory_sync_filter
+    if watermark is None:
+        return base
+    if attribute == "uSNChanged":
+        return f"(&{base}(uSNChanged>={watermark + 1}))"
+    return f"(&{base}({attribute}>={watermark}))"
+
+
+def _entry_row(attrs: dict, synced_at: datetime) -> Optional[dict[str, Any]]:
+    sam = _text(attrs, "sAMAccountName")
+    if sam is None:
+        return None
+    flags = _first(attrs.get("userAccountControl"))
+    return {
+        "sam_account_name": sam,
+        "display_name": _text(attrs, "displayName"),
+        "email": _text(attrs, "mail"),
+        "department": _text(attrs, "department"),
+        "is_admin": False,
+        "is_active": not int(flags or 0) & ACCOUNTDISABLE,
+        "directory_synced_at": synced_at,
+    }
+
+
+def upsert_statement(dialect_name: str, values: list[dict[str, Any]]):
+    table = User.__table__
+    if dialect_name in ("mysql", "mariadb"):
+        stmt = mysql_insert(table).values(values)
+        update_ = {c: stmt.inserted[c] for c in UPSERT_UPDATE_COLUMNS}
+        return stmt.on_duplicate_key_update(**update_, updated_at=func.now())
+    if dialect_name == "sqlite":
+        stmt = sqlite_insert(table).values(values)
+        update_ = {c: stmt.excluded[c] for c in UPSERT_UPDATE_COLUMNS}
+        return stmt.on_conflict_do_update(index_elements=["sam_account_name"], set_={**update_, "updated_at": func.now()})
+    return insert(table).values(values)
+
+
+async def sync_directory(
+    session: AsyncSession, client: Optional[LdapClient] = None, full: bool = False
+) -> dict[str, Any]:
+    """Upsert users changed in AD since the last run; commits each batch."""
+    client = client or get_ldap_client()
+    attribute = settings.directory_sync_watermark
+    state_key = f"directory_sync.{attribute}"
+    stored = None if full else await get_state(session, state_key)
+    watermark = _mark(attribute, stored)
+    full = watermark is None
+    # Don't sit in a transaction while the first page is fetched
+    await session.rollback()
+
+    started = time.perf_counter()
+    synced_at = datetime.now(timezone.utc)
+    dialect = session.bind.dialect.name
+    highest = watermark
+    seen = disabled = 0
+    batch: dict[str, dict[str, Any]] = {}
+
+    async def flush() -> None:
+        await session.execute(upsert_statement(dialect, list(batch.values())))
+        await session.commit()
+        synced_users.inc(amount=len(batch))
+        batch.clear()
+
+    async for page in client.paged_search(
+        search_filter(attribute, watermark), [*SYNC_ATTRIBUTES, attribute], settings.directory_sync_page_size
+    ):
+        for attrs in page:
+            row = _entry_row(attrs, synced_at)
+            if row is None:
+                continue  # not an account we can log in as
+            seen += 1
+            disabled += not row["is_active"]
+            mark = _mark(attribute, attrs.get(attribute))
+            if mark is not None and (highest is None or mark > highest):
+                highest = mark
+            batch[row["sam_account_name"]] = row
+            if len(batch) >= settings.directory_sync_batch_size:
+                await flush()
+    if batch:
+        await flush()
+
+    deactivated = 0
+    # An empty full walk is far more likely a bad base DN or filter than an empty domain
+    if full and seen:
+        result = await session.execute(
+            update(User)
+            .where(
+                User.is_active.is_(True),
+                or_(User.directory_synced_at.is_(None), User.directory_synced_at < synced_at),
+            )
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        deactivated = result.rowcount
+    if highest is not None and highest != watermark:
+        await set_state(session, state_key, str(highest))
+    await session.commit()
+
+    return {
+        "mode": "full" if full else "incremental",
+        "synced": seen,
+        "disabled": disabled,
+        "deactivated": deactivated,
+        "watermark": highest,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+class DirectorySync:
+    """Runs :func:`sync_directory` every ``interval`` seconds, and on demand; never two at once."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_result: Optional[dict[str, Any]] = None
+        self.last_success: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, full: bool = False, client: Optional[LdapClient] = None) -> dict[str, Any]:
+        from .db import AsyncSessionLocal
+
+        if self._lock.locked():
+            raise HTTPException(status_code=409, detail="A directory sync is already running")
+        async with self._lock:
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await sync_directory(session, client, full=full)
+            except Exception:
+                sync_runs.inc("failed")
+                raise
+            sync_runs.inc("succeeded")
+            self.last_result = result
+            self.last_success = time.time()
+            return result
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                result = await self.run()
+                logger.info("directory sync: %s", result)
+            except Exception:
+                logger.exception("directory sync failed; retrying in %ss", self.interval)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="directory-sync")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+directory_sync = DirectorySync(settings.directory_sync_interval_seconds)
+
+Gauge(
+    "directory_sync_last_success_timestamp_seconds",
+    "Unix time of the last directory sync that completed",
+    callback=lambda: directory_sync.last_success or 0.0,
+)
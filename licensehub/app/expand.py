@@ -0,0 +1,140 @@
+"""``?expand=`` support: eager-load requested relationships and nest them in the response.
+
+Each expandable relationship is loaded with ``selectinload``: one extra
+``SELECT ... WHERE id IN (...)`` per relationship level for the whole page.
+A page therefore costs ``1 + len(expanded paths)`` queries whatever its size.
+Unrequested relationships are never touched, so they can't lazy-load.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.orm import selectinload
+
+from .models import Assignment, License, PurchaseOrder
+from .schemas import AssignmentRead, LicenseRead, ProductRead, PurchaseOrderRead, UserRead, VendorRead
+
+# expand name -> (relationship attribute, read schema, nested expansions)
+Tree = dict[str, tuple[str, type[BaseModel], "Tree"]]
+
+_VENDOR: Tree = {}
+_PRODUCT: Tree = {"vendor": ("vendor", VendorRead, _VENDOR)}
+
+LICENSE_EXPANSIONS: Tree = {
+    "product": ("product", ProductRead, _PRODUCT),
+    "owner": ("owner_user", UserRead, {}),
+    "purchase_order": ("purchase_order", PurchaseOrderRead, {"vendor": ("vendor", VendorRead, {})}),
+    "assignments": ("assignments", AssignmentRead, {"user": ("assigned_to_user", UserRead, {})}),
+}
+ASSIGNMENT_EXPANSIONS: Tree = {
+    "license": ("license", LicenseRead, LICENSE_EXPANSIONS),
+    "user": ("assigned_to_user", UserRead, {}),
+}
+PURCHASE_ORDER_EXPANSIONS: Tree = {
+    "vendor": ("vendor", VendorRead, {}),
+    "purchaser": ("purchaser_user", UserRead, {}),
+    "requestor": ("requestor_user", UserRead, {}),
+    "licenses": ("licenses", LicenseRead, LICENSE_EXPANSIONS),
+}
+
+EXPANSIONS = {License: LICENSE_EXPANSIONS, Assignment: ASSIGNMENT_EXPANSIONS, PurchaseOrder: PURCHASE_ORDER_EXPANSIONS}
+READ_SCHEMAS = {License: LicenseRead, Assignment: AssignmentRead, PurchaseOrder: PurchaseOrderRead}
+
+MAX_DEPTH = 3
+
+
+def expansion_tables(model) -> tuple[str, ...]:
+    """Every table an expanded ``model`` response can include, for ETags and cache keys."""
+    tables: set[str] = set()
+
+    def walk(cls, tree: Tree, depth: int) -> None:
+        for attr, _, children in tree.values():
+            target = getattr(cls, attr).property.mapper.class_
+            tables.add(target.__table__.name)
+            if depth < MAX_DEPTH:
+                walk(target, children, depth + 1)
+
+    walk(model, EXPANSIONS[model], 1)
+    return tuple(sorted(tables))
+
+
+def expand_query() -> Any:
+    return Query(default=None, description="Comma-separated relationships to embed, e.g. product,product.vendor")
+
+
+def _paths(tree: Tree, prefix: str = "", depth: int = 1) -> list[str]:
+    out = []
+    for name, (_, _, children) in tree.items():
+        path = prefix + name
+        out.append(path)
+        if depth < MAX_DEPTH:
+            out.extend(_paths(children, path + ".", depth + 1))
+    return out
+
+
+def parse_expand(value: Optional[str], model) -> dict[str, Any]:
+    """``"product.vendor,owner"`` -> ``{"product": {"vendor": {}}, "owner": {}}``; parents are implied."""
+    requested: dict[str, Any] = {}
+    if not value:
+        return requested
+    tree = EXPANSIONS[model]
+    for raw in value.split(","):
+        path = raw.strip()
+        if not path:
+            continue
+        node, level = tree, requested
+        parts = path.split(".")
+        if len(parts) > MAX_DEPTH:
+            raise HTTPException(status_code=400, detail=f"Cannot expand '{path}': at most {MAX_DEPTH} levels")
+        for part in parts:
+            if part not in node:
+                allowed = ", ".join(_paths(tree))
+                raise HTTPException(status_code=400, detail=f"Cannot expand '{path}'. Allowed: {allowed}")
+            node = node[part][2]
+            level = level.setdefault(part, {})
+    return requested
+
+
+def loader_options(model, requested: dict[str, Any], entity=None) -> list:
+    """One ``selectinload`` chain per requested leaf path; ``entity`` is an alias of ``model`` to load from."""
+    options = []
+
+    def walk(cls, tree: Tree, level: dict[str, Any], parent) -> None:
+        for name, children in level.items():
+            attr = getattr(cls, tree[name][0])
+            option = selectinload(attr) if parent is None else parent.selectinload(attr)
+            if children:
+                walk(attr.property.mapper.class_, tree[name][2], children, option)
+            else:
+                options.append(option)
+
+    walk(entity if entity is not None else model, EXPANSIONS[model], requested, None)
+    return options
+
+
+def _dump(obj, schema: type[BaseModel], tree: Tree, level: dict[str, Any], include=None) -> dict[str, Any]:
+    data = schema.model_validate(obj).model_dump(include=include)
+    for name, children in level.items():
+        attr, child_schema, child_tree = tree[name]
+        value = getattr(obj, attr)
+        if isinstance(value, list):
+            data[name] = [_dump(v, child_schema, child_tree, children) for v in value]
+        else:
+            data[name] = None if value is None else _dump(value, child_schema, child_tree, children)
+    return data
+
+
+def expand_items(
+    items: list, model, requested: dict[str, Any], fields: Optional[list[str]] = None
+) -> list[dict[str, Any]]:
+    """Serialize ORM rows to dicts, nesting only the requested (already loaded) relationships.
+
+    ORM objects must not go through the expandable response models directly:
+    those declare the nested fields, and reading an unloaded one would lazy-load.
+    """
+    tree, schema = EXPANSIONS[model], READ_SCHEMAS[model]
+    include = set(fields) if fields is not None else None
+    return [_dump(obj, schema, tree, requested, include) for obj in items]
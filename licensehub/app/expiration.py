@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .job_state import get_state, set_state
+from .models import Assignment, AssignmentStatus, License
+from .seats import refresh_seat_counters
+
+WATERMARK_KEY = "expiration.watermark"
+BATCH_SIZE = 500
+
+
+def expired_between(since: Optional[date], as_of: date):
+    """Predicate for licenses whose end_date crossed into the past in ``[since, as_of)``."""
+    clause = License.end_date < as_of
+    if since is not None:
+        clause = clause & (License.end_date >= since)
+    return clause
+
+
+async def run_expiration(
+    session: AsyncSession, as_of: Optional[date] = None, full: bool = False, batch_size: int = BATCH_SIZE
+) -> dict:
+    """Mark active assignments on newly expired licenses as EXPIRED.
+
+    Only licenses whose ``end_date`` falls between the previous run's watermark
+    and ``as_of`` are visited (all past ``end_date`` values when ``full`` is set
+    or on the first run). Each batch of license ids is one UPDATE and one commit,
+    so locks on ``assignments`` are held briefly. The watermark only advances
+    once every batch has been applied; a rerun after a crash is harmless because
+    the UPDATE only touches rows still ASSIGNED.
+    """
+    as_of = as_of or datetime.now(timezone.utc).date()
+    watermark = None if full else await get_state(session, WATERMARK_KEY)
+    since = date.fromisoformat(watermark) if watermark else None
+
+    licenses_expired = 0
+    assignments_expired = 0
+    last: Optional[tuple[date, int]] = None
+    while True:
+        # Walk the end_date index in (end_date, id) order so each batch is a range scan
+        stmt = select(License.id, License.end_date).where(expired_between(since, as_of))
+        if last is not None:
+            stmt = stmt.where(
+                or_(License.end_date > last[0], and_(License.end_date == last[0], License.id > last[1]))
+            )
+        rows = (await session.execute(stmt.order_by(License.end_date, License.id).limit(batch_size))).all()
+        if not rows:
+            break
+        ids = [row.id for row in rows]
+        result = await session.execute(
+            update(Assignment)
+            .where(Assignment.license_id.in_(ids), Assignment.status == AssignmentStatus.ASSIGNED)
+            .values(status=AssignmentStatus.EXPIRED)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            await refresh_seat_counters(session, ids)
+        await session.commit()
+        licenses_expired += len(ids)
+        assignments_expired += result.rowcount
+        last = (rows[-1].end_date, rows[-1].id)
+
+    await set_state(session, WATERMARK_KEY, max(as_of, since or as_of).isoformat())
+    await session.commit()
+    return {
+        "since": since,
+        "as_of": as_of,
+        "expired_license_count": licenses_expired,
+        "expired_assignment_count": assignments_expired,
+    }
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import csv
+import io
+from itertools import islice
+from typing import IO, Any, Iterable, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import case, func, insert, or_, select, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .changes import record_changes
+from .leases import lease_manager
+from .models import License, LicenseType, SoftwareProduct
+from .search import reindex_documents
+from .schemas import LicenseImportResult, LicenseImportRow, RowError
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+LICENSE_COLUMNS = (
+    "product_id",
+    "license_key",
+    "license_type",
+    "seat_count",
+    "start_date",
+    "end_date",
+    "maintenance_end_date",
+    "purchase_order_id",
+    "owner_user_id",
+    "cost_total",
+    "currency",
+    "notes",
+)
+UPSERT_UPDATE_COLUMNS = tuple(c for c in LICENSE_COLUMNS if c not in ("product_id", "license_key"))
+
+
+def csv_rows(stream: IO[bytes]) -> Iterable[dict[str, Any]]:
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        # Empty CSV cells mean "not provided", not an empty string
+        yield {k: v for k, v in row.items() if k and v != ""}
+
+
+def _record_error(result: LicenseImportResult, row_no: int, message: str) -> None:
+    result.failed += 1
+    if len(result.errors) < MAX_REPORTED_ERRORS:
+        result.errors.append(RowError(row=row_no, error=message))
+    else:
+        result.errors_truncated = True
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in exc.errors())
+
+
+def _update_set(table, incoming, columns: Iterable[str]) -> dict[str, Any]:
+    update = {c: incoming[c] for c in columns}
+    if "seat_count" in update:
+        # Backstop for a seat claimed between the seats_in_use check and this
+        # statement: never leave seat_count below what is already in use.
+        update["seat_count"] = case(
+            (incoming.seat_count < table.c.seats_in_use, table.c.seats_in_use), else_=incoming.seat_count
+        )
+    return update
+
+
+def upsert_statement(dialect_name: str, values: list[dict[str, Any]]):
+    """Upsert ``values``; on conflict only the columns the rows provide are updated.
+
+    Every dict in ``values`` must have the same keys, so an existing license
+    keeps whatever a partial row (say, a seat true-up) leaves out.
+    """
+    table = License.__table__
+    columns = [c for c in UPSERT_UPDATE_COLUMNS if c in values[0]]
+    if dialect_name in ("mysql", "mariadb"):
+        stmt = mysql_insert(table).values(values)
+        update = _update_set(table, stmt.inserted, columns)
+        return stmt.on_duplicate_key_update(**update, updated_at=func.now())
+    if dialect_name in ("sqlite", "postgresql"):
+        stmt = (sqlite_insert if dialect_name == "sqlite" else pg_insert)(table).values(values)
+        update = _update_set(table, stmt.excluded, columns)
+        return stmt.on_conflict_do_update(
+            index_elements=["product_id", "license_key"], set_={**update, "updated_at": func.now()}
+        )
+    return insert(table).values(values)
+
+
+class _ProductResolver:
+    """Caches product name/id lookups for the lifetime of one import."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.ids_by_name: dict[str, int] = {}
+        self.known_ids: set[int] = set()
+
+    async def prime(self, names: set[str], ids: set[int]) -> None:
+        missing_names = names - self.ids_by_name.keys()
+        if missing_names:
+            result = await self.session.execute(
+                select(SoftwareProduct.name, SoftwareProduct.id).where(SoftwareProduct.name.in_(missing_names))
+            )
+            for name, product_id in result.all():
+                self.ids_by_name[name] = product_id
+                self.known_ids.add(product_id)
+        missing_ids = ids - self.known_ids
+        if missing_ids:
+            result = await self.session.execute(select(SoftwareProduct.id).where(SoftwareProduct.id.in_(missing_ids)))
+            self.known_ids.update(result.scalars().all())
+
+
+async def _validate_batch(
+    resolver: _ProductResolver, batch: list[tuple[int, Any]], result: LicenseImportResult
+) -> dict[tuple, tuple[int, dict[str, Any]]]:
+    parsed: list[tuple[int, LicenseImportRow]] = []
+    for row_no, raw in batch:
+        try:
+            parsed.append((row_no, LicenseImportRow.model_validate(raw)))
+        except ValidationError as exc:
+            _record_error(result, row_no, _validation_message(exc))
+
+    await resolver.prime(
+        {r.product for _, r in parsed if r.product_id is None and r.product},
+        {r.product_id for _, r in parsed if r.product_id is not None},
+    )
+
+    # Keyed on the unique constraint so a key repeated inside one batch
+    # collapses to its last occurrence instead of conflicting with itself.
+    valid: dict[tuple, tuple[int, dict[str, Any]]] = {}
+    for row_no, row in parsed:
+        product_id = row.product_id
+        if product_id is None:
+            if not row.product:
+                _record_error(result, row_no, "product_id or product is required")
+                continue
+            product_id = resolver.ids_by_name.get(row.product)
+            if product_id is None:
+                _record_error(result, row_no, f"Unknown product '{row.product}'")
+                continue
+        elif product_id not in resolver.known_ids:
+            _record_error(result, row_no, f"Unknown product_id {product_id}")
+            continue
+        try:
+            license_type = LicenseType(row.license_type)
+        except ValueError:
+            _record_error(result, row_no, f"Invalid license_type '{row.license_type}'")
+            continue
+
+        # Only what the row actually sent: on update, absent columns keep their
+        # stored values; on insert they get the column defaults.
+        values = row.model_dump(include=set(LICENSE_COLUMNS), exclude_unset=True)
+        values["product_id"] = product_id
+        if "license_type" in values:
+            values["license_type"] = license_type
+        key = (product_id, row.license_key) if row.license_key is not None else (None, row_no)
+        if key in valid:
+            result.duplicates += 1
+        valid[key] = (row_no, values)
+
+    await _check_seat_counts(resolver.session, valid, result)
+    return valid
+
+
+async def _check_seat_counts(
+    session: AsyncSession, valid: dict[tuple, tuple[int, dict[str, Any]]], result: LicenseImportResult
+) -> None:
+    """Drop rows that would set an existing license's seat_count below its assigned or leased seats."""
+    keys = [key for key, (_, values) in valid.items() if key[0] is not None and "seat_count" in values]
+    if not keys:
+        return
+    existing = await session.execute(
+        select(License.id, License.product_id, License.license_key, License.seats_in_use).where(
+            tuple_(License.product_id, License.license_key).in_(keys)
+        )
+    )
+    for license_id, product_id, license_key, seats_in_use in existing.all():
+        seats_in_use += lease_manager.held(license_id)
+        key = (product_id, license_key)
+        row_no, values = valid[key]
+        if values["seat_count"] < seats_in_use:
+            del valid[key]
+            message = f"seat_count {values['seat_count']} is below the {seats_in_use} seats assigned or leased"
+            _record_error(result, row_no, message)
+
+
+async def _write_batch(
+    session: AsyncSession, rows: list[tuple[int, dict[str, Any]]], result: LicenseImportResult
+) -> list[dict[str, Any]]:
+    """Upsert ``rows`` and return the values that were written."""
+    # One statement per distinct set of provided columns
+    groups: dict[frozenset, list[tuple[int, dict[str, Any]]]] = {}
+    for row in rows:
+        groups.setdefault(frozenset(row[1]), []).append(row)
+    written = []
+    for group in groups.values():
+        written.extend(await _write_group(session, group, result))
+    return written
+
+
+async def _write_group(
+    session: AsyncSession, rows: list[tuple[int, dict[str, Any]]], result: LicenseImportResult
+) -> list[dict[str, Any]]:
+    dialect_name = session.bind.dialect.name
+    try:
+        async with session.begin_nested():
+            await session.execute(upsert_statement(dialect_name, [values for _, values in rows]))
+        result.upserted += len(rows)
+        return [values for _, values in rows]
+    except DBAPIError:
+        pass
+
+    # Something in the batch violates a constraint the validator can't see
+    # (e.g. a dangling purchase_order_id). Retry row by row to isolate it.
+    written = []
+    for row_no, values in rows:
+        try:
+            async with session.begin_nested():
+                await session.execute(upsert_statement(dialect_name, [values]))
+            result.upserted += 1
+            written.append(values)
+        except DBAPIError as exc:
+            _record_error(result, row_no, str(exc.orig))
+    return written
+
+
+async def _journal_batch(session: AsyncSession, last_id: int, written: list[dict[str, Any]]) -> None:
+    # Upserts are Core INSERTs, invisible to the session hooks that feed the change
+    # journal and the search index. New rows are the ids above the pre-batch
+    # maximum; updated ones match on the key.
+    keys = [(v["product_id"], v["license_key"]) for v in written if v.get("license_key") is not None]
+    match = License.id > last_id
+    if keys:
+        match = or_(match, tuple_(License.product_id, License.license_key).in_(keys))
+    ids = (await session.execute(select(License.id).where(match))).scalars().all()
+    await record_changes(session, "licenses", {i: "insert" if i > last_id else "update" for i in ids})
+    await reindex_documents(session, License, ids)
+
+
+async def import_licenses(
+    session: AsyncSession, rows: Iterable[Any], batch_size: Optional[int] = None
+) -> LicenseImportResult:
+    """Validate and upsert licenses on (product_id, license_key), one transaction per batch.
+
+    Rows may reference a product by ``product_id`` or by ``product`` name. Rows
+    without a ``license_key`` can't match the unique constraint and are always
+    inserted. Invalid rows are reported in ``errors`` and never abort the import.
+    """
+    result = LicenseImportResult()
+    resolver = _ProductResolver(session)
+    numbered = enumerate(rows, start=1)
+    while batch := list(islice(numbered, batch_size or BATCH_SIZE)):
+        result.received += len(batch)
+        valid = await _validate_batch(resolver, batch, result)
+        if valid:
+            last_id = await session.scalar(select(func.max(License.id))) or 0
+            written = await _write_batch(session, list(valid.values()), result)
+            if written:
+                await _journal_batch(session, last_id, written)
+        await session.commit()
+    return result
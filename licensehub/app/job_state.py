@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import JobState
+
+
+async def get_state(session: AsyncSession, name: str) -> Optional[str]:
+    return await session.scalar(select(JobState.value).where(JobState.name == name))
+
+
+async def set_state(session: AsyncSession, name: str, value: Optional[str]) -> None:
+    """Stage a watermark update; the caller commits it with its own work."""
+    state = await session.get(JobState, name)
+    if state is None:
+        session.add(JobState(name=name, value=value))
+    else:
+        state.value = value
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from ldap3 import ALL, SYNC, Connection, Server
+from ldap3.core.exceptions import LDAPException, LDAPPasswordIsMandatoryError
+from ldap3.utils.conv import escape_filter_chars
+
+from .config import settings
+
+PROFILE_ATTRIBUTES = ["displayName", "mail", "department", "sAMAccountName"]
+PAGED_RESULTS_OID = "1.2.840.113556.1.4.319"
+
+
+class LdapUnavailable(Exception):
+    """The directory is unreachable or the login queue is full; callers should answer 503."""
+
+
+class LdapStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.succeeded = 0
+        self.rejected = 0  # bad credentials / unknown user
+        self.errors = 0
+        self.shed = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+
+    def observe(self, seconds: float, queue_wait: float) -> None:
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.queue_wait_seconds += queue_wait
+
+    def snapshot(self) -> dict[str, int | float]:
+        completed = self.succeeded + self.rejected + self.errors
+        return {
+            "requests": self.requests,
+            "succeeded": self.succeeded,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "shed": self.shed,
+            "in_flight": self.in_flight,
+            "avg_seconds": self.total_seconds / completed if completed else 0.0,
+            "max_seconds": self.max_seconds,
+            "avg_queue_wait_seconds": self.queue_wait_seconds / completed if completed else 0.0,
+        }
+
+
+class _ConnectionPool:
+    """Idle LDAP connections for reuse across logins; ldap3 SYNC connections are used by one thread at a time."""
+
+    def __init__(self, factory: Callable[[], Connection], size: int):
+        self._factory = factory
+        self._size = size
+        self._idle: queue.LifoQueue[Connection] = queue.LifoQueue()
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._factory()
+        healthy = False
+        try:
+            yield conn
+            healthy = True
+        finally:
+            if healthy and self._idle.qsize() < self._size:
+                self._idle.put(conn)
+            else:
+                _close(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                _close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _close(conn: Connection) -> None:
+    try:
+        conn.unbind()
+    except LDAPException:
+        pass
+
+
+def sam_account_name(username: str) -> str:
+    """``DOMAIN\\user`` and ``user@domain`` both log in as ``user``."""
+    return username.split("\\")[-1].split("@")[0]
+
+
+def _entry_profile(entry) -> dict[str, Optional[str]]:
+    def value(name: str) -> Optional[str]:
+        if name not in entry.entry_attributes:
+            return None
+        raw = entry[name].value
+        return str(raw) if raw not in (None, []) else None
+
+    return {
+        "sam": value("sAMAccountName"),
+        "display_name": value("displayName"),
+        "email": value("mail"),
+        "department": value("department"),
+    }
+
+
+class LdapClient:
+    """Login against AD with reused connections and a dedicated, bounded thread pool.
+
+    * One ``Server`` per process; DSA info and schema are read on the first bind only.
+    * User binds reuse pooled connections via ``rebind`` instead of a new TLS handshake.
+    * Attribute searches go through a long-lived service-account connection pool when
+      a service account is configured, otherwise through the user's own connection.
+    * At most ``max_workers`` binds run at once and at most ``max_queue`` wait; anything
+      beyond that fails fast with :class:`LdapUnavailable`.
+    """
+
+    def __init__(
+        self,
+        server_uri: str,
+        base_dn: str,
+        user_dn_format: str = "{username}",
+        use_ssl: bool = True,
+        service_account_dn: Optional[str] = None,
+        service_account_password: Optional[str] = None,
+        *,
+        pool_size: int = 4,
+        max_workers: int = 8,
+        max_queue: int = 32,
+        connect_timeout: Optional[float] = None,
+        receive_timeout: Optional[float] = None,
+        client_strategy: str = SYNC,
+        server: Optional[Server] = None,
+    ):
+        self.base_dn = base_dn
+        self.user_dn_format = user_dn_format
+        self.service_account_dn = service_account_dn
+        self.service_account_password = service_account_password
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.receive_timeout = receive_timeout
+        self.client_strategy = client_strategy
+        self.server = server or Server(server_uri, get_info=ALL, use_ssl=use_ssl, connect_timeout=connect_timeout)
+        self.stats = LdapStats()
+
+        self._info_lock = threading.Lock()
+        self._info_loaded = False
+        self._user_pool = _ConnectionPool(self._new_connection, pool_size)
+        self._service_pool = _ConnectionPool(self._new_service_connection, pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ldap")
+
+    @property
+    def has_service_account(self) -> bool:
+        return bool(self.service_account_dn and self.service_account_password)
+
+    def _new_connection(self) -> Connection:
+        return Connection(
+            self.server,
+            client_strategy=self.client_strategy,
+            receive_timeout=self.receive_timeout,
+            raise_exceptions=False,
+        )
+
+    def _new_service_connection(self) -> Connection:
+        conn = self._new_connection()
+        if not self._bind(conn, self.service_account_dn, self.service_account_password):
+            raise LdapUnavailable("Service account bind failed")
+        return conn
+
+    def _bind(self, conn: Connection, user: str, password: str) -> bool:
+        # Server info is cached on the shared Server object; only the first bind fetches it
+        if self._info_loaded:
+            return conn.rebind(user=user, password=password, read_server_info=False)
+        with self._info_lock:
+            read_info = not self._info_loaded
+            bound = conn.rebind(user=user, password=password, read_server_info=read_info)
+            if bound and read_info:
+                self._info_loaded = True
+            return bound
+
+    def _search(self, conn: Connection, sam_account: str) -> dict[str, Optional[str]]:
+        ok = conn.search(
+            search_base=self.base_dn,
+            search_filter=f"(sAMAccountName={escape_filter_chars(sam_account)})",
+            attributes=PROFILE_ATTRIBUTES,
+            size_limit=1,
+        )
+        if not ok and conn.result and conn.result.get("result") not in (0, 4, 32):  # success, sizeLimit, noSuchObject
+            raise LdapUnavailable(f"LDAP search failed: {conn.result.get('description')}")
+        if not conn.entries:
+            return {}
+        return _entry_profile(conn.entries[0])
+
+    def _with_retry(self, pool: _ConnectionPool, fn: Callable[[Connection], Optional[dict]]) -> Optional[dict]:
+        # An idle pooled connection may have been dropped by the DC; retry once on a fresh one
+        for attempt in range(2):
+            try:
+                with pool.connection() as conn:
+                    return fn(conn)
+            except LDAPPasswordIsMandatoryError:
+                return None
+            except LDAPException:
+                if attempt:
+                    raise
+        return None
+
+    def _authenticate_sync(self, username: str, password: str, fetch_profile: bool) -> dict[str, Optional[str]]:
+        user_dn = self.user_dn_format.format(username=username)
+        sam_account = sam_account_name(username)
+
+        def bind(conn: Connection) -> Optional[dict[str, Optional[str]]]:
+            if not self._bind(conn, user_dn, password):
+                return None
+            if not fetch_profile:
+                return {"sam": sam_account}
+            # Without a service account the user's own connection does the lookup
+            return {} if self.has_service_account else self._search(conn, sam_account)
+
+        profile = self._with_retry(self._user_pool, bind)
+        if profile is None:
+            return {}
+        if fetch_profile and self.has_service_account:
+            profile = self._with_retry(self._service_pool, lambda conn: self._search(conn, sam_account))
+        return profile or {}
+
+    async def authenticate(
+        self, username: str, password: str, fetch_profile: bool = True
+    ) -> dict[str, Optional[str]]:
+        """Bind as the user and return their profile, or ``{}`` for bad credentials.
+
+        With ``fetch_profile=False`` only the bind runs and the profile is just ``{"sam": ...}``.
+        """
+        if not password:
+            # An empty password is an unauthenticated bind, which AD accepts
+            return {}
+        stats = self.stats
+        stats.requests += 1
+        if stats.in_flight >= self.max_workers + self.max_queue:
+            stats.shed += 1
+            raise LdapUnavailable("Too many logins in progress")
+
+        stats.in_flight += 1
+        submitted = time.perf_counter()
+        started = submitted
+
+        def run() -> dict[str, Optional[str]]:
+            nonlocal started
+            started = time.perf_counter()
+            return self._authenticate_sync(username, password, fetch_profile)
+
+        loop = asyncio.get_running_loop()
+        try:
+            profile = await loop.run_in_executor(self._executor, run)
+        except LdapUnavailable:
+            stats.errors += 1
+            raise
+        except LDAPException as exc:
+            stats.errors += 1
+            raise LdapUnavailable(str(exc)) from exc
+        else:
+            if profile:
+                stats.succeeded += 1
+            else:
+                stats.rejected += 1
+            return profile
+        finally:
+            stats.in_flight -= 1
+            stats.observe(time.perf_counter() - submitted, started - submitted)
+
+    def _search_page(
+        self, conn: Connection, search_filter: str, attributes: list[str], page_size: int, cookie: Optional[bytes]
+    ) -> tuple[list[dict], Optional[bytes]]:
+        conn.search(
+            search_base=self.base_dn,
+            search_filter=search_filter,
+            attributes=attributes,
+            paged_size=page_size,
+            paged_cookie=cookie,
+        )
+        if not conn.result or conn.result.get("result") != 0:
+            raise LdapUnavailable(f"LDAP search failed: {(conn.result or {}).get('description')}")
+        entries = [r["attributes"] for r in conn.response or () if r.get("type") == "searchResEntry"]
+        control = (conn.result.get("controls") or {}).get(PAGED_RESULTS_OID)
+        return entries, control["value"]["cookie"] if control else None
+
+    async def paged_search(
+        self, search_filter: str, attributes: list[str], page_size: int
+    ) -> AsyncIterator[list[dict]]:
+        """Yield the attributes of every entry under ``base_dn`` matching the filter, a page at a time.
+
+        Uses its own service-account connection so a long walk never holds one that
+        logins are waiting for. Pages are fetched on the LDAP thread pool, one at a time.
+        """
+        if not self.has_service_account:
+            raise LdapUnavailable("Directory searches need AD_SERVICE_ACCOUNT_DN and AD_SERVICE_ACCOUNT_PASSWORD")
+        loop = asyncio.get_running_loop()
+        try:
+            conn = await loop.run_in_executor(self._executor, self._new_service_connection)
+        except LDAPException as exc:
+            raise LdapUnavailable(str(exc)) from exc
+        try:
+            cookie: Optional[bytes] = None
+            while True:
+                try:
+                    entries, cookie = await loop.run_in_executor(
+                        self._executor, self._search_page, conn, search_filter, attributes, page_size, cookie
+                    )
+                except LDAPException as exc:
+                    raise LdapUnavailable(str(exc)) from exc
+                if entries:
+                    yield entries
+                if not cookie:
+                    return
+        finally:
+            _close(conn)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._user_pool.close()
+        self._service_pool.close()
+
+
+_client: Optional[LdapClient] = None
+
+
+def get_ldap_client() -> LdapClient:
+    global _client
+    if _client is None:
+        _client = LdapClient(
+            settings.ad_server_uri,
+            settings.ad_base_dn,
+            settings.ad_user_dn_format,
+            settings.ad_use_ssl,
+            settings.ad_service_account_dn,
+            settings.ad_service_account_password,
+            pool_size=settings.ldap_pool_size,
+            max_workers=settings.ldap_max_workers,
+            max_queue=settings.ldap_max_queue,
+            connect_timeout=settings.ldap_connect_timeout,
+            receive_timeout=settings.ldap_receive_timeout,
+        )
+    return _client
+
+
+def close_ldap_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
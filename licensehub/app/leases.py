@@ -0,0 +1,345 @@
+"""Checkout leases for floating and concurrent licenses.
+
+Leases live in memory, in one pool per license. A pool holds the granted
+leases and a FIFO of waiting checkouts, so it acts as a semaphore sized to
+the license's free seats. These license types can't be assigned to named users
+(app.seats refuses them), so leases are the only thing taking their seats;
+``seats_in_use`` only counts assignments made before that rule and is subtracted
+so they keep their seats. A heartbeat only moves a lease's expiry in memory. A
+background task drops leases whose heartbeats stopped and hands their seats to
+waiters. It re-reads the capacity of every busy pool, so a changed
+``seat_count`` takes effect without waiting for a checkout (a lowered one stops
+new grants until enough leases are gone). It also rewrites ``license_leases``
+every ``LEASE_PERSIST_INTERVAL_SECONDS`` when something changed, and once more
+on shutdown, so a restart recovers the table.
+
+The pools are per process: run the app with a single worker (the Docker
+image's default) when clients check seats out.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .metrics import Counter, Gauge
+from .models import LEASED_TYPES, License, LicenseLease
+
+logger = logging.getLogger(__name__)
+
+checkouts = Counter("license_checkouts_total", "Checkout requests by outcome", ("outcome",))
+
+
+@dataclass
+class Lease:
+    id: str
+    license_id: int
+    user_id: int
+    machine: Optional[str]
+    checked_out_at: float
+    expires_at: float
+
+    def read(self) -> dict:
+        return {
+            "id": self.id,
+            "license_id": self.license_id,
+            "user_id": self.user_id,
+            "machine": self.machine,
+            "checked_out_at": datetime.fromtimestamp(self.checked_out_at, timezone.utc),
+            "expires_at": datetime.fromtimestamp(self.expires_at, timezone.utc),
+        }
+
+
+@dataclass
+class _Waiter:
+    user_id: int
+    machine: Optional[str]
+    future: asyncio.Future
+
+
+@dataclass
+class _Pool:
+    capacity: int
+    leases: dict[str, Lease] = field(default_factory=dict)
+    waiters: deque[_Waiter] = field(default_factory=deque)
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite hands back naive datetimes; everything is stored in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class LeaseManager:
+    def __init__(self, ttl: float, sweep_interval: float, persist_interval: float):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.persist_interval = persist_interval
+        self._pools: dict[int, _Pool] = {}
+        self._leases: dict[str, Lease] = {}
+        self._dirty = False
+        self._last_persist = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.persisted = 0
+
+    # -- lease operations ----------------------------------------------------
+
+    def _grant(self, pool: _Pool, license_id: int, user_id: int, machine: Optional[str], now: float) -> Lease:
+        lease = Lease(secrets.token_urlsafe(24), license_id, user_id, machine, now, now + self.ttl)
+        pool.leases[lease.id] = lease
+        self._leases[lease.id] = lease
+        self._dirty = True
+        return lease
+
+    def _hand_over(self, pool: _Pool, license_id: int, now: float) -> None:
+        while pool.waiters and len(pool.leases) < pool.capacity:
+            waiter = pool.waiters.popleft()
+            if waiter.future.done():
+                continue  # timed out or the client went away
+            waiter.future.set_result(self._grant(pool, license_id, waiter.user_id, waiter.machine, now))
+
+    def _release(self, lease: Lease, now: float) -> None:
+        pool = self._pools[lease.license_id]
+        pool.leases.pop(lease.id, None)
+        self._leases.pop(lease.id, None)
+        self._dirty = True
+        self._hand_over(pool, lease.license_id, now)
+
+    def _expire(self, pool: _Pool, now: float) -> None:
+        for lease in [lease for lease in pool.leases.values() if lease.expires_at <= now]:
+            self.expired += 1
+            self._release(lease, now)
+
+    async def checkout(
+        self, session: AsyncSession, license_id: int, user_id: int, machine: Optional[str], wait: float
+    ) -> Lease:
+        row = (
+            await session.execute(
+                select(License.license_type, License.seat_count, License.seats_in_use).where(License.id == license_id)
+            )
+        ).one_or_none()
+        # Don't hold a pooled connection while queued for a seat
+        await session.rollback()
+        if row is None:
+            raise HTTPException(status_code=404, detail="License not found")
+        if row.license_type not in LEASED_TYPES:
+            raise HTTPException(status_code=400, detail="Only floating and concurrent licenses are checked out")
+
+        now = time.time()
+        pool = self._pools.setdefault(license_id, _Pool(capacity=0))
+        pool.capacity = max(row.seat_count - row.seats_in_use, 0)
+        self._expire(pool, now)
+
+        # A client that lost its lease id gets the same lease back instead of a second seat
+        for lease in pool.leases.values():
+            if lease.user_id == user_id and lease.machine == machine:
+                lease.expires_at = now + self.ttl
+                checkouts.inc("renewed")
+                return lease
+
+        if not pool.waiters and len(pool.leases) < pool.capacity:
+            checkouts.inc("granted")
+            return self._grant(pool, license_id, user_id, machine, now)
+
+        wait = min(wait, settings.lease_max_wait_seconds)
+        if wait <= 0:
+            checkouts.inc("rejected")
+            raise HTTPException(status_code=409, detail="No seats free on this license", headers={"Retry-After": "30"})
+
+        waiter = _Waiter(user_id, machine, asyncio.get_running_loop().create_future())
+        pool.waiters.append(waiter)
+        try:
+            lease = await asyncio.wait_for(waiter.future, wait)
+        except asyncio.TimeoutError:
+            checkouts.inc("timed_out")
+            raise HTTPException(status_code=409, detail="No seat became free in time", headers={"Retry-After": "30"})
+        finally:
+            if waiter in pool.waiters:
+                pool.waiters.remove(waiter)
+        checkouts.inc("queued")
+        return lease
+
+    def _owned(self, lease_id: str, user) -> Lease:
+        lease = self._leases.get(lease_id)
+        if lease is None or lease.expires_at <= time.time() or (lease.user_id != user.id and not user.is_admin):
+            raise HTTPException(status_code=404, detail="Lease not found or expired")
+        return lease
+
+    def heartbeat(self, lease_id: str, user) -> Lease:
+        lease = self._owned(lease_id, user)
+        lease.expires_at = time.time() + self.ttl
+        self._dirty = True
+        return lease
+
+    def checkin(self, lease_id: str, user) -> None:
+        self._release(self._owned(lease_id, user), time.time())
+
+    def held(self, license_id: int) -> int:
+        """Seats currently leased on ``license_id``."""
+        return len(self.leases_for(license_id))
+
+    def leases_for(self, license_id: int) -> list[Lease]:
+        pool = self._pools.get(license_id)
+        if pool is None:
+            return []
+        now = time.time()
+        return sorted((lease for lease in pool.leases.values() if lease.expires_at > now), key=lambda lease: lease.checked_out_at)
+
+    def sweep(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        for pool in self._pools.values():
+            self._expire(pool, now)
+
+    async def refresh_capacities(self) -> None:
+        """Re-read the seats of every pool holding leases or waiters, in one query."""
+        from .db import engine
+
+        busy = [license_id for license_id, pool in self._pools.items() if pool.leases or pool.waiters]
+        if not busy:
+            return
+        async with engine.connect() as conn:
+            rows = (
+                await conn.execute(
+                    select(License.id, License.license_type, License.seat_count, License.seats_in_use).where(
+                        License.id.in_(busy)
+                    )
+                )
+            ).all()
+        capacities = {
+            row.id: max(row.seat_count - row.seats_in_use, 0) if row.license_type in LEASED_TYPES else 0
+            for row in rows
+        }
+        now = time.time()
+        for license_id in busy:
+            pool = self._pools.get(license_id)
+            if pool is None:
+                continue
+            pool.capacity = capacities.get(license_id, 0)  # deleted or no longer leased: grant nothing
+            self._hand_over(pool, license_id, now)
+
+    # -- persistence ---------------------------------------------------------
+
+    async def persist(self) -> int:
+        from .db import engine
+
+        rows = [
+            {
+                "id": lease.id,
+                "license_id": lease.license_id,
+                "user_id": lease.user_id,
+                "machine": lease.machine,
+                "checked_out_at": datetime.fromtimestamp(lease.checked_out_at, timezone.utc),
+                "expires_at": datetime.fromtimestamp(lease.expires_at, timezone.utc),
+            }
+            for lease in self._leases.values()
+        ]
+        self._dirty = False
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(delete(LicenseLease.__table__))
+                if rows:
+                    await conn.execute(insert(LicenseLease.__table__), rows)
+        except BaseException:
+            self._dirty = True
+            raise
+        self._last_persist = time.monotonic()
+        self.persisted += 1
+        return len(rows)
+
+    async def recover(self) -> int:
+        """Load the last snapshot; every recovered lease gets at least one TTL to resume heartbeats."""
+        from .db import engine
+
+        async with engine.connect() as conn:
+            rows = (await conn.execute(select(LicenseLease.__table__))).all()
+            license_ids = {row.license_id for row in rows}
+            capacities = {
+                row.id: max(row.seat_count - row.seats_in_use, 0)
+                for row in (
+                    await conn.execute(
+                        select(License.id, License.seat_count, License.seats_in_use).where(License.id.in_(license_ids))
+                    )
+                ).all()
+            } if license_ids else {}
+
+        now = time.time()
+        self._pools.clear()
+        self._leases.clear()
+        for row in rows:
+            if row.license_id not in capacities:
+                continue  # license deleted while we were down
+            lease = Lease(
+                row.id,
+                row.license_id,
+                row.user_id,
+                row.machine,
+                _timestamp(row.checked_out_at),
+                max(_timestamp(row.expires_at), now + self.ttl),
+            )
+            pool = self._pools.setdefault(row.license_id, _Pool(capacity=capacities[row.license_id]))
+            pool.leases[lease.id] = lease
+            self._leases[lease.id] = lease
+        return len(self._leases)
+
+    # -- background task -----------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+            try:
+                await self.refresh_capacities()
+            except Exception:
+                logger.exception("re-reading lease capacities failed; will retry")
+            if self._dirty and time.monotonic() - self._last_persist >= self.persist_interval:
+                try:
+                    await self.persist()
+                except Exception:
+                    logger.exception("persisting %d leases failed; will retry", len(self._leases))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._last_persist = time.monotonic()
+            self._task = asyncio.create_task(self._run(), name="lease-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.persist()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "leases": len(self._leases),
+            "licenses": sum(1 for pool in self._pools.values() if pool.leases),
+            "waiting": sum(len(pool.waiters) for pool in self._pools.values()),
+            "expired": self.expired,
+            "persisted": self.persisted,
+        }
+
+
+lease_manager = LeaseManager(
+    ttl=settings.lease_ttl_seconds,
+    sweep_interval=settings.lease_sweep_interval_seconds,
+    persist_interval=settings.lease_persist_interval_seconds,
+)
+
+Gauge("license_leases_active", "Checkout leases currently held", callback=lambda: lease_manager.stats()["leases"])
+Gauge("license_lease_waiters", "Checkouts queued for a seat", callback=lambda: lease_manager.stats()["waiting"])
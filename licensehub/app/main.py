@@ -1,35 +1,82 @@
 from __future__ import annotations
 
+import time
 from contextlib import asynccontextmanager
 from fastapi import Depends, FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncEngine
 
+from . import IMPORT_STARTED
+from .audit import audit_writer
 from .auth import router as auth_router, get_current_user
+from .changes import change_feed
+from .compliance import stop_runs as stop_compliance_runs
 from .config import settings
-from .db import engine
-from .models import Base
+from .db import ReadYourWritesMiddleware, replicas
+from .directory_sync import directory_sync
+from .leases import lease_manager
+from .ldap_client import close_ldap_client
+from .metrics import MetricsMiddleware, render as render_metrics
 from .routers.products import router as products_router
 from .routers.licenses import router as licenses_router
 from .routers.assignments import router as assignments_router
 from .routers.purchase_orders import router as purchase_orders_router
 from .routers.memos import router as memos_router
+from .routers.exports import router as exports_router
+from .routers.audit import router as audit_router
+from .routers.search import router as search_router
+from .routers.suggest import router as suggest_router
+from .routers.reports import router as reports_router
+from .routers.leases import router as leases_router
+from .routers.changes import router as changes_router
+from .routers.compliance import router as compliance_router
+from .startup import run_startup
+from .typeahead import typeahead
+from .versioning import ConditionalGetMiddleware
 
 
 a_templates = Jinja2Templates(directory="app/templates")
 
 
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Auto-create tables on startup (simple dev convenience)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Tables are created when the model DDL changed (see SCHEMA_STARTUP_MODE)
+    app.state.startup_report = await run_startup(
+        settings.schema_startup_mode,
+        settings.db_pool_warmup,
+        settings.db_precompile,
+        IMPORT_SECONDS,
+    )
+    # Checkouts held before a restart come back with a fresh TTL
+    app.state.startup_report["leases_recovered"] = await lease_manager.recover()
+    lease_manager.start()
+    await change_feed.start()
+    await replicas.start()
+    app.state.startup_report["replicas_healthy"] = dict(replicas.healthy)
+    audit_writer.start()
+    directory_sync.start()
+    typeahead.start()
     yield
+    await typeahead.stop()
+    await directory_sync.stop()
+    await stop_compliance_runs()
+    await change_feed.stop()
+    await lease_manager.stop()
+    await audit_writer.stop()
+    await replicas.stop()
+    close_ldap_client()
 
 
 app = FastAPI(title=settings.site_name, lifespan=lifespan)
+app.add_middleware(ConditionalGetMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+# Added last so it is outermost and also times responses served by the ETag cache
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router)
 app.include_router(products_router)
@@ -37,6 +84,14 @@ app.include_router(licenses_router)
 app.include_router(assignments_router)
 app.include_router(purchase_orders_router)
 app.include_router(memos_router)
+app.include_router(exports_router)
+app.include_router(audit_router)
+app.include_router(search_router)
+app.include_router(suggest_router)
+app.include_router(reports_router)
+app.include_router(leases_router)
+app.include_router(changes_router)
+app.include_router(compliance_router)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -54,4 +109,14 @@ async def index(request: Request):
 
 @app.get("/healthz")
 async def healthz():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/healthz/startup")
+async def startup_report(request: Request):
+    return getattr(request.app.state, "startup_report", {})
\ No newline at end of file
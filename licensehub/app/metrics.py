@@ -0,0 +1,327 @@
+"""Request, SQL, pool and LDAP metrics in the Prometheus text format.
+
+A small in-process registry (counters, gauges, histograms with labels) rather
+than a client library. Everything is updated from the event loop thread:
+the HTTP middleware, SQLAlchemy cursor events (which run in the loop's
+greenlets) and the login path. Per-request SQL totals are accumulated on an
+object kept in a ContextVar that the middleware sets.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Match
+
+from .config import settings
+
+slow_query_logger = logging.getLogger("app.slow_sql")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Gauge(_Metric):
+    """A gauge set directly, or read from ``callback`` at scrape time.
+
+    A callback returns one value, or a dict of label-value tuples to values for a labelled gauge.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], Optional[float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def samples(self) -> Iterable[str]:
+        if self.callback is not None:
+            value = self.callback()
+            if isinstance(value, dict):
+                for labels, item in sorted(value.items()):
+                    if item is not None:
+                        yield f"{self.name}{_labels(self.labelnames, labels)} {_number(item)}"
+            elif value is not None:
+                yield f"{self.name} {_number(value)}"
+            return
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # labels -> [per-bucket counts..., sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0.0] * (len(self.buckets) + 1)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, series in sorted(self._values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {_number(cumulative)}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {_number(cumulative)}"
+
+
+REGISTRY: list[_Metric] = []
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+db_queries = Counter("db_queries_total", "SQL statements executed", ("pool",))
+db_query_latency = Histogram("db_query_duration_seconds", "SQL statement execution time", ("pool",))
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request", ("route",), buckets=COUNT_BUCKETS
+)
+db_time_per_request = Histogram("db_time_per_request_seconds", "Total SQL time per HTTP request", ("route",))
+db_slow_queries = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_SECONDS", ("route",))
+db_pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("pool",))
+
+ldap_bind_latency = Histogram("ldap_bind_duration_seconds", "Login bind and profile lookup time", ("outcome",))
+
+
+class RequestStats:
+    __slots__ = ("scope", "_route", "queries", "db_seconds")
+
+    def __init__(self, scope) -> None:
+        self.scope = scope
+        self._route: Optional[str] = None
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        # Resolved on first use; by the time a handler runs SQL, routing has set scope["route"]
+        if self._route is None:
+            app = self.scope.get("app")
+            route = _route_template(app.router, self.scope) if app is not None else "unmatched"
+            if route == "unmatched" and "route" not in self.scope:
+                return route  # not routed yet, try again later
+            self._route = route
+        return self._route
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+def _route_template(app, scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        # Answered before routing (e.g. a 304 from ConditionalGetMiddleware); match it ourselves
+        for candidate in getattr(app, "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Per-route latency and status counts, in-flight gauge and per-request SQL totals."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+        http_in_flight.inc()
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            http_in_flight.dec()
+            elapsed = time.perf_counter() - started
+            route = stats.route
+            method = scope["method"]
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(elapsed, method, route)
+            db_queries_per_request.observe(stats.queries, route)
+            db_time_per_request.observe(stats.db_seconds, route)
+            current_request.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    pool = _pool_names.get(conn.engine, "primary")
+    db_queries.inc(pool)
+    db_query_latency.observe(elapsed, pool)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    threshold = settings.slow_query_seconds
+    if threshold and elapsed >= threshold:
+        route = stats.route if stats is not None else "background"
+        db_slow_queries.inc(route)
+        slow_query_logger.warning(
+            "slow query %.3fs route=%s: %s", elapsed, route, " ".join(statement.split())[: settings.slow_query_max_chars]
+        )
+
+
+def _handle_error(context):
+    # Keep the start-time stack balanced when a statement fails
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def _timed_do_get(pool, name: str):
+    original = pool._do_get
+
+    def _do_get():
+        started = time.perf_counter()
+        try:
+            return original()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, name)
+
+    return _do_get
+
+
+# sync Engine -> pool label ("primary", "replica0", ...)
+_pool_names: dict[Any, str] = {}
+
+
+def _pool_values(name: str) -> Callable[[], dict[tuple[str, ...], Optional[float]]]:
+    def read() -> dict[tuple[str, ...], Optional[float]]:
+        values = {}
+        for sync_engine, pool in _pool_names.items():
+            method = getattr(sync_engine.pool, name, None)
+            values[(pool,)] = method() if callable(method) else None
+        return values
+
+    return read
+
+
+db_pool_size = Gauge("db_pool_size", "Configured pool size", ("pool",), callback=_pool_values("size"))
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out", "Connections currently checked out", ("pool",), callback=_pool_values("checkedout")
+)
+db_pool_overflow = Gauge(
+    "db_pool_overflow", "Connections open beyond the pool size", ("pool",), callback=_pool_values("overflow")
+)
+db_pool_idle = Gauge("db_pool_idle", "Idle connections in the pool", ("pool",), callback=_pool_values("checkedin"))
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    sync_engine = engine.sync_engine
+    _pool_names[sync_engine] = name
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+    pool = sync_engine.pool
+    # No public hook fires before a checkout starts waiting, so time the pool's getter
+    pool._do_get = _timed_do_get(pool, name)
+
+
+def observe_ldap(seconds: float, outcome: str) -> None:
+    ldap_bind_latency.observe(seconds, outcome)
@@ -4,20 +4,28 @@ from datetime import datetime, date
 from typing import Optional
 
 from sqlalchemy import (
+    BigInteger,
     Date,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
     Text,
     UniqueConstraint,
     func,
+    true,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
+def _fulltext(name: str, *columns: str) -> Index:
+    # MariaDB only; on SQLite, app.search maintains an FTS5 table instead
+    return Index(name, *columns, mysql_prefix="FULLTEXT").ddl_if(dialect="mysql")
+
+
 class Base(DeclarativeBase):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
@@ -34,12 +42,17 @@ class User(Base):
     email: Mapped[Optional[str]] = mapped_column(String(255), index=True)
     department: Mapped[Optional[str]] = mapped_column(String(255))
     is_admin: Mapped[bool] = mapped_column(default=False)
+    # False once the directory reports the account disabled or gone (app.directory_sync)
+    is_active: Mapped[bool] = mapped_column(default=True, server_default=true())
+    # Last directory sync that saw this account; NULL for users only ever seen at login
+    directory_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
     owned_licenses: Mapped[list[License]] = relationship(back_populates="owner_user", cascade="all,delete")  # type: ignore
 
 
 class Vendor(Base):
     __tablename__ = "vendors"
+    __table_args__ = (_fulltext("ft_vendors_text", "name", "notes"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(255), unique=True, index=True)
@@ -51,13 +64,14 @@ class Vendor(Base):
 
 class SoftwareProduct(Base):
     __tablename__ = "products"
+    __table_args__ = (_fulltext("ft_products_text", "name", "notes"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(255), unique=True, index=True)
-    category: Mapped[Optional[str]] = mapped_column(String(100))
+    category: Mapped[Optional[str]] = mapped_column(String(100), index=True)
     notes: Mapped[Optional[str]] = mapped_column(Text())
 
-    vendor_id: Mapped[int | None] = mapped_column(ForeignKey("vendors.id"), nullable=True)
+    vendor_id: Mapped[int | None] = mapped_column(ForeignKey("vendors.id"), nullable=True, index=True)
     vendor: Mapped[Optional[Vendor]] = relationship(back_populates="products")
 
     licenses: Mapped[list[License]] = relationship(back_populates="product", cascade="all,delete")  # type: ignore
@@ -74,10 +88,15 @@ class LicenseType(PyEnum):
     CONCURRENT = "concurrent"
 
 
+# Checked out through app.leases; never assigned to named users
+LEASED_TYPES = frozenset({LicenseType.FLOATING, LicenseType.CONCURRENT})
+
+
 class License(Base):
     __tablename__ = "licenses"
     __table_args__ = (
         UniqueConstraint("product_id", "license_key", name="uq_product_license_key"),
+        _fulltext("ft_licenses_text", "license_key", "notes"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -87,15 +106,17 @@ class License(Base):
     license_key: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     license_type: Mapped[LicenseType] = mapped_column(Enum(LicenseType), default=LicenseType.PER_SEAT)
     seat_count: Mapped[int] = mapped_column(Integer, default=1)
+    # Active (ASSIGNED) assignments; maintained by app.seats, rebuilt by `cli reconcile-seats`
+    seats_in_use: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     start_date: Mapped[Optional[date]] = mapped_column(Date())
     end_date: Mapped[Optional[date]] = mapped_column(Date(), index=True)
-    maintenance_end_date: Mapped[Optional[date]] = mapped_column(Date())
+    maintenance_end_date: Mapped[Optional[date]] = mapped_column(Date(), index=True)
 
-    purchase_order_id: Mapped[int | None] = mapped_column(ForeignKey("purchase_orders.id"))
+    purchase_order_id: Mapped[int | None] = mapped_column(ForeignKey("purchase_orders.id"), index=True)
     purchase_order: Mapped[Optional[PurchaseOrder]] = relationship(back_populates="licenses")  # type: ignore
 
-    owner_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
+    owner_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), index=True)
     owner_user: Mapped[Optional[User]] = relationship(back_populates="owned_licenses")
 
     cost_total: Mapped[Optional[float]] = mapped_column(Numeric(12, 2))
@@ -114,6 +135,13 @@ class AssignmentStatus(PyEnum):
 
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (
+        Index("ix_assignments_license_status", "license_id", "status"),
+        Index("ix_assignments_user_status", "assigned_to_user_id", "status"),
+        Index("ix_assignments_status", "status"),
+        # Archived rows keep their ids, so SQLite must never hand out a used id again
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     license_id: Mapped[int] = mapped_column(ForeignKey("licenses.id"))
@@ -130,14 +158,17 @@ class Assignment(Base):
 
 class PurchaseOrder(Base):
     __tablename__ = "purchase_orders"
+    __table_args__ = (_fulltext("ft_purchase_orders_text", "number", "memo"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     number: Mapped[str] = mapped_column(String(100), unique=True, index=True)
-    vendor_id: Mapped[int | None] = mapped_column(ForeignKey("vendors.id"))
+    vendor_id: Mapped[int | None] = mapped_column(ForeignKey("vendors.id"), index=True)
     vendor: Mapped[Optional[Vendor]] = relationship()
 
     purchaser_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
     requestor_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
+    purchaser_user: Mapped[Optional[User]] = relationship(foreign_keys=[purchaser_user_id])
+    requestor_user: Mapped[Optional[User]] = relationship(foreign_keys=[requestor_user_id])
 
     requested_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     approved_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
@@ -153,9 +184,13 @@ class PurchaseOrder(Base):
 
 class Memo(Base):
     __tablename__ = "memos"
+    __table_args__ = (
+        Index("ix_memos_related", "related_type", "related_id"),
+        _fulltext("ft_memos_content", "content"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    author_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    author_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     author: Mapped[User] = relationship()
 
     related_type: Mapped[str] = mapped_column(String(50))  # e.g., license, product, purchase_order
@@ -166,9 +201,13 @@ class Memo(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        Index("ix_audit_logs_target", "target_type", "target_id"),
+        {"sqlite_autoincrement": True},  # see Assignment
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    actor_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
+    actor_user_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True, index=True)
     actor: Mapped[Optional[User]] = relationship()
 
     action: Mapped[str] = mapped_column(String(100))
@@ -176,4 +215,130 @@ class AuditLog(Base):
     target_id: Mapped[int] = mapped_column(Integer)
 
     before: Mapped[Optional[str]] = mapped_column(Text())
-    after: Mapped[Optional[str]] = mapped_column(Text())
\ No newline at end of file
+    after: Mapped[Optional[str]] = mapped_column(Text())
+
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+
+    currency: Mapped[str] = mapped_column(String(10), primary_key=True)
+    # Units of REPORT_BASE_CURRENCY per one unit of `currency`
+    rate: Mapped[float] = mapped_column(Numeric(18, 8))
+
+
+# Snapshot of the in-memory checkout leases in app.leases, rewritten periodically and on shutdown
+class LicenseLease(Base):
+    __tablename__ = "license_leases"
+
+    id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    license_id: Mapped[int] = mapped_column(ForeignKey("licenses.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    machine: Mapped[Optional[str]] = mapped_column(String(255))
+    checked_out_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+# Append-only change feed for licenses, assignments and purchase orders (see app.changes)
+class ChangeEntry(Base):
+    __tablename__ = "change_journal"
+    __table_args__ = (
+        Index("ix_change_journal_record", "entity", "entity_id", "id"),
+        Index("ix_change_journal_created_at", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(50))
+    entity_id: Mapped[int] = mapped_column(Integer)
+    # insert, update or delete
+    op: Mapped[str] = mapped_column(String(10))
+
+
+# Returned and expired assignments moved out of `assignments` by app.archive; ids are kept.
+# No foreign keys, so archived rows never block deleting a license or user.
+class AssignmentArchive(Base):
+    __tablename__ = "assignments_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    license_id: Mapped[int] = mapped_column(Integer, index=True)
+    assigned_to_user_id: Mapped[int] = mapped_column(Integer, index=True)
+    assigned_machine: Mapped[Optional[str]] = mapped_column(String(255))
+    assigned_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    due_back_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    status: Mapped[AssignmentStatus] = mapped_column(Enum(AssignmentStatus))
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+# Old audit_logs rows moved by app.archive; ids are kept
+class AuditLogArchive(Base):
+    __tablename__ = "audit_logs_archive"
+    __table_args__ = (Index("ix_audit_logs_archive_target", "target_type", "target_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    actor_user_id: Mapped[int | None] = mapped_column(Integer, index=True)
+    action: Mapped[str] = mapped_column(String(100))
+    target_type: Mapped[str] = mapped_column(String(50))
+    target_id: Mapped[int] = mapped_column(Integer)
+    before: Mapped[Optional[str]] = mapped_column(Text())
+    after: Mapped[Optional[str]] = mapped_column(Text())
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+# One inventory reconciliation (app.compliance); the row counters move while it runs
+class ComplianceRun(Base):
+    __tablename__ = "compliance_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    source: Mapped[Optional[str]] = mapped_column(String(500))
+    # reading, aggregating, completed or failed
+    status: Mapped[str] = mapped_column(String(20), default="reading")
+    rows_read: Mapped[int] = mapped_column(Integer, default=0)
+    rows_matched: Mapped[int] = mapped_column(Integer, default=0)
+    rows_unmatched: Mapped[int] = mapped_column(Integer, default=0)
+    rows_invalid: Mapped[int] = mapped_column(Integer, default=0)
+    # JSON: the most frequent inventory product names that matched no product
+    unmatched_products: Mapped[Optional[str]] = mapped_column(Text())
+    error: Mapped[Optional[str]] = mapped_column(Text())
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
+# Per product results of a compliance run; installs are distinct machines
+class ComplianceReportRow(Base):
+    __tablename__ = "compliance_report"
+    __table_args__ = (UniqueConstraint("run_id", "product_id", name="uq_compliance_report_run_product"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("compliance_runs.id", ondelete="CASCADE"))
+    # No foreign keys to the live tables here or below: a report outlives what it describes
+    product_id: Mapped[int] = mapped_column(Integer)
+    installs: Mapped[int] = mapped_column(Integer, default=0)
+    seats: Mapped[int] = mapped_column(Integer, default=0)
+    assigned: Mapped[int] = mapped_column(Integer, default=0)
+    over_deployed: Mapped[int] = mapped_column(Integer, default=0)
+    unused_seats: Mapped[int] = mapped_column(Integer, default=0)
+    unassigned_installs: Mapped[int] = mapped_column(Integer, default=0)
+    stale_assignments: Mapped[int] = mapped_column(Integer, default=0)
+
+
+# Active assignments whose machine doesn't have the product in a run's inventory
+class ComplianceStaleAssignment(Base):
+    __tablename__ = "compliance_stale_assignments"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    run_id: Mapped[int] = mapped_column(ForeignKey("compliance_runs.id", ondelete="CASCADE"), index=True)
+    assignment_id: Mapped[int] = mapped_column(Integer)
+    product_id: Mapped[int] = mapped_column(Integer)
+    machine: Mapped[Optional[str]] = mapped_column(String(255))
+
+
+class JobState(Base):
+    __tablename__ = "job_state"
+
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[Optional[str]] = mapped_column(String(255))
+
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import Select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+
+
+def page_size_query() -> Any:
+    return Query(default=settings.default_page_size, ge=1, le=settings.max_page_size)
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    raw = json.dumps({"s": sort, "v": _dump_value(value), "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict[str, Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise _invalid_cursor()
+    if not isinstance(data, dict) or not {"s", "v", "id"} <= data.keys() or not isinstance(data["id"], int):
+        raise _invalid_cursor()
+    return data
+
+
+def parse_sort(sort: str, sortable: dict[str, Any]) -> tuple[str, bool]:
+    descending = sort.startswith("-")
+    name = sort.lstrip("-")
+    if name not in sortable:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{name}'. Allowed: {', '.join(sorted(sortable))}")
+    return name, descending
+
+
+def _keyset_clause(column, pk, value: Any, last_id: int, descending: bool):
+    # NULL sort keys always come last, ordered by id, regardless of direction
+    if value is None:
+        return and_(column.is_(None), pk < last_id if descending else pk > last_id)
+    if descending:
+        after = or_(column < value, and_(column == value, pk < last_id))
+    else:
+        after = or_(column > value, and_(column == value, pk > last_id))
+    if column.nullable:
+        after = or_(after, column.is_(None))
+    return after
+
+
+def apply_keyset(
+    stmt: Select,
+    pk,
+    *,
+    sort: str,
+    sortable: dict[str, Any],
+    limit: int,
+    cursor: Optional[str],
+) -> tuple[Select, str, bool]:
+    name, descending = parse_sort(sort, sortable)
+    column = sortable[name]
+
+    if cursor:
+        data = decode_cursor(cursor)
+        if data["s"] != sort:
+            raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+        try:
+            value = _load_value(column, data["v"])
+        except (ValueError, TypeError):
+            raise _invalid_cursor()
+        stmt = stmt.where(_keyset_clause(column, pk, value, data["id"], descending))
+
+    order = []
+    if column.nullable:
+        order.append(column.is_(None))
+    if column is not pk:
+        order.append(column.desc() if descending else column.asc())
+    order.append(pk.desc() if descending else pk.asc())
+    return stmt.order_by(*order).limit(limit + 1), name, descending
+
+
+async def paginate(
+    session: AsyncSession,
+    stmt: Select,
+    model,
+    *,
+    sort: str,
+    sortable: dict[str, Any],
+    limit: int,
+    cursor: Optional[str],
+) -> dict[str, Any]:
+    """Run ``stmt`` as one keyset page and return ``{"items": [...], "next_cursor": ...}``.
+
+    Ordering is always ``(sort column, id)`` so the cursor is stable even when
+    the sort column has duplicates.
+    """
+    stmt, name, _ = apply_keyset(stmt, model.id, sort=sort, sortable=sortable, limit=limit, cursor=cursor)
+    result = await session.execute(stmt)
+    rows = list(result.scalars().all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, name), last.id)
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,114 @@
+"""Sparse fieldsets and direct JSON encoding for list endpoints.
+
+List pages are selected as plain column tuples and encoded in one call. That skips
+the ORM identity map, per-row pydantic validation and the stdlib JSON encoder.
+``?fields=`` narrows the SELECT to the requested columns, so large Text columns
+(notes, memos, audit payloads) are only read when a client asks for them.
+
+Values are converted the way the ``*Read`` schemas would convert them
+(Enum -> value, Numeric -> float), and both encoders format dates the way
+pydantic does. A page without ``?fields=`` is therefore byte-for-byte the
+response the ``response_model`` would have produced.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+from sqlalchemy import Enum, Numeric, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .pagination import apply_keyset, encode_cursor
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - pydantic_core's encoder is the fallback
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return to_json(content)
+
+
+def json_response(content: Any) -> Response:
+    return Response(content=dumps(content), media_type="application/json")
+
+
+def fields_query() -> Any:
+    return Query(default=None, description="Comma-separated fields to return; id is always included")
+
+
+def _converter(column) -> Optional[Callable[[Any], Any]]:
+    column_type = column.type
+    if isinstance(column_type, Enum) and column_type.enum_class is not None:
+        return lambda v: None if v is None else v.value
+    if isinstance(column_type, Numeric) and column_type.asdecimal:
+        return lambda v: None if v is None else float(v)
+    return None
+
+
+class Projection:
+    """The columns behind a read schema, in the schema's field order."""
+
+    def __init__(self, model, schema: type[BaseModel]):
+        self.model = model
+        self.columns = {name: getattr(model, name) for name in schema.model_fields}
+        self.converters = {name: c for name, attr in self.columns.items() if (c := _converter(attr))}
+
+    def parse(self, fields: Optional[str]) -> list[str]:
+        if not fields:
+            return list(self.columns)
+        wanted = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = wanted - self.columns.keys()
+        if unknown:
+            detail = f"Unknown field(s) {', '.join(sorted(unknown))}. Allowed: {', '.join(self.columns)}"
+            raise HTTPException(status_code=400, detail=detail)
+        wanted.add("id")
+        return [name for name in self.columns if name in wanted]
+
+    def rows_to_dicts(self, rows, names: list[str]) -> list[dict[str, Any]]:
+        converted = [(i, self.converters[n]) for i, n in enumerate(names) if n in self.converters]
+        if not converted:
+            return [dict(zip(names, row)) for row in rows]
+        items = []
+        for row in rows:
+            values = list(row)
+            for i, convert in converted:
+                values[i] = convert(values[i])
+            items.append(dict(zip(names, values)))
+        return items
+
+
+async def paginate_rows(
+    session: AsyncSession,
+    stmt: Select,
+    projection: Projection,
+    names: list[str],
+    *,
+    sort: str,
+    sortable: dict[str, Any],
+    limit: int,
+    cursor: Optional[str],
+) -> Response:
+    """``paginate`` over column tuples, returning the encoded ``Page`` directly."""
+    columns = [projection.columns[n] for n in names]
+    sort_name = sort.lstrip("-")
+    if sort_name in sortable and sort_name not in names:
+        columns.append(sortable[sort_name])  # needed for the cursor, not returned
+    stmt, name, _ = apply_keyset(
+        stmt.with_only_columns(*columns), projection.model.id, sort=sort, sortable=sortable, limit=limit, cursor=cursor
+    )
+    rows = (await session.execute(stmt)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, name), last.id)
+    items = projection.rows_to_dicts(rows, names)
+    return json_response({"items": items, "next_cursor": next_cursor})
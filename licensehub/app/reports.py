@@ -0,0 +1,328 @@
+"""Aggregate reports computed with GROUP BY in the database.
+
+Amounts are converted to ``REPORT_BASE_CURRENCY`` with a join against the
+small ``fx_rates`` table. Results are cached under the current
+``table_versions`` of every table a report reads, so any write to one of
+them makes the next request compute fresh numbers.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, extract, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .config import settings
+from .models import FxRate, License, PurchaseOrder, SoftwareProduct, User, Vendor
+from .versioning import read_versions
+
+SPEND_DIMENSIONS = ("vendor", "category", "department", "fiscal_year")
+
+report_cache = TTLCache(maxsize=settings.report_cache_size, ttl=settings.report_cache_ttl_seconds)
+
+_L = License.__table__
+_P = SoftwareProduct.__table__
+_V = Vendor.__table__
+_U = User.__table__
+_PO = PurchaseOrder.__table__
+_FX = FxRate.__table__
+
+
+def fiscal_year(column, start_month: int):
+    """Fiscal years are named after the calendar year they end in."""
+    year = extract("year", column)
+    if start_month == 1:
+        return year
+    return year + case((extract("month", column) >= start_month, 1), else_=0)
+
+
+def _number(value: Any, digits: int = 2) -> Optional[float]:
+    if value is None:
+        return None
+    return round(float(value) if isinstance(value, Decimal) else value, digits)
+
+
+def _fx(currency_column, base_currency: str):
+    """(normalized currency code, rate to base) for a row joined to ``fx_rates``."""
+    currency = func.upper(func.coalesce(currency_column, base_currency))
+    return currency, case((currency == base_currency, literal(1)), else_=_FX.c.rate)
+
+
+def _spend_source(source: str, start_month: int) -> dict[str, Any]:
+    if source == "licenses":
+        return {
+            "base": _L,
+            "amount": _L.c.cost_total,
+            "currency": _L.c.currency,
+            "tables": ("licenses", "products", "vendors", "users", "fx_rates"),
+            # dimension -> (expression, joins it needs, in order)
+            "dimensions": {
+                "vendor": (_V.c.name, ("products", "vendors")),
+                "category": (_P.c.category, ("products",)),
+                "department": (_U.c.department, ("users",)),
+                "fiscal_year": (fiscal_year(_L.c.start_date, start_month), ()),
+            },
+            "joins": {
+                "products": (_P, _P.c.id == _L.c.product_id),
+                "vendors": (_V, _V.c.id == _P.c.vendor_id),
+                "users": (_U, _U.c.id == _L.c.owner_user_id),
+            },
+            "vendor_id": _P.c.vendor_id,
+            "vendor_id_joins": ("products",),
+        }
+    return {
+        "base": _PO,
+        "amount": _PO.c.total_cost,
+        "currency": _PO.c.currency,
+        "tables": ("purchase_orders", "vendors", "users", "fx_rates"),
+        "dimensions": {
+            "vendor": (_V.c.name, ("vendors",)),
+            "department": (_U.c.department, ("users",)),
+            "fiscal_year": (fiscal_year(func.coalesce(_PO.c.approved_at, _PO.c.requested_at), start_month), ()),
+        },
+        "joins": {
+            "vendors": (_V, _V.c.id == _PO.c.vendor_id),
+            "users": (_U, _U.c.id == _PO.c.requestor_user_id),
+        },
+        "vendor_id": _PO.c.vendor_id,
+        "vendor_id_joins": (),
+    }
+
+
+def spend_statement(
+    source: str,
+    group_by: list[str],
+    base_currency: str,
+    start_month: int,
+    vendor_id: Optional[int] = None,
+    fiscal_year_filter: Optional[int] = None,
+):
+    spec = _spend_source(source, start_month)
+    unknown = [d for d in group_by if d not in spec["dimensions"]]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot group {source} by {', '.join(unknown)}. Allowed: {', '.join(spec['dimensions'])}",
+        )
+
+    currency, rate = _fx(spec["currency"], base_currency)
+    amount = spec["amount"]
+    converted = amount * rate
+
+    needed: list[str] = []
+    for dimension in group_by:
+        needed.extend(spec["dimensions"][dimension][1])
+    if vendor_id is not None:
+        needed.extend(spec["vendor_id_joins"])
+    from_ = spec["base"]
+    for name in dict.fromkeys(needed):
+        table, on = spec["joins"][name]
+        from_ = from_.outerjoin(table, on)
+    from_ = from_.outerjoin(_FX, _FX.c.currency == currency)
+
+    keys = [spec["dimensions"][d][0].label(d) for d in group_by]
+    columns = [
+        *keys,
+        func.count().label("count"),
+        func.sum(converted).label("amount"),
+        func.sum(case((and_(amount.isnot(None), rate.is_(None)), 1), else_=0)).label("unconverted"),
+    ]
+    if source == "licenses":
+        columns += [func.sum(_L.c.seat_count).label("seats"), func.sum(_L.c.seats_in_use).label("seats_in_use")]
+
+    stmt = select(*columns).select_from(from_)
+    if vendor_id is not None:
+        stmt = stmt.where(spec["vendor_id"] == vendor_id)
+    if fiscal_year_filter is not None:
+        stmt = stmt.where(spec["dimensions"]["fiscal_year"][0] == fiscal_year_filter)
+    if keys:
+        stmt = stmt.group_by(*keys).order_by(*keys)
+    missing = (
+        select(currency.label("currency"))
+        .select_from(spec["base"].outerjoin(_FX, _FX.c.currency == currency))
+        .where(amount.isnot(None), currency != base_currency, _FX.c.rate.is_(None))
+        .distinct()
+    )
+    return stmt, missing, spec["tables"]
+
+
+async def spend_report(
+    session: AsyncSession,
+    source: str,
+    group_by: list[str],
+    vendor_id: Optional[int] = None,
+    fiscal_year_filter: Optional[int] = None,
+) -> dict[str, Any]:
+    base_currency = settings.report_base_currency.upper()
+    start_month = settings.fiscal_year_start_month
+    stmt, missing, tables = spend_statement(
+        source, group_by, base_currency, start_month, vendor_id=vendor_id, fiscal_year_filter=fiscal_year_filter
+    )
+
+    versions = await read_versions(tables, session.bind)
+    params = (source, tuple(group_by), vendor_id, fiscal_year_filter, base_currency, start_month)
+    key = ("spend", params, tuple(sorted(versions.items())))
+    cached = report_cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = []
+    for row in (await session.execute(stmt)).mappings():
+        item = {d: row[d] for d in group_by}
+        if "fiscal_year" in item and item["fiscal_year"] is not None:
+            item["fiscal_year"] = int(item["fiscal_year"])
+        item["count"] = row["count"]
+        item["amount"] = _number(row["amount"]) or 0.0
+        item["unconverted"] = int(row["unconverted"] or 0)
+        if source == "licenses":
+            seats = int(row["seats"] or 0)
+            in_use = int(row["seats_in_use"] or 0)
+            item.update(seats=seats, seats_in_use=in_use, utilization=_number(in_use / seats, 4) if seats else None)
+        rows.append(item)
+
+    report = {
+        "source": source,
+        "group_by": group_by,
+        "base_currency": base_currency,
+        "fiscal_year_start_month": start_month,
+        "rows": rows,
+        "total": round(sum(r["amount"] for r in rows), 2),
+        "missing_rates": [],
+    }
+    if any(r["unconverted"] for r in rows):
+        report["missing_rates"] = sorted((await session.execute(missing)).scalars())
+    report_cache.set(key, report)
+    return report
+
+
+RENEWAL_DATES = {"end": _L.c.end_date, "maintenance": _L.c.maintenance_end_date}
+
+
+def _renewal_from(filters: dict[str, Any], with_product: bool = False):
+    from_ = _L
+    if with_product or filters.get("vendor_id") is not None or filters.get("category") is not None:
+        from_ = from_.join(_P, _P.c.id == _L.c.product_id)
+    return from_
+
+
+def _renewal_where(column, start: date, end: date, filters: dict[str, Any]) -> list:
+    # A plain range on the date column so each branch is an index range scan
+    clauses = [column >= start, column <= end]
+    if filters.get("product_id") is not None:
+        clauses.append(_L.c.product_id == filters["product_id"])
+    if filters.get("owner_user_id") is not None:
+        clauses.append(_L.c.owner_user_id == filters["owner_user_id"])
+    if filters.get("vendor_id") is not None:
+        clauses.append(_P.c.vendor_id == filters["vendor_id"])
+    if filters.get("category") is not None:
+        clauses.append(_P.c.category == filters["category"])
+    return clauses
+
+
+def renewal_statement(kinds: list[str], start: date, end: date, base_currency: str, filters: dict[str, Any]):
+    """Per-day totals for each kind; days are folded into week/month buckets afterwards."""
+    parts = []
+    for kind in kinds:
+        column = RENEWAL_DATES[kind]
+        currency, rate = _fx(_L.c.currency, base_currency)
+        parts.append(
+            select(
+                literal(kind).label("kind"),
+                column.label("day"),
+                func.count().label("count"),
+                func.sum(_L.c.cost_total * rate).label("amount"),
+                func.sum(_L.c.seat_count).label("seats"),
+                func.sum(case((and_(_L.c.cost_total.isnot(None), rate.is_(None)), 1), else_=0)).label("unconverted"),
+            )
+            .select_from(_renewal_from(filters).outerjoin(_FX, _FX.c.currency == currency))
+            .where(*_renewal_where(column, start, end, filters))
+            .group_by(column)
+        )
+    return parts[0] if len(parts) == 1 else union_all(*parts)
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _bucket_end(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=6)
+    following = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return following - timedelta(days=1)
+
+
+async def renewal_forecast(
+    session: AsyncSession, kinds: list[str], start: date, end: date, bucket: str, filters: dict[str, Any]
+) -> dict[str, Any]:
+    base_currency = settings.report_base_currency.upper()
+    tables = ("licenses", "products", "fx_rates")
+    versions = await read_versions(tables, session.bind)
+    params = (tuple(kinds), start, end, bucket, tuple(sorted(filters.items())), base_currency)
+    key = ("renewals", params, tuple(sorted(versions.items())))
+    cached = report_cache.get(key)
+    if cached is not None:
+        return cached
+
+    buckets: dict[tuple[date, str], dict[str, Any]] = {}
+    for row in (await session.execute(renewal_statement(kinds, start, end, base_currency, filters))).mappings():
+        day = row["day"] if isinstance(row["day"], date) else date.fromisoformat(str(row["day"]))
+        first = bucket_start(day, bucket)
+        item = buckets.setdefault(
+            (first, row["kind"]),
+            {
+                "start": first,
+                "end": _bucket_end(first, bucket),
+                "kind": row["kind"],
+                "count": 0,
+                "amount": 0.0,
+                "seats": 0,
+                "unconverted": 0,
+            },
+        )
+        item["count"] += row["count"]
+        item["amount"] += float(row["amount"] or 0)
+        item["seats"] += int(row["seats"] or 0)
+        item["unconverted"] += int(row["unconverted"] or 0)
+
+    rows = [buckets[k] for k in sorted(buckets)]
+    for item in rows:
+        item["amount"] = round(item["amount"], 2)
+    report = {
+        "from": start,
+        "to": end,
+        "bucket": bucket,
+        "kinds": kinds,
+        "base_currency": base_currency,
+        "buckets": rows,
+    }
+    report_cache.set(key, report)
+    return report
+
+
+def renewal_events(kinds: list[str], start: date, end: date, filters: dict[str, Any]):
+    """One row per (license, kind) due in the window, ordered by date, for the CSV/ICS variants."""
+    parts = [
+        select(
+            literal(kind).label("kind"),
+            RENEWAL_DATES[kind].label("day"),
+            _L.c.id.label("license_id"),
+            _P.c.name.label("product"),
+            _L.c.license_key,
+            _L.c.seat_count,
+            _L.c.cost_total,
+            _L.c.currency,
+        )
+        .select_from(_renewal_from(filters, with_product=True))
+        .where(*_renewal_where(RENEWAL_DATES[kind], start, end, filters))
+        for kind in kinds
+    ]
+    stmt = parts[0] if len(parts) == 1 else union_all(*parts)
+    return select(stmt.subquery()).order_by("day", "license_id", "kind")
@@ -1,15 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from datetime import datetime, timezone
+from typing import Optional
 
+from ..archive import with_archive
+from ..bulk_assignments import bulk_assign, bulk_return
+from ..config import settings
 from ..db import get_db_session
-from ..models import Assignment, AssignmentStatus
-from ..schemas import AssignmentCreate, AssignmentRead
+from ..expand import expand_items, expand_query, loader_options, parse_expand
+from ..models import LEASED_TYPES, Assignment, AssignmentStatus, License
+from ..pagination import page_size_query, paginate
+from ..projection import Projection, fields_query, json_response, paginate_rows
+from ..schemas import (
+    AssignmentCreate,
+    AssignmentExpanded,
+    AssignmentRead,
+    BulkAssignmentRequest,
+    BulkAssignmentResult,
+    BulkReturnRequest,
+    Page,
+)
 from ..auth import get_current_user
+from ..seats import claim_seat, release_seat
 
 router = APIRouter(prefix="", tags=["assignments"])
 
+LEASED_DETAIL = "Floating and concurrent licenses are checked out, not assigned"
+
 
 @router.post("/assignments", response_model=AssignmentRead)
 async def create_assignment(
@@ -17,6 +35,13 @@ async def create_assignment(
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ):
+    if not await claim_seat(session, data.license_id):
+        lic = await session.get(License, data.license_id)
+        if lic is None:
+            raise HTTPException(status_code=404, detail="License not found")
+        if lic.license_type in LEASED_TYPES:
+            raise HTTPException(status_code=400, detail=LEASED_DETAIL)
+        raise HTTPException(status_code=409, detail="No seats available on this license")
     assignment = Assignment(
         license_id=data.license_id,
         assigned_to_user_id=data.assigned_to_user_id,
@@ -30,10 +55,108 @@ async def create_assignment(
     return assignment
 
 
-@router.get("/assignments", response_model=list[AssignmentRead])
-async def list_assignments(session: AsyncSession = Depends(get_db_session)):
-    result = await session.execute(select(Assignment))
-    return list(result.scalars().all())
+def _check_bulk_size(count: int) -> None:
+    if count > settings.bulk_assignment_max_items:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.bulk_assignment_max_items} items per request"
+        )
+
+
+@router.post("/assignments/bulk", response_model=BulkAssignmentResult)
+async def bulk_create_assignments(
+    data: BulkAssignmentRequest,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    _check_bulk_size(len(data.items))
+    result = await bulk_assign(session, data.items, atomic=data.atomic)
+    await session.commit()
+    return result
+
+
+@router.post("/assignments/bulk-return", response_model=BulkAssignmentResult)
+async def bulk_return_assignments(
+    data: BulkReturnRequest,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    if data.ids is not None:
+        _check_bulk_size(len(data.ids))
+    result = await bulk_return(session, data)
+    await session.commit()
+    return result
+
+
+def _sorts(model) -> dict:
+    return {"id": model.id, "assigned_at": model.assigned_at, "due_back_at": model.due_back_at}
+
+
+ASSIGNMENT_SORTS = _sorts(Assignment)
+ASSIGNMENT_FIELDS = Projection(Assignment, AssignmentRead)
+# include_archived=true reads assignments UNION ALL assignments_archive through this alias
+ALL_ASSIGNMENTS = with_archive(Assignment, True)
+ALL_ASSIGNMENT_SORTS = _sorts(ALL_ASSIGNMENTS)
+ALL_ASSIGNMENT_FIELDS = Projection(ALL_ASSIGNMENTS, AssignmentRead)
+
+
+@router.get("/assignments", response_model=Page[AssignmentExpanded], response_model_exclude_unset=True)
+async def list_assignments(
+    license_id: Optional[int] = None,
+    assigned_to_user_id: Optional[int] = None,
+    status: Optional[AssignmentStatus] = None,
+    assigned_machine: Optional[str] = None,
+    due_back_before: Optional[datetime] = None,
+    include_archived: bool = False,
+    sort: str = "id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    expand: Optional[str] = expand_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    if include_archived:
+        source, sortable, projection = ALL_ASSIGNMENTS, ALL_ASSIGNMENT_SORTS, ALL_ASSIGNMENT_FIELDS
+    else:
+        source, sortable, projection = Assignment, ASSIGNMENT_SORTS, ASSIGNMENT_FIELDS
+    names = projection.parse(fields)
+    requested = parse_expand(expand, Assignment)
+    stmt = select(source)
+    if license_id is not None:
+        stmt = stmt.where(source.license_id == license_id)
+    if assigned_to_user_id is not None:
+        stmt = stmt.where(source.assigned_to_user_id == assigned_to_user_id)
+    if status is not None:
+        stmt = stmt.where(source.status == status)
+    if assigned_machine is not None:
+        stmt = stmt.where(source.assigned_machine == assigned_machine)
+    if due_back_before is not None:
+        stmt = stmt.where(source.due_back_at < due_back_before)
+    if not requested:
+        return await paginate_rows(
+            session, stmt, projection, names, sort=sort, sortable=sortable, limit=limit, cursor=cursor
+        )
+    stmt = stmt.options(*loader_options(Assignment, requested, source))
+    page = await paginate(session, stmt, source, sort=sort, sortable=sortable, limit=limit, cursor=cursor)
+    page["items"] = expand_items(page["items"], Assignment, requested, names)
+    return json_response(page)
+
+
+@router.get("/assignments/{assignment_id}", response_model=AssignmentExpanded, response_model_exclude_unset=True)
+async def get_assignment(
+    assignment_id: int,
+    include_archived: bool = False,
+    expand: Optional[str] = expand_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    requested = parse_expand(expand, Assignment)
+    source = ALL_ASSIGNMENTS if include_archived else Assignment
+    result = await session.execute(
+        select(source).where(source.id == assignment_id).options(*loader_options(Assignment, requested, source))
+    )
+    assignment = result.scalar_one_or_none()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    return expand_items([assignment], Assignment, requested)[0]
 
 
 @router.post("/assignments/{assignment_id}/return", response_model=AssignmentRead)
@@ -46,6 +169,15 @@ async def return_assignment(
     assignment = result.scalar_one_or_none()
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
+    # Only the request that actually moves the row out of ASSIGNED frees the seat
+    released = await session.execute(
+        update(Assignment)
+        .where(Assignment.id == assignment_id, Assignment.status == AssignmentStatus.ASSIGNED)
+        .values(status=AssignmentStatus.RETURNED)
+        .execution_options(synchronize_session=False)
+    )
+    if released.rowcount:
+        await release_seat(session, assignment.license_id)
     assignment.status = AssignmentStatus.RETURNED
     await session.commit()
     await session.refresh(assignment)
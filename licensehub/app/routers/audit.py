@@ -0,0 +1,74 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from ..archive import run_archive, with_archive
+from ..audit import audit_writer
+from ..db import get_db_session
+from ..models import AuditLog
+from ..pagination import page_size_query
+from ..projection import Projection, fields_query, paginate_rows
+from ..schemas import AuditLogRead, Page
+from ..auth import get_current_user
+
+router = APIRouter(prefix="", tags=["audit"])
+
+AUDIT_SORTS = {"id": AuditLog.id}
+AUDIT_FIELDS = Projection(AuditLog, AuditLogRead)
+# include_archived=true reads audit_logs UNION ALL audit_logs_archive
+ALL_AUDIT = with_archive(AuditLog, True)
+ALL_AUDIT_SORTS = {"id": ALL_AUDIT.id}
+ALL_AUDIT_FIELDS = Projection(ALL_AUDIT, AuditLogRead)
+
+
+@router.get("/audit", response_model=Page[AuditLogRead])
+async def list_audit(
+    target_type: Optional[str] = None,
+    target_id: Optional[int] = None,
+    actor_user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    include_archived: bool = False,
+    sort: str = "-id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    if include_archived:
+        source, sortable, projection = ALL_AUDIT, ALL_AUDIT_SORTS, ALL_AUDIT_FIELDS
+    else:
+        source, sortable, projection = AuditLog, AUDIT_SORTS, AUDIT_FIELDS
+    names = projection.parse(fields)
+    stmt = select(source)
+    if target_type is not None:
+        stmt = stmt.where(source.target_type == target_type)
+    if target_id is not None:
+        stmt = stmt.where(source.target_id == target_id)
+    if actor_user_id is not None:
+        stmt = stmt.where(source.actor_user_id == actor_user_id)
+    if action is not None:
+        stmt = stmt.where(source.action == action)
+    return await paginate_rows(
+        session, stmt, projection, names, sort=sort, sortable=sortable, limit=limit, cursor=cursor
+    )
+
+
+@router.post("/jobs/archive")
+async def run_archival(
+    dry_run: bool = False,
+    assignments_after_days: Optional[int] = Query(default=None, ge=1),
+    audit_after_days: Optional[int] = Query(default=None, ge=1),
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    return await run_archive(
+        session, dry_run=dry_run, assignments_after_days=assignments_after_days, audit_after_days=audit_after_days
+    )
+
+
+@router.get("/audit/stats")
+async def audit_stats():
+    return audit_writer.stats()
@@ -0,0 +1,53 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import get_current_user
+from ..changes import change_feed, check_horizon, head_cursor, parse_entities, read_changes
+from ..db import get_db_session
+from ..pagination import page_size_query
+from ..projection import json_response
+
+router = APIRouter(prefix="", tags=["changes"])
+
+ENTITY_QUERY = "Comma-separated entities to include: licenses, assignments, purchase_orders"
+
+
+@router.get("/changes")
+async def list_changes(
+    since: Optional[int] = Query(default=None, ge=0, description="Cursor from the previous call; omit to get the head"),
+    entity: Optional[str] = Query(default=None, description=ENTITY_QUERY),
+    limit: int = page_size_query(),
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    entities = parse_entities(entity)
+    if since is None:
+        return json_response({"items": [], "cursor": await head_cursor(session), "has_more": False})
+    await check_horizon(session, since)
+    items, cursor, has_more = await read_changes(session, since, limit, entities)
+    return json_response({"items": items, "cursor": cursor, "has_more": has_more})
+
+
+@router.get("/changes/stream")
+async def stream_changes(
+    since: Optional[int] = Query(default=None, ge=0, description="Cursor to resume from; omit to start at the head"),
+    entity: Optional[str] = Query(default=None, description=ENTITY_QUERY),
+    last_event_id: Optional[int] = Header(default=None, ge=0),
+    current_user=Depends(get_current_user),
+):
+    entities = parse_entities(entity)
+    # EventSource sends Last-Event-ID when it reconnects
+    cursor = last_event_id if last_event_id is not None else since
+    return StreamingResponse(
+        change_feed.subscribe(cursor, entities),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/changes/stats")
+async def change_feed_stats():
+    return change_feed.stats()
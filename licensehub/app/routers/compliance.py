@@ -0,0 +1,147 @@
+import asyncio
+import os
+import tempfile
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..compliance import start_run
+from ..db import get_db_session
+from ..models import ComplianceReportRow, ComplianceRun, ComplianceStaleAssignment
+from ..pagination import page_size_query
+from ..projection import Projection, fields_query, paginate_rows
+from ..schemas import ComplianceReportRead, ComplianceRunRead, ComplianceStaleAssignmentRead, Page
+from ..auth import get_current_user
+
+router = APIRouter(prefix="", tags=["compliance"])
+
+INVENTORY_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+RUN_SORTS = {"id": ComplianceRun.id}
+RUN_FIELDS = Projection(ComplianceRun, ComplianceRunRead)
+REPORT_SORTS = {
+    "id": ComplianceReportRow.id,
+    "product_id": ComplianceReportRow.product_id,
+    "installs": ComplianceReportRow.installs,
+    "over_deployed": ComplianceReportRow.over_deployed,
+    "unused_seats": ComplianceReportRow.unused_seats,
+    "unassigned_installs": ComplianceReportRow.unassigned_installs,
+    "stale_assignments": ComplianceReportRow.stale_assignments,
+}
+REPORT_FIELDS = Projection(ComplianceReportRow, ComplianceReportRead)
+STALE_SORTS = {"id": ComplianceStaleAssignment.id}
+STALE_FIELDS = Projection(ComplianceStaleAssignment, ComplianceStaleAssignmentRead)
+UPLOAD_WRITE_BYTES = 1024 * 1024  # upload bytes collected per file write on a worker thread
+
+Finding = Literal["over_deployed", "unused_seats", "unassigned_installs", "stale_assignments"]
+
+
+async def _get_run(session: AsyncSession, run_id: int) -> ComplianceRun:
+    run = await session.get(ComplianceRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Compliance run not found")
+    return run
+
+
+@router.post("/compliance/runs", response_model=ComplianceRunRead, status_code=202)
+async def upload_inventory(
+    request: Request,
+    source: Optional[str] = None,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = INVENTORY_TYPES.get(content_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+    # The run outlives the request, so the upload goes to a real file it can reopen
+    fd, path = tempfile.mkstemp(prefix="inventory-", suffix=f".{fmt}")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pending = bytearray()
+            async for chunk in request.stream():
+                pending += chunk
+                if len(pending) >= UPLOAD_WRITE_BYTES:
+                    data, pending = pending, bytearray()
+                    await asyncio.to_thread(fh.write, data)
+            await asyncio.to_thread(fh.write, pending)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return await start_run(session, path, fmt, source)
+
+
+@router.get("/compliance/runs", response_model=Page[ComplianceRunRead])
+async def list_runs(
+    sort: str = "-id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    names = RUN_FIELDS.parse(fields)
+    return await paginate_rows(
+        session, select(ComplianceRun), RUN_FIELDS, names, sort=sort, sortable=RUN_SORTS, limit=limit, cursor=cursor
+    )
+
+
+@router.get("/compliance/runs/{run_id}", response_model=ComplianceRunRead)
+async def get_run(
+    run_id: int,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    return await _get_run(session, run_id)
+
+
+@router.get("/compliance/runs/{run_id}/report", response_model=Page[ComplianceReportRead])
+async def run_report(
+    run_id: int,
+    finding: Optional[Finding] = None,
+    product_id: Optional[int] = None,
+    sort: str = "product_id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    await _get_run(session, run_id)
+    names = REPORT_FIELDS.parse(fields)
+    stmt = select(ComplianceReportRow).where(ComplianceReportRow.run_id == run_id)
+    if finding is not None:
+        stmt = stmt.where(getattr(ComplianceReportRow, finding) > 0)
+    if product_id is not None:
+        stmt = stmt.where(ComplianceReportRow.product_id == product_id)
+    return await paginate_rows(
+        session, stmt, REPORT_FIELDS, names, sort=sort, sortable=REPORT_SORTS, limit=limit, cursor=cursor
+    )
+
+
+@router.get("/compliance/runs/{run_id}/stale-assignments", response_model=Page[ComplianceStaleAssignmentRead])
+async def run_stale_assignments(
+    run_id: int,
+    product_id: Optional[int] = None,
+    sort: str = "id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    await _get_run(session, run_id)
+    names = STALE_FIELDS.parse(fields)
+    stmt = select(ComplianceStaleAssignment).where(ComplianceStaleAssignment.run_id == run_id)
+    if product_id is not None:
+        stmt = stmt.where(ComplianceStaleAssignment.product_id == product_id)
+    return await paginate_rows(
+        session, stmt, STALE_FIELDS, names, sort=sort, sortable=STALE_SORTS, limit=limit, cursor=cursor
+    )
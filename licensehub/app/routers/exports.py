@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import AsyncIterator, Literal
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Table, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from ..db import AsyncSessionLocal, request_engine
+from ..models import Assignment, License, PurchaseOrder
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+EXPORTABLE: dict[str, Table] = {
+    "licenses": License.__table__,
+    "assignments": Assignment.__table__,
+    "purchase-orders": PurchaseOrder.__table__,
+}
+
+# Rows fetched per round-trip from the server-side cursor
+CHUNK_ROWS = 1000
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+async def _iter_chunks(table: Table, bind: AsyncEngine) -> AsyncIterator[list]:
+    # The session has to live inside the generator: the request-scoped session
+    # from get_db_session is closed before the response body is streamed.
+    async with AsyncSessionLocal(bind=bind) as session:
+        stmt = select(table).order_by(table.c.id).execution_options(yield_per=CHUNK_ROWS)
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            yield rows
+
+
+async def _ndjson(table: Table, bind: AsyncEngine) -> AsyncIterator[bytes]:
+    names = [c.name for c in table.columns]
+    async for rows in _iter_chunks(table, bind):
+        lines = [json.dumps(dict(zip(names, row)), default=_json_default, separators=(",", ":")) for row in rows]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def _csv(table: Table, bind: AsyncEngine) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([c.name for c in table.columns])
+    yield buf.getvalue().encode()
+    async for rows in _iter_chunks(table, bind):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        yield buf.getvalue().encode()
+
+
+async def _gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/{entity}")
+async def export_entity(
+    request: Request,
+    entity: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+):
+    table = EXPORTABLE.get(entity)
+    if table is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{entity}'. Available: {', '.join(EXPORTABLE)}")
+
+    bind = request_engine(request.scope)
+    if format == "csv":
+        body, media_type = _csv(table, bind), "text/csv"
+    else:
+        body, media_type = _ndjson(table, bind), "application/x-ndjson"
+
+    filename = f"{entity}.{format}"
+    if gzip:
+        body, media_type, filename = _gzipped(body), "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import get_current_user
+from ..db import get_db_session
+from ..leases import lease_manager
+from ..schemas import LeaseCheckout, LeaseRead
+
+router = APIRouter(prefix="", tags=["leases"])
+
+
+@router.post("/licenses/{license_id}/checkout", response_model=LeaseRead)
+async def checkout_license(
+    license_id: int,
+    data: LeaseCheckout,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    lease = await lease_manager.checkout(session, license_id, current_user.id, data.machine, data.wait_seconds)
+    return lease.read()
+
+
+@router.post("/leases/{lease_id}/heartbeat", response_model=LeaseRead)
+async def heartbeat_lease(lease_id: str, current_user=Depends(get_current_user)):
+    return lease_manager.heartbeat(lease_id, current_user).read()
+
+
+@router.post("/leases/{lease_id}/checkin", status_code=204)
+async def checkin_lease(lease_id: str, current_user=Depends(get_current_user)):
+    lease_manager.checkin(lease_id, current_user)
+    return Response(status_code=204)
+
+
+@router.get("/licenses/{license_id}/leases", response_model=list[LeaseRead])
+async def list_license_leases(license_id: int):
+    return [lease.read() for lease in lease_manager.leases_for(license_id)]
+
+
+@router.get("/leases/stats")
+async def lease_stats():
+    return lease_manager.stats()
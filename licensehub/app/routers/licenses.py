@@ -1,12 +1,20 @@
-from datetime import datetime, timezone
+import tempfile
+from datetime import date, datetime, timezone
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
 
 from ..db import get_db_session
+from ..expand import expand_items, expand_query, loader_options, parse_expand
+from ..expiration import expired_between, run_expiration
+from ..importer import csv_rows, import_licenses
 from ..models import License, LicenseType
-from ..schemas import LicenseCreate, LicenseRead
+from ..config import settings
+from ..pagination import apply_keyset, encode_cursor, page_size_query, paginate
+from ..projection import Projection, fields_query, json_response, paginate_rows
+from ..schemas import LicenseCreate, LicenseExpanded, LicenseImportResult, LicenseRead, Page, SeatAvailability
 from ..auth import get_current_user
 
 router = APIRouter(prefix="", tags=["licenses"])
@@ -43,19 +51,154 @@ async def create_license(
     return lic
 
 
-@router.get("/licenses", response_model=list[LicenseRead])
-async def list_licenses(session: AsyncSession = Depends(get_db_session)):
-    result = await session.execute(select(License))
-    return list(result.scalars().all())
+@router.post("/licenses/bulk", response_model=LicenseImportResult)
+async def bulk_import_licenses(
+    request: Request,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        rows = await request.json()
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of licenses")
+        return await import_licenses(session, rows)
+    if content_type in ("text/csv", "application/csv"):
+        # Spool the upload so large files spill to disk instead of memory
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            async for chunk in request.stream():
+                spool.write(chunk)
+            spool.seek(0)
+            return await import_licenses(session, csv_rows(spool))
+    raise HTTPException(status_code=415, detail="Send application/json or text/csv")
+
+
+LICENSE_SORTS = {
+    "id": License.id,
+    "end_date": License.end_date,
+    "start_date": License.start_date,
+    "product_id": License.product_id,
+}
+LICENSE_FIELDS = Projection(License, LicenseRead)
+
+
+@router.get("/licenses", response_model=Page[LicenseExpanded], response_model_exclude_unset=True)
+async def list_licenses(
+    product_id: Optional[int] = None,
+    owner_user_id: Optional[int] = None,
+    purchase_order_id: Optional[int] = None,
+    license_type: Optional[LicenseType] = None,
+    end_date_from: Optional[date] = None,
+    end_date_to: Optional[date] = None,
+    sort: str = "id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    expand: Optional[str] = expand_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    names = LICENSE_FIELDS.parse(fields)
+    requested = parse_expand(expand, License)
+    stmt = select(License)
+    if product_id is not None:
+        stmt = stmt.where(License.product_id == product_id)
+    if owner_user_id is not None:
+        stmt = stmt.where(License.owner_user_id == owner_user_id)
+    if purchase_order_id is not None:
+        stmt = stmt.where(License.purchase_order_id == purchase_order_id)
+    if license_type is not None:
+        stmt = stmt.where(License.license_type == license_type)
+    if end_date_from is not None:
+        stmt = stmt.where(License.end_date >= end_date_from)
+    if end_date_to is not None:
+        stmt = stmt.where(License.end_date <= end_date_to)
+    if not requested:
+        return await paginate_rows(
+            session, stmt, LICENSE_FIELDS, names, sort=sort, sortable=LICENSE_SORTS, limit=limit, cursor=cursor
+        )
+    stmt = stmt.options(*loader_options(License, requested))
+    page = await paginate(session, stmt, License, sort=sort, sortable=LICENSE_SORTS, limit=limit, cursor=cursor)
+    page["items"] = expand_items(page["items"], License, requested, names)
+    return json_response(page)
+
+
+def _availability(row) -> SeatAvailability:
+    return SeatAvailability(
+        license_id=row.id,
+        seat_count=row.seat_count,
+        seats_in_use=row.seats_in_use,
+        available=max(row.seat_count - row.seats_in_use, 0),
+    )
+
+
+@router.get("/licenses/availability", response_model=list[SeatAvailability])
+async def bulk_availability(
+    ids: list[int] = Query(..., max_length=settings.max_page_size),
+    session: AsyncSession = Depends(get_db_session),
+):
+    result = await session.execute(
+        select(License.id, License.seat_count, License.seats_in_use).where(License.id.in_(ids)).order_by(License.id)
+    )
+    return [_availability(row) for row in result.all()]
+
+
+@router.get("/licenses/{license_id}/availability", response_model=SeatAvailability)
+async def license_availability(license_id: int, session: AsyncSession = Depends(get_db_session)):
+    result = await session.execute(
+        select(License.id, License.seat_count, License.seats_in_use).where(License.id == license_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="License not found")
+    return _availability(row)
+
+
+@router.get("/licenses/{license_id}", response_model=LicenseExpanded, response_model_exclude_unset=True)
+async def get_license(
+    license_id: int,
+    expand: Optional[str] = expand_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    requested = parse_expand(expand, License)
+    result = await session.execute(
+        select(License).where(License.id == license_id).options(*loader_options(License, requested))
+    )
+    lic = result.scalar_one_or_none()
+    if lic is None:
+        raise HTTPException(status_code=404, detail="License not found")
+    return expand_items([lic], License, requested)[0]
 
 
 @router.get("/jobs/check-expirations")
-async def check_expirations(session: AsyncSession = Depends(get_db_session)):
+async def check_expirations(
+    since: Optional[date] = None,
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_db_session),
+):
     now = datetime.now(timezone.utc).date()
-    result = await session.execute(select(License).where(License.end_date.is_not(None)))
-    to_check = list(result.scalars().all())
-    expired = []
-    for lic in to_check:
-        if lic.end_date and lic.end_date < now:
-            expired.append(lic.id)
-    return {"expired_count": len(expired), "expired_ids": expired}
\ No newline at end of file
+    clause = expired_between(since, now)
+    expired_count = await session.scalar(select(func.count()).select_from(License).where(clause))
+    stmt, _, _ = apply_keyset(
+        select(License.id).where(clause),
+        License.id,
+        sort="id",
+        sortable={"id": License.id},
+        limit=limit,
+        cursor=cursor,
+    )
+    ids = list((await session.execute(stmt)).scalars())
+    next_cursor = None
+    if len(ids) > limit:
+        ids = ids[:limit]
+        next_cursor = encode_cursor("id", ids[-1], ids[-1])
+    return {"expired_count": expired_count, "expired_ids": ids, "next_cursor": next_cursor}
+
+
+@router.post("/jobs/check-expirations")
+async def run_expirations(
+    full: bool = False,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    return await run_expiration(session, full=full)
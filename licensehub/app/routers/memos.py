@@ -1,10 +1,14 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..db import get_db_session
 from ..models import Memo
-from ..schemas import MemoCreate, MemoRead
+from ..pagination import page_size_query
+from ..projection import Projection, fields_query, paginate_rows
+from ..schemas import MemoCreate, MemoRead, Page
 from ..auth import get_current_user
 
 router = APIRouter(prefix="", tags=["memos"])
@@ -23,7 +27,29 @@ async def create_memo(
     return memo
 
 
-@router.get("/memos", response_model=list[MemoRead])
-async def list_memos(session: AsyncSession = Depends(get_db_session)):
-    result = await session.execute(select(Memo).order_by(Memo.id.desc()))
-    return list(result.scalars().all())
\ No newline at end of file
+MEMO_SORTS = {"id": Memo.id}
+MEMO_FIELDS = Projection(Memo, MemoRead)
+
+
+@router.get("/memos", response_model=Page[MemoRead])
+async def list_memos(
+    related_type: Optional[str] = None,
+    related_id: Optional[int] = None,
+    author_user_id: Optional[int] = None,
+    sort: str = "-id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    names = MEMO_FIELDS.parse(fields)
+    stmt = select(Memo)
+    if related_type is not None:
+        stmt = stmt.where(Memo.related_type == related_type)
+    if related_id is not None:
+        stmt = stmt.where(Memo.related_id == related_id)
+    if author_user_id is not None:
+        stmt = stmt.where(Memo.author_user_id == author_user_id)
+    return await paginate_rows(
+        session, stmt, MEMO_FIELDS, names, sort=sort, sortable=MEMO_SORTS, limit=limit, cursor=cursor
+    )
@@ -1,10 +1,14 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..db import get_db_session
 from ..models import Vendor, SoftwareProduct
-from ..schemas import VendorCreate, VendorRead, ProductCreate, ProductRead
+from ..pagination import page_size_query
+from ..projection import Projection, fields_query, paginate_rows
+from ..schemas import Page, VendorCreate, VendorRead, ProductCreate, ProductRead
 from ..auth import get_current_user
 
 router = APIRouter(prefix="", tags=["catalog"])
@@ -24,10 +28,22 @@ async def create_vendor(
     return vendor
 
 
-@router.get("/vendors", response_model=list[VendorRead])
-async def list_vendors(session: AsyncSession = Depends(get_db_session)):
-    result = await session.execute(select(Vendor).order_by(Vendor.name))
-    return list(result.scalars().all())
+VENDOR_SORTS = {"id": Vendor.id, "name": Vendor.name}
+VENDOR_FIELDS = Projection(Vendor, VendorRead)
+
+
+@router.get("/vendors", response_model=Page[VendorRead])
+async def list_vendors(
+    sort: str = "name",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    names = VENDOR_FIELDS.parse(fields)
+    return await paginate_rows(
+        session, select(Vendor), VENDOR_FIELDS, names, sort=sort, sortable=VENDOR_SORTS, limit=limit, cursor=cursor
+    )
 
 
 # Products
@@ -44,7 +60,26 @@ async def create_product(
     return product
 
 
-@router.get("/products", response_model=list[ProductRead])
-async def list_products(session: AsyncSession = Depends(get_db_session)):
-    result = await session.execute(select(SoftwareProduct).order_by(SoftwareProduct.name))
-    return list(result.scalars().all())
\ No newline at end of file
+PRODUCT_SORTS = {"id": SoftwareProduct.id, "name": SoftwareProduct.name}
+PRODUCT_FIELDS = Projection(SoftwareProduct, ProductRead)
+
+
+@router.get("/products", response_model=Page[ProductRead])
+async def list_products(
+    vendor_id: Optional[int] = None,
+    category: Optional[str] = None,
+    sort: str = "name",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    names = PRODUCT_FIELDS.parse(fields)
+    stmt = select(SoftwareProduct)
+    if vendor_id is not None:
+        stmt = stmt.where(SoftwareProduct.vendor_id == vendor_id)
+    if category is not None:
+        stmt = stmt.where(SoftwareProduct.category == category)
+    return await paginate_rows(
+        session, stmt, PRODUCT_FIELDS, names, sort=sort, sortable=PRODUCT_SORTS, limit=limit, cursor=cursor
+    )
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..db import get_db_session
+from ..expand import expand_items, expand_query, loader_options, parse_expand
 from ..models import PurchaseOrder
-from ..schemas import PurchaseOrderCreate, PurchaseOrderRead
+from ..pagination import page_size_query, paginate
+from ..projection import Projection, fields_query, json_response, paginate_rows
+from ..schemas import Page, PurchaseOrderCreate, PurchaseOrderExpanded, PurchaseOrderRead
 from ..auth import get_current_user
 
 router = APIRouter(prefix="", tags=["purchase_orders"])
@@ -23,7 +29,62 @@ async def create_po(
     return po
 
 
-@router.get("/purchase-orders", response_model=list[PurchaseOrderRead])
-async def list_pos(session: AsyncSession = Depends(get_db_session)):
-    result = await session.execute(select(PurchaseOrder).order_by(PurchaseOrder.id.desc()))
-    return list(result.scalars().all())
\ No newline at end of file
+PO_SORTS = {
+    "id": PurchaseOrder.id,
+    "number": PurchaseOrder.number,
+    "requested_at": PurchaseOrder.requested_at,
+}
+PO_FIELDS = Projection(PurchaseOrder, PurchaseOrderRead)
+
+
+@router.get("/purchase-orders", response_model=Page[PurchaseOrderExpanded], response_model_exclude_unset=True)
+async def list_pos(
+    vendor_id: Optional[int] = None,
+    purchaser_user_id: Optional[int] = None,
+    requestor_user_id: Optional[int] = None,
+    requested_from: Optional[datetime] = None,
+    requested_to: Optional[datetime] = None,
+    sort: str = "-id",
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(),
+    expand: Optional[str] = expand_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    names = PO_FIELDS.parse(fields)
+    requested = parse_expand(expand, PurchaseOrder)
+    stmt = select(PurchaseOrder)
+    if vendor_id is not None:
+        stmt = stmt.where(PurchaseOrder.vendor_id == vendor_id)
+    if purchaser_user_id is not None:
+        stmt = stmt.where(PurchaseOrder.purchaser_user_id == purchaser_user_id)
+    if requestor_user_id is not None:
+        stmt = stmt.where(PurchaseOrder.requestor_user_id == requestor_user_id)
+    if requested_from is not None:
+        stmt = stmt.where(PurchaseOrder.requested_at >= requested_from)
+    if requested_to is not None:
+        stmt = stmt.where(PurchaseOrder.requested_at <= requested_to)
+    if not requested:
+        return await paginate_rows(
+            session, stmt, PO_FIELDS, names, sort=sort, sortable=PO_SORTS, limit=limit, cursor=cursor
+        )
+    stmt = stmt.options(*loader_options(PurchaseOrder, requested))
+    page = await paginate(session, stmt, PurchaseOrder, sort=sort, sortable=PO_SORTS, limit=limit, cursor=cursor)
+    page["items"] = expand_items(page["items"], PurchaseOrder, requested, names)
+    return json_response(page)
+
+
+@router.get("/purchase-orders/{po_id}", response_model=PurchaseOrderExpanded, response_model_exclude_unset=True)
+async def get_po(
+    po_id: int,
+    expand: Optional[str] = expand_query(),
+    session: AsyncSession = Depends(get_db_session),
+):
+    requested = parse_expand(expand, PurchaseOrder)
+    result = await session.execute(
+        select(PurchaseOrder).where(PurchaseOrder.id == po_id).options(*loader_options(PurchaseOrder, requested))
+    )
+    po = result.scalar_one_or_none()
+    if po is None:
+        raise HTTPException(status_code=404, detail="Purchase order not found")
+    return expand_items([po], PurchaseOrder, requested)[0]
@@ -0,0 +1,161 @@
+import csv
+import io
+from datetime import date, datetime, timedelta, timezone
+from typing import AsyncIterator, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy import select
+
+from ..config import settings
+from ..db import AsyncSessionLocal, get_db_session
+from ..models import FxRate
+from ..reports import SPEND_DIMENSIONS, renewal_events, renewal_forecast, spend_report
+from ..schemas import FxRateRead, FxRateUpdate
+from ..auth import get_current_user
+
+router = APIRouter(prefix="", tags=["reports"])
+
+
+@router.get("/reports/spend")
+async def spend(
+    source: Literal["licenses", "purchase_orders"] = "licenses",
+    group_by: str = Query("vendor", description=f"Comma separated: {', '.join(SPEND_DIMENSIONS)}"),
+    vendor_id: Optional[int] = None,
+    fiscal_year: Optional[int] = None,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> dict:
+    dimensions = list(dict.fromkeys(d.strip() for d in group_by.split(",") if d.strip()))
+    return await spend_report(session, source, dimensions, vendor_id=vendor_id, fiscal_year_filter=fiscal_year)
+
+
+EVENT_CHUNK_ROWS = 1000
+EVENT_COLUMNS = ["kind", "day", "license_id", "product", "license_key", "seat_count", "cost_total", "currency"]
+_SUMMARY = {"end": "License ends", "maintenance": "Maintenance ends"}
+
+
+async def _iter_events(stmt, bind: AsyncEngine) -> AsyncIterator[list]:
+    # Own session: the request-scoped one is closed before the body streams (see exports)
+    async with AsyncSessionLocal(bind=bind) as session:
+        result = await session.stream(stmt.execution_options(yield_per=EVENT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            yield rows
+
+
+async def _events_csv(stmt, bind: AsyncEngine) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EVENT_COLUMNS)
+    yield buf.getvalue().encode()
+    async for rows in _iter_events(stmt, bind):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(["" if v is None else v for v in row] for row in rows)
+        yield buf.getvalue().encode()
+
+
+def _ics_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_line(line: str) -> str:
+    # RFC 5545: fold lines longer than 75 octets
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line + "\r\n"
+    parts, current = [], b""
+    for ch in line:
+        encoded = ch.encode()
+        if len(current) + len(encoded) > (75 if not parts else 74):
+            parts.append(current.decode())
+            current = b""
+        current += encoded
+    parts.append(current.decode())
+    return "\r\n ".join(parts) + "\r\n"
+
+
+async def _events_ics(stmt, bind: AsyncEngine) -> AsyncIterator[bytes]:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "".join(
+        _ics_line(line)
+        for line in ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:-//{settings.site_name}//Renewals//EN", "CALSCALE:GREGORIAN"]
+    ).encode()
+    async for rows in _iter_events(stmt, bind):
+        out = []
+        for row in rows:
+            day = row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day))
+            title = f"{_SUMMARY[row.kind]}: {row.product}" + (f" ({row.license_key})" if row.license_key else "")
+            details = f"Seats: {row.seat_count}"
+            if row.cost_total is not None:
+                details += f"\nCost: {row.cost_total} {row.currency or ''}".rstrip()
+            for line in [
+                "BEGIN:VEVENT",
+                f"UID:license-{row.license_id}-{row.kind}@{settings.site_name.lower()}",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+                f"DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime('%Y%m%d')}",
+                f"SUMMARY:{_ics_text(title)}",
+                f"DESCRIPTION:{_ics_text(details)}",
+                "END:VEVENT",
+            ]:
+                out.append(_ics_line(line))
+        yield "".join(out).encode()
+    yield _ics_line("END:VCALENDAR").encode()
+
+
+@router.get("/reports/renewals")
+async def renewals(
+    from_: Optional[date] = Query(None, alias="from", description="Defaults to today"),
+    horizon_days: int = Query(90, ge=1, le=3660),
+    bucket: Literal["week", "month"] = "month",
+    kind: list[Literal["end", "maintenance"]] = Query(["end", "maintenance"]),
+    product_id: Optional[int] = None,
+    vendor_id: Optional[int] = None,
+    category: Optional[str] = None,
+    owner_user_id: Optional[int] = None,
+    format: Literal["json", "csv", "ics"] = "json",
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    start = from_ or date.today()
+    end = start + timedelta(days=horizon_days)
+    kinds = list(dict.fromkeys(kind))
+    filters = {"product_id": product_id, "vendor_id": vendor_id, "category": category, "owner_user_id": owner_user_id}
+    if format == "json":
+        return await renewal_forecast(session, kinds, start, end, bucket, filters)
+
+    stmt = renewal_events(kinds, start, end, filters)
+    if format == "csv":
+        body, media_type = _events_csv(stmt, session.bind), "text/csv"
+    else:
+        body, media_type = _events_ics(stmt, session.bind), "text/calendar"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="renewals.{format}"'},
+    )
+
+
+@router.get("/fx-rates", response_model=list[FxRateRead])
+async def list_fx_rates(session: AsyncSession = Depends(get_db_session)):
+    return (await session.execute(select(FxRate).order_by(FxRate.currency))).scalars().all()
+
+
+@router.put("/fx-rates/{currency}", response_model=FxRateRead)
+async def set_fx_rate(
+    currency: str,
+    data: FxRateUpdate,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    fx = await session.get(FxRate, currency.upper())
+    if fx is None:
+        fx = FxRate(currency=currency.upper(), rate=data.rate)
+        session.add(fx)
+    else:
+        fx.rate = data.rate
+    await session.commit()
+    await session.refresh(fx)
+    return fx
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import get_db_session
+from ..pagination import decode_cursor, encode_cursor, page_size_query
+from ..schemas import Page, SearchHit
+from ..search import TYPE_CODES, search
+
+router = APIRouter(prefix="", tags=["search"])
+
+
+@router.get("/search", response_model=Page[SearchHit])
+async def search_all(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[list[str]] = Query(None, description="Restrict to memos, licenses, products, vendors, purchase_orders"),
+    limit: int = page_size_query(),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_db_session),
+):
+    unknown = set(type or ()) - TYPE_CODES.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown type: {', '.join(sorted(unknown))}")
+    offset = 0
+    if cursor:
+        data = decode_cursor(cursor)
+        if data["s"] != "rank" or not isinstance(data["v"], int) or data["v"] < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        offset = data["v"]
+    try:
+        hits = await search(session, q, type, limit + 1, offset)
+    except NotImplementedError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    next_cursor = encode_cursor("rank", offset + limit, 0) if len(hits) > limit else None
+    return {"items": hits[:limit], "next_cursor": next_cursor}
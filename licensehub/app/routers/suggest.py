@@ -0,0 +1,29 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..auth import get_current_user
+from ..schemas import Suggestion
+from ..typeahead import typeahead
+
+router = APIRouter(prefix="", tags=["suggest"])
+
+SUGGEST_TYPES = ("products", "vendors", "users")
+
+
+@router.get("/suggest", response_model=list[Suggestion])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    type: Optional[list[str]] = Query(None, description="products, vendors and/or users"),
+    limit: int = Query(default=10, ge=1, le=50),
+    current_user=Depends(get_current_user),
+):
+    unknown = set(type or ()) - set(SUGGEST_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown type: {', '.join(sorted(unknown))}")
+    return typeahead.suggest(q, type, limit)
+
+
+@router.get("/suggest/stats")
+async def suggest_stats(current_user=Depends(get_current_user)) -> dict:
+    return typeahead.stats()
@@ -1,7 +1,9 @@
 from datetime import date, datetime
-from typing import Optional
+from typing import Generic, Optional, TypeVar
 from pydantic import BaseModel, Field
 
+T = TypeVar("T")
+
 
 class UserCreate(BaseModel):
     sam_account_name: str
@@ -18,6 +20,7 @@ class UserRead(BaseModel):
     email: Optional[str]
     department: Optional[str]
     is_admin: bool
+    is_active: bool = True
 
     class Config:
         from_attributes = True
@@ -67,11 +70,38 @@ class LicenseCreate(BaseModel):
 
 class LicenseRead(LicenseCreate):
     id: int
+    seats_in_use: int = 0
 
     class Config:
         from_attributes = True
 
 
+class LicenseImportRow(LicenseCreate):
+    product_id: Optional[int] = None
+    product: Optional[str] = None
+
+
+class RowError(BaseModel):
+    row: int
+    error: str
+
+
+class LicenseImportResult(BaseModel):
+    received: int = 0
+    upserted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: list[RowError] = []
+    errors_truncated: bool = False
+
+
+class SeatAvailability(BaseModel):
+    license_id: int
+    seat_count: int
+    seats_in_use: int
+    available: int
+
+
 class AssignmentCreate(BaseModel):
     license_id: int
     assigned_to_user_id: int
@@ -87,6 +117,50 @@ class AssignmentRead(AssignmentCreate):
         from_attributes = True
 
 
+class BulkAssignmentRequest(BaseModel):
+    items: list[AssignmentCreate]
+    # Write nothing unless every item can be assigned
+    atomic: bool = False
+
+
+class BulkReturnRequest(BaseModel):
+    # Either explicit ids, or filters selecting active assignments
+    ids: Optional[list[int]] = None
+    license_id: Optional[int] = None
+    assigned_to_user_id: Optional[int] = None
+    assigned_machine: Optional[str] = None
+
+
+class BulkAssignmentOutcome(BaseModel):
+    row: int
+    status: str
+    assignment_id: Optional[int] = None
+    license_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkAssignmentResult(BaseModel):
+    received: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    results: list[BulkAssignmentOutcome] = []
+
+
+class LeaseCheckout(BaseModel):
+    machine: Optional[str] = None
+    # 0 rejects at once when no seat is free; otherwise queue for up to this long
+    wait_seconds: float = Field(default=0, ge=0)
+
+
+class LeaseRead(BaseModel):
+    id: str
+    license_id: int
+    user_id: int
+    machine: Optional[str]
+    checked_out_at: datetime
+    expires_at: datetime
+
+
 class PurchaseOrderCreate(BaseModel):
     number: str
     vendor_id: Optional[int] = None
@@ -107,6 +181,33 @@ class PurchaseOrderRead(PurchaseOrderCreate):
         from_attributes = True
 
 
+# Read models with optional nested relationships for ?expand=; a key is only present when expanded
+class ProductExpanded(ProductRead):
+    vendor: Optional[VendorRead] = None
+
+
+class LicenseExpanded(LicenseRead):
+    product: Optional[ProductExpanded] = None
+    owner: Optional[UserRead] = None
+    purchase_order: Optional["PurchaseOrderExpanded"] = None
+    assignments: Optional[list["AssignmentExpanded"]] = None
+
+
+class AssignmentExpanded(AssignmentRead):
+    license: Optional[LicenseExpanded] = None
+    user: Optional[UserRead] = None
+
+
+class PurchaseOrderExpanded(PurchaseOrderRead):
+    vendor: Optional[VendorRead] = None
+    purchaser: Optional[UserRead] = None
+    requestor: Optional[UserRead] = None
+    licenses: Optional[list[LicenseExpanded]] = None
+
+
+LicenseExpanded.model_rebuild()
+
+
 class MemoCreate(BaseModel):
     related_type: str
     related_id: int
@@ -121,6 +222,97 @@ class MemoRead(MemoCreate):
         from_attributes = True
 
 
+class AuditLogRead(BaseModel):
+    id: int
+    actor_user_id: Optional[int]
+    action: str
+    target_type: str
+    target_id: int
+    before: Optional[str]
+    after: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ComplianceRunRead(BaseModel):
+    id: int
+    source: Optional[str]
+    status: str
+    rows_read: int
+    rows_matched: int
+    rows_unmatched: int
+    rows_invalid: int
+    unmatched_products: Optional[str]
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class ComplianceReportRead(BaseModel):
+    id: int
+    run_id: int
+    product_id: int
+    installs: int
+    seats: int
+    assigned: int
+    over_deployed: int
+    unused_seats: int
+    unassigned_installs: int
+    stale_assignments: int
+
+    class Config:
+        from_attributes = True
+
+
+class ComplianceStaleAssignmentRead(BaseModel):
+    id: int
+    run_id: int
+    assignment_id: int
+    product_id: int
+    machine: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    title: Optional[str] = None
+    snippet: str
+    score: float
+
+
+class FxRateUpdate(BaseModel):
+    rate: float = Field(gt=0)
+
+
+class FxRateRead(BaseModel):
+    currency: str
+    rate: float
+
+    class Config:
+        from_attributes = True
+
+
+class Suggestion(BaseModel):
+    type: str
+    id: int
+    label: str
+    detail: Optional[str] = None
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str] = None
+
+
 class LoginRequest(BaseModel):
     username: str
     password: str
@@ -0,0 +1,243 @@
+"""Full-text search over memos, notes and license/catalog metadata.
+
+SQLite uses an FTS5 table, ``search_index``, that is kept in sync from
+``after_flush`` in the writer's transaction (and by :func:`reindex_documents`
+for Core bulk writes). Its rowid encodes
+``(doc type, id)``, so updates and deletes are rowid lookups. MariaDB uses
+FULLTEXT indexes on the source tables themselves (see ``models.py``),
+which InnoDB maintains on its own.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import License, Memo, PurchaseOrder, SoftwareProduct, Vendor
+
+# model -> (doc type, type code, title column, body column)
+SOURCES: dict[type, tuple[str, int, Optional[str], str]] = {
+    Memo: ("memos", 1, None, "content"),
+    License: ("licenses", 2, "license_key", "notes"),
+    SoftwareProduct: ("products", 3, "name", "notes"),
+    Vendor: ("vendors", 4, "name", "notes"),
+    PurchaseOrder: ("purchase_orders", 5, "number", "memo"),
+}
+TYPE_CODES = {doc_type: code for doc_type, code, _, _ in SOURCES.values()}
+TYPE_NAMES = {code: doc_type for doc_type, code in TYPE_CODES.items()}
+_CODE_SPACE = 8  # rowid = id * 8 + type code
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "title, body, tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+_fts_ready: Optional[bool] = None
+
+
+def _terms(query: str) -> list[str]:
+    return re.findall(r"\w+", query)
+
+
+def _prefixed(terms: list[str], word: str, prefix: str) -> list[str]:
+    # Words the user has finished must match whole; only the one being typed is a prefix
+    return [word.format(t) for t in terms[:-1]] + [prefix.format(terms[-1])]
+
+
+def _render_snippet(raw: str) -> str:
+    return html.escape(raw).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def highlight(value: Optional[str], terms: list[str], width: int = 160) -> str:
+    """Escaped excerpt of ``value`` around the first match with terms wrapped in ``<mark>``."""
+    if not value:
+        return ""
+    words = _prefixed([re.escape(t) for t in terms], r"{}\b", r"{}\w*")
+    pattern = re.compile(r"\b(" + "|".join(words) + ")", re.IGNORECASE)
+    match = pattern.search(value)
+    start = max((match.start() if match else 0) - width // 3, 0)
+    excerpt = value[start : start + width]
+    marked = pattern.sub(lambda m: _MARK_OPEN + m.group(0) + _MARK_CLOSE, excerpt)
+    prefix = "…" if start else ""
+    suffix = "…" if start + width < len(value) else ""
+    return prefix + _render_snippet(marked) + suffix
+
+
+# --- SQLite FTS5 maintenance -------------------------------------------------
+
+
+def _sqlite_fts_ready(conn: Connection) -> bool:
+    global _fts_ready
+    if _fts_ready is None:
+        _fts_ready = (
+            conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'search_index'").first() is not None
+        )
+    return _fts_ready
+
+
+def rebuild_search_index(conn: Connection) -> int:
+    """Repopulate the SQLite FTS table from the source tables (set-based)."""
+    conn.exec_driver_sql("DELETE FROM search_index")
+    total = 0
+    for model, (_, code, title, body) in SOURCES.items():
+        table = model.__tablename__
+        title_sql = title or "NULL"
+        result = conn.exec_driver_sql(
+            f"INSERT INTO search_index (rowid, title, body) "
+            f"SELECT id * {_CODE_SPACE} + {code}, {title_sql}, {body} FROM {table} "
+            f"WHERE COALESCE({title_sql}, {body}) IS NOT NULL"
+        )
+        total += result.rowcount
+    return total
+
+
+def ensure_search_index(conn: Connection) -> None:
+    """Create the FTS table on SQLite (filling it on first creation); no-op elsewhere."""
+    global _fts_ready
+    if conn.dialect.name != "sqlite":
+        return
+    existed = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'search_index'").first()
+    conn.exec_driver_sql(SQLITE_DDL)
+    if not existed:
+        rebuild_search_index(conn)
+    _fts_ready = True
+
+
+def _text_changed(obj, title: Optional[str], body: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in (title, body) if attr)
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_index(session: Session, flush_context) -> None:
+    changed = [
+        (obj, obj in session.deleted)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in SOURCES
+    ]
+    if not changed:
+        return
+    conn = session.connection()
+    if conn.dialect.name != "sqlite" or not _sqlite_fts_ready(conn):
+        return
+    for obj, deleted in changed:
+        _, code, title, body = SOURCES[type(obj)]
+        if not deleted and obj not in session.new and not _text_changed(obj, title, body):
+            continue
+        rowid = obj.id * _CODE_SPACE + code
+        conn.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": rowid})
+        if deleted:
+            continue
+        title_value = getattr(obj, title) if title else None
+        body_value = getattr(obj, body)
+        if title_value is not None or body_value is not None:
+            conn.execute(
+                text("INSERT INTO search_index (rowid, title, body) VALUES (:rowid, :title, :body)"),
+                {"rowid": rowid, "title": title_value, "body": body_value},
+            )
+
+
+async def reindex_documents(session: AsyncSession, model: type, ids: Iterable[int]) -> None:
+    """Refresh the index entries of ``ids`` in the caller's transaction.
+
+    For Core statements (e.g. the bulk license upsert), which ``after_flush``
+    never sees.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    conn = await session.connection()
+    if conn.dialect.name != "sqlite" or not await conn.run_sync(_sqlite_fts_ready):
+        return
+    _, code, title, body = SOURCES[model]
+    title_sql = title or "NULL"
+    params = {"ids": [i * _CODE_SPACE + code for i in ids]}
+    await conn.execute(
+        text("DELETE FROM search_index WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True)), params
+    )
+    await conn.execute(
+        text(
+            f"INSERT INTO search_index (rowid, title, body) "
+            f"SELECT id * {_CODE_SPACE} + {code}, {title_sql}, {body} FROM {model.__tablename__} "
+            f"WHERE id * {_CODE_SPACE} + {code} IN :ids AND COALESCE({title_sql}, {body}) IS NOT NULL"
+        ).bindparams(bindparam("ids", expanding=True)),
+        params,
+    )
+
+
+# --- Queries -------------------------------------------------------------------
+
+
+async def _search_sqlite(session: AsyncSession, terms: list[str], types: list[str], limit: int, offset: int):
+    match = " ".join(_prefixed(terms, '"{}"', '"{}"*'))
+    codes = ", ".join(str(TYPE_CODES[t]) for t in types)
+    result = await session.execute(
+        text(
+            "SELECT rowid, title, "
+            f"snippet(search_index, -1, char(2), char(3), '…', 16) AS snip, bm25(search_index, 5.0, 1.0) AS rank "
+            f"FROM search_index WHERE search_index MATCH :match AND rowid % {_CODE_SPACE} IN ({codes}) "
+            "ORDER BY rank, rowid LIMIT :limit OFFSET :offset"
+        ),
+        {"match": match, "limit": limit, "offset": offset},
+    )
+    return [
+        {
+            "type": TYPE_NAMES[row.rowid % _CODE_SPACE],
+            "id": row.rowid // _CODE_SPACE,
+            "title": row.title,
+            "snippet": _render_snippet(row.snip or ""),
+            "score": round(-row.rank, 6),
+        }
+        for row in result
+    ]
+
+
+async def _search_mysql(session: AsyncSession, terms: list[str], types: list[str], limit: int, offset: int):
+    against = " ".join(_prefixed(terms, "+{}", "+{}*"))
+    parts = []
+    for model, (doc_type, _, title, body) in SOURCES.items():
+        if doc_type not in types:
+            continue
+        columns = f"{title}, {body}" if title else body
+        match = f"MATCH({columns}) AGAINST (:against IN BOOLEAN MODE)"
+        parts.append(
+            f"SELECT '{doc_type}' AS doc_type, id AS doc_id, {title or 'NULL'} AS title, {body} AS body, "
+            f"{match} AS score FROM {model.__tablename__} WHERE {match}"
+        )
+    result = await session.execute(
+        text(" UNION ALL ".join(parts) + " ORDER BY score DESC, doc_type, doc_id LIMIT :limit OFFSET :offset"),
+        {"against": against, "limit": limit, "offset": offset},
+    )
+    return [
+        {
+            "type": row.doc_type,
+            "id": row.doc_id,
+            "title": row.title,
+            "snippet": highlight(row.body or row.title, terms),
+            "score": round(float(row.score), 6),
+        }
+        for row in result
+    ]
+
+
+async def search(
+    session: AsyncSession, query: str, types: Optional[list[str]], limit: int, offset: int
+) -> list[dict[str, Any]]:
+    """Ranked hits for ``query``; every word must match, the last one as a prefix."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    types = types or list(TYPE_CODES)
+    dialect = session.bind.dialect.name
+    if dialect == "sqlite":
+        return await _search_sqlite(session, terms, types, limit, offset)
+    if dialect in ("mysql", "mariadb"):
+        return await _search_mysql(session, terms, types, limit, offset)
+    raise NotImplementedError(f"Full-text search is not available on {dialect}")
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import LEASED_TYPES, Assignment, AssignmentStatus, License
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _active_count():
+    return (
+        select(func.count(Assignment.id))
+        .where(Assignment.license_id == License.id, Assignment.status == AssignmentStatus.ASSIGNED)
+        .correlate(License)
+        .scalar_subquery()
+    )
+
+
+async def claim_seat(session: AsyncSession, license_id: int) -> bool:
+    """Take one seat on ``license_id`` in the caller's transaction.
+
+    The check and the increment are one conditional UPDATE, so concurrent
+    claims serialize on the license row and can never push ``seats_in_use``
+    past ``seat_count``. Returns False when the license is full, missing, or
+    of a type whose seats are leased (``LEASED_TYPES``), never assigned.
+    """
+    return await claim_seats(session, license_id, 1)
+
+
+async def claim_seats(session: AsyncSession, license_id: int, count: int) -> bool:
+    """Take ``count`` seats at once, or none if fewer than that are free."""
+    result = await session.execute(
+        update(License)
+        .where(
+            License.id == license_id,
+            License.license_type.notin_(LEASED_TYPES),
+            License.seats_in_use + count <= License.seat_count,
+        )
+        .values(seats_in_use=License.seats_in_use + count)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+async def release_seat(session: AsyncSession, license_id: int) -> None:
+    await release_seats(session, license_id, 1)
+
+
+async def release_seats(session: AsyncSession, license_id: int, count: int) -> None:
+    await session.execute(
+        update(License)
+        .where(License.id == license_id, License.seats_in_use > 0)
+        .values(seats_in_use=case((License.seats_in_use > count, License.seats_in_use - count), else_=0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def refresh_seat_counters(session: AsyncSession, license_ids: Iterable[int]) -> int:
+    """Recount active assignments for ``license_ids`` in one set-based UPDATE."""
+    ids = list(license_ids)
+    if not ids:
+        return 0
+    result = await session.execute(
+        update(License)
+        .where(License.id.in_(ids))
+        .values(seats_in_use=_active_count())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def reconcile_seat_counters(session: AsyncSession, batch_size: int = RECONCILE_BATCH_SIZE) -> dict:
+    """Rebuild every ``seats_in_use`` from the assignments table, one id range per transaction."""
+    checked = 0
+    corrected = 0
+    last_id = 0
+    while True:
+        ids = list(
+            (
+                await session.execute(
+                    select(License.id).where(License.id > last_id).order_by(License.id).limit(batch_size)
+                )
+            ).scalars()
+        )
+        if not ids:
+            break
+        counted = _active_count()
+        result = await session.execute(
+            update(License)
+            .where(License.id >= ids[0], License.id <= ids[-1], License.seats_in_use != counted)
+            .values(seats_in_use=counted)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        checked += len(ids)
+        corrected += result.rowcount
+        last_id = ids[-1]
+    return {"licenses_checked": checked, "licenses_corrected": corrected}
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import inspect, select, text, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from .db import AsyncSessionLocal, engine
+from .models import Assignment, Base, JobState, License, Memo, PurchaseOrder, SoftwareProduct, User, Vendor
+from .pagination import apply_keyset
+from .search import SQLITE_DDL, ensure_search_index
+from .seats import reconcile_seat_counters
+from .typeahead import typeahead
+from .versioning import VERSIONED_PATHS, ensure_version_rows, read_versions
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_KEY = "schema.fingerprint"
+
+
+def schema_fingerprint(dialect) -> str:
+    """Hash of the DDL this build would emit, so any model change produces a new value."""
+    ddl: list[str] = []
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)).strip())
+        ddl.extend(sorted(str(CreateIndex(index).compile(dialect=dialect)).strip() for index in table.indexes))
+    if dialect.name == "sqlite":
+        ddl.append(SQLITE_DDL)
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+
+async def _stored_fingerprint(db: AsyncEngine) -> str | None:
+    try:
+        async with db.connect() as conn:
+            return await conn.scalar(select(JobState.value).where(JobState.name == FINGERPRINT_KEY))
+    except DBAPIError:
+        return None  # job_state doesn't exist yet
+
+
+def _create_missing_indexes(conn) -> None:
+    # create_all skips tables that already exist, so indexes added to existing models need this
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _missing_columns(conn) -> list[Any]:
+    """Model columns absent from tables that already exist."""
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        live = {c["name"] for c in inspector.get_columns(table.name)}
+        missing.extend(column for column in table.columns if column.name not in live)
+    return missing
+
+
+def _add_missing_columns(conn) -> list[str]:
+    # create_all skips tables that already exist, so columns added to existing models need this.
+    # A NOT NULL column can only be added with a server default to fill the existing rows.
+    added = []
+    for column in _missing_columns(conn):
+        if not column.nullable and column.server_default is None:
+            continue
+        table = conn.dialect.identifier_preparer.format_table(column.table)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"))
+        added.append(f"{column.table.name}.{column.name}")
+    return added
+
+
+def _rebuild_for_autoincrement(conn) -> list[str]:
+    """Recreate SQLite tables whose model asks for AUTOINCREMENT but which were created without it.
+
+    Without AUTOINCREMENT, SQLite reuses the ids of the highest rows once they
+    are deleted, which the archive does. SQLite can't alter a primary key, so
+    the table is copied into a new one; its indexes are recreated afterwards by
+    ``_create_missing_indexes``. The id sequence then starts above the archive's ids too.
+    """
+    from .archive import ARCHIVES
+
+    if conn.dialect.name != "sqlite":
+        return []
+    rebuilt = []
+    for model in ARCHIVES:
+        table = model.__table__
+        if not table.dialect_options["sqlite"]["autoincrement"]:
+            continue
+        ddl = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if ddl is None or "AUTOINCREMENT" in ddl.upper():
+            continue
+        new = f"{table.name}__new"
+        create = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+        conn.exec_driver_sql(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {new} ", 1))
+        columns = ", ".join(c.name for c in table.columns)
+        conn.exec_driver_sql(f"INSERT INTO {new} ({columns}) SELECT {columns} FROM {table.name}")
+        conn.exec_driver_sql(f"DROP TABLE {table.name}")
+        conn.exec_driver_sql(f"ALTER TABLE {new} RENAME TO {table.name}")
+        archived = conn.exec_driver_sql(f"SELECT MAX(id) FROM {ARCHIVES[model].__tablename__}").scalar()
+        if archived is not None:
+            current = conn.exec_driver_sql("SELECT seq FROM sqlite_sequence WHERE name = ?", (table.name,)).scalar()
+            if current is None:
+                conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table.name, archived))
+            elif current < archived:
+                conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (archived, table.name))
+        rebuilt.append(table.name)
+    return rebuilt
+
+
+async def prepare_schema(mode: str, db: AsyncEngine = engine) -> str:
+    """Bring the schema up to date according to ``mode``; returns what was done.
+
+    ``create`` always runs ``create_all`` (one existence check per table) and
+    adds model columns missing from existing tables (and, on SQLite, rebuilds
+    tables that should have AUTOINCREMENT ids), ``fingerprint`` only does
+    so when the stored DDL hash differs from this build's, and ``skip`` leaves
+    the schema to migrations entirely. The hash is stored only once the live
+    tables have every model column; until then each start tries again.
+    """
+    if mode == "skip":
+        return "skipped"
+    fingerprint = schema_fingerprint(db.dialect)
+    if mode == "fingerprint" and await _stored_fingerprint(db) == fingerprint:
+        return "unchanged"
+
+    async with db.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(_add_missing_columns)
+        rebuilt = await conn.run_sync(_rebuild_for_autoincrement)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(ensure_search_index)
+        await ensure_version_rows(conn)
+        missing = [f"{c.table.name}.{c.name}" for c in await conn.run_sync(_missing_columns)]
+    if added:
+        logger.info("added columns: %s", ", ".join(added))
+    if rebuilt:
+        logger.info("recreated with AUTOINCREMENT ids: %s", ", ".join(rebuilt))
+    if "licenses.seats_in_use" in added:
+        # Starts at the server default (0); count the active assignments
+        async with AsyncSession(db) as session:
+            await reconcile_seat_counters(session)
+    if missing:
+        logger.error("schema drift: %s missing and can't be added automatically", ", ".join(missing))
+        return "drift"
+
+    async with db.begin() as conn:
+        table = JobState.__table__
+        result = await conn.execute(
+            update(table).where(table.c.name == FINGERPRINT_KEY).values(value=fingerprint)
+        )
+        if not result.rowcount:
+            await conn.execute(table.insert().values(name=FINGERPRINT_KEY, value=fingerprint))
+    return "migrated" if added or rebuilt else "created"
+
+
+async def warm_pool(count: int, db: AsyncEngine = engine) -> int:
+    """Open ``count`` pooled connections at once so early requests skip the connect handshake."""
+    pool = db.sync_engine.pool
+    if hasattr(pool, "size") and hasattr(pool, "_max_overflow"):
+        count = min(count, pool.size() + max(pool._max_overflow, 0))
+    if count <= 0:
+        return 0
+    conns = await asyncio.gather(*(db.connect() for _ in range(count)))
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        await asyncio.gather(*(conn.close() for conn in conns))
+    return count
+
+
+def hot_statements() -> list[Any]:
+    """Statements shaped exactly like the routers' default queries.
+
+    SQLAlchemy caches compiled SQL by statement structure, not by bound values,
+    so running these once (limit 0, impossible ids) fills the cache for the
+    real requests that follow.
+    """
+    from .routers.assignments import ASSIGNMENT_FIELDS, ASSIGNMENT_SORTS
+    from .routers.licenses import LICENSE_FIELDS, LICENSE_SORTS
+    from .routers.memos import MEMO_FIELDS, MEMO_SORTS
+    from .routers.products import PRODUCT_FIELDS, PRODUCT_SORTS, VENDOR_FIELDS, VENDOR_SORTS
+    from .routers.purchase_orders import PO_FIELDS, PO_SORTS
+
+    listings = [
+        (License, "id", LICENSE_SORTS, LICENSE_FIELDS),
+        (Assignment, "id", ASSIGNMENT_SORTS, ASSIGNMENT_FIELDS),
+        (Memo, "-id", MEMO_SORTS, MEMO_FIELDS),
+        (PurchaseOrder, "-id", PO_SORTS, PO_FIELDS),
+        (SoftwareProduct, "name", PRODUCT_SORTS, PRODUCT_FIELDS),
+        (Vendor, "name", VENDOR_SORTS, VENDOR_FIELDS),
+    ]
+    statements: list[Any] = [select(User).where(User.sam_account_name == "")]
+    for model, sort, sortable, projection in listings:
+        # List pages select the projection's columns (see paginate_rows), detail routes the entity
+        columns = select(*projection.columns.values())
+        stmt, _, _ = apply_keyset(columns, model.id, sort=sort, sortable=sortable, limit=-1, cursor=None)
+        statements.append(stmt)
+        statements.append(select(model).where(model.id == -1))
+    return statements
+
+
+async def precompile_hot_statements() -> int:
+    statements = hot_statements()
+    async with AsyncSessionLocal() as session:
+        for stmt in statements:
+            await session.execute(stmt)
+        await session.rollback()
+    await read_versions(sorted({t for tables in VERSIONED_PATHS.values() for t in tables}))
+    return len(statements) + 1
+
+
+async def run_startup(mode: str, warmup_connections: int, precompile: bool, import_seconds: float) -> dict[str, Any]:
+    report: dict[str, Any] = {"import_seconds": round(import_seconds, 4)}
+    started = time.perf_counter()
+
+    t = time.perf_counter()
+    report["schema"] = await prepare_schema(mode)
+    report["schema_seconds"] = round(time.perf_counter() - t, 4)
+
+    t = time.perf_counter()
+    report["pool_connections_warmed"] = await warm_pool(warmup_connections)
+    report["pool_warmup_seconds"] = round(time.perf_counter() - t, 4)
+
+    if precompile:
+        t = time.perf_counter()
+        report["statements_precompiled"] = await precompile_hot_statements()
+        report["precompile_seconds"] = round(time.perf_counter() - t, 4)
+
+    await typeahead.rebuild()
+    report["typeahead_entries"] = sum(t["entries"] for t in typeahead.stats()["types"].values())
+    report["typeahead_seconds"] = round(typeahead.build_seconds, 4)
+
+    report["startup_seconds"] = round(time.perf_counter() - started, 4)
+    report["ready_seconds"] = round(import_seconds + report["startup_seconds"], 4)
+    logger.info("startup complete: %s", report)
+    return report
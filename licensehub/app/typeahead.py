@@ -0,0 +1,342 @@
+"""Process-local autocomplete index for product, vendor and user names.
+
+Each entity type keeps a sorted list of ``(word, id)`` pairs, so a lookup is a
+binary search followed by a short scan of the words that share the prefix.
+The index is built at startup with plain column selects. Changes committed
+through this process's ORM sessions are applied in ``after_commit`` (the
+same pattern the audit log uses), together with the ``table_versions`` value
+read inside the committing transaction, so a local write doesn't make the
+type look stale. Writes from other worker processes (and bulk statements,
+which the session hooks don't see) are caught by a background task that
+compares ``table_versions`` every ``TYPEAHEAD_REFRESH_SECONDS`` and rebuilds
+the affected type off the event loop; lookups never wait for a rebuild.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import heapq
+import logging
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import SoftwareProduct, TableVersion, User, Vendor
+
+logger = logging.getLogger(__name__)
+
+_PENDING = "typeahead_pending"
+_FLUSHES = "typeahead_flushes"
+_VERSIONS = "typeahead_versions"
+_MAX_LABEL = 200
+_SCAN_LIMIT = 2000
+# Matches collected per type before ranking, as a multiple of the requested limit
+_CANDIDATE_FACTOR = 5
+_SORT_RUN = 5000
+_MAX_CHAR = chr(sys.maxunicode)
+
+
+def normalize(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _words(*values: Optional[str]) -> tuple[str, ...]:
+    words: list[str] = []
+    for value in values:
+        if value:
+            words.extend(w for w in re.split(r"\W+", normalize(value)) if w)
+    return tuple(dict.fromkeys(words))
+
+
+# type -> (model, label column, detail column); users are labelled by display name, else sAMAccountName
+_SOURCES: dict[str, tuple[type, str, Optional[str]]] = {
+    "products": (SoftwareProduct, "name", "category"),
+    "vendors": (Vendor, "name", None),
+    "users": (User, "display_name", "sam_account_name"),
+}
+_TYPE_BY_MODEL = {model: kind for kind, (model, _, _) in _SOURCES.items()}
+
+
+# (label, detail, words, normalized label)
+_Entry = tuple[str, Optional[str], tuple[str, ...], str]
+
+
+def _entry(kind: str, label: Optional[str], detail: Optional[str]) -> Optional[_Entry]:
+    if kind == "users":
+        label = label or detail
+    if not label:
+        return None
+    label = label[:_MAX_LABEL]
+    return label, detail, _words(label, detail), normalize(label)
+
+
+@dataclass
+class _Bucket:
+    entries: dict[int, _Entry] = field(default_factory=dict)
+    keys: list[tuple[str, int]] = field(default_factory=list)
+    truncated: bool = False
+
+    def add(self, entity_id: int, entry, limit: int) -> None:
+        self.remove(entity_id)
+        if entry is None:
+            return
+        if len(self.entries) >= limit:
+            self.truncated = True
+            return
+        self.entries[entity_id] = entry
+        for word in entry[2]:
+            bisect.insort(self.keys, (word, entity_id))
+
+    def load(self, rows, limit: int) -> None:
+        # Bulk build: append everything, sort once
+        for entity_id, entry in rows:
+            if entry is None:
+                continue
+            if len(self.entries) >= limit:
+                self.truncated = True
+                break
+            self.entries[entity_id] = entry
+            self.keys.extend((word, entity_id) for word in entry[2])
+        # A single list.sort() holds the GIL for its whole run; sorting slices and
+        # merging them in Python lets the event loop thread in between.
+        runs = [sorted(self.keys[i : i + _SORT_RUN]) for i in range(0, len(self.keys), _SORT_RUN)]
+        self.keys = list(heapq.merge(*runs))
+
+    def remove(self, entity_id: int) -> None:
+        entry = self.entries.pop(entity_id, None)
+        if entry is None:
+            return
+        for word in entry[2]:
+            i = bisect.bisect_left(self.keys, (word, entity_id))
+            if i < len(self.keys) and self.keys[i] == (word, entity_id):
+                del self.keys[i]
+
+    def span(self, prefix: str) -> tuple[int, int]:
+        """Index range of the words starting with ``prefix``."""
+        return bisect.bisect_left(self.keys, (prefix,)), bisect.bisect_left(self.keys, (prefix + _MAX_CHAR,))
+
+    def candidates(self, terms: tuple[str, ...]) -> Iterator[int]:
+        # Walk the narrowest term's range in word order; the others are checked per entry
+        start, end = min((self.span(t) for t in terms), key=lambda r: r[1] - r[0])
+        seen: set[int] = set()
+        for i in range(start, min(end, start + _SCAN_LIMIT)):
+            entity_id = self.keys[i][1]
+            if entity_id not in seen:
+                seen.add(entity_id)
+                yield entity_id
+
+
+def _build_bucket(kind: str, rows: list[tuple], limit: int, has_detail: bool) -> _Bucket:
+    bucket = _Bucket()
+    bucket.load(((row[0], _entry(kind, row[1], row[2] if has_detail else None)) for row in rows), limit)
+    return bucket
+
+
+def _release(bucket: _Bucket) -> None:
+    # Dropping a replaced bucket in one go frees every tuple inside a single C call
+    while bucket.keys:
+        del bucket.keys[-_SORT_RUN:]
+    while bucket.entries:
+        bucket.entries.popitem()
+
+
+class TypeaheadIndex:
+    def __init__(self, max_entries: int, refresh_seconds: float):
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self._buckets: dict[str, _Bucket] = {kind: _Bucket() for kind in _SOURCES}
+        self._versions: dict[str, int] = {}
+        # kind -> changes applied while that kind is being rebuilt, replayed onto the new bucket
+        self._replay: dict[str, list[tuple[int, Any]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.build_seconds = 0.0
+        self.built = False
+
+    async def rebuild(self, kinds: Optional[list[str]] = None) -> float:
+        from .db import engine
+        from .versioning import read_versions
+
+        started = time.perf_counter()
+        kinds = kinds or list(_SOURCES)
+        versions = await read_versions(kinds)
+        for kind in kinds:
+            self._replay[kind] = []
+        try:
+            async with engine.connect() as conn:
+                for kind in kinds:
+                    model, label, detail = _SOURCES[kind]
+                    columns = [model.id, getattr(model, label)]
+                    if detail:
+                        columns.append(getattr(model, detail))
+                    rows: list[tuple] = []
+                    result = await conn.stream(select(*columns))
+                    async for partition in result.partitions(500):
+                        rows.extend(tuple(row) for row in partition)
+                    # Normalizing and sorting is the slow part; keep it off the event loop
+                    bucket = await asyncio.to_thread(_build_bucket, kind, rows, self.max_entries, bool(detail))
+                    for entity_id, entry in self._replay.pop(kind):
+                        bucket.add(entity_id, entry, self.max_entries)
+                    # Swap whole, readers never see a half-built bucket
+                    old, self._buckets[kind] = self._buckets[kind], bucket
+                    self._versions[kind] = versions.get(kind)
+                    await asyncio.to_thread(_release, old)
+        finally:
+            for kind in kinds:
+                self._replay.pop(kind, None)
+        self.build_seconds = time.perf_counter() - started
+        self.built = True
+        return self.build_seconds
+
+    async def refresh(self) -> list[str]:
+        """Rebuild the types whose table version moved since they were last loaded."""
+        from .versioning import read_versions
+
+        versions = await read_versions(list(_SOURCES))
+        stale = [kind for kind, version in versions.items() if self._versions.get(kind) != version]
+        if stale:
+            await self.rebuild(stale)
+        return stale
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                stale = await self.refresh()
+                if stale:
+                    logger.info("typeahead rebuilt %s in %.3fs", ", ".join(stale), self.build_seconds)
+            except Exception:
+                logger.exception("typeahead refresh failed; retrying in %ss", self.refresh_seconds)
+
+    def start(self) -> None:
+        if self.refresh_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="typeahead-refresh")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def apply(self, changes: list[tuple[str, int, Any]], versions: dict[str, int], flushes: Counter) -> None:
+        """Apply committed changes; ``versions`` were read in the committing transaction."""
+        for kind, entity_id, entry in changes:
+            self._buckets[kind].add(entity_id, entry, self.max_entries)
+            if kind in self._replay:
+                self._replay[kind].append((entity_id, entry))
+        for kind, version in versions.items():
+            # Up to date only if every bump since the last known version was one of ours
+            known = self._versions.get(kind)
+            if kind not in self._replay and known is not None and known + flushes[kind] == version:
+                self._versions[kind] = version
+
+    def suggest(self, query: str, kinds: Optional[list[str]] = None, limit: int = 10) -> list[dict[str, Any]]:
+        terms = _words(query)
+        if not terms:
+            return []
+        whole = normalize(query.strip())
+        hits = []
+        for kind in kinds or list(_SOURCES):
+            bucket = self._buckets[kind]
+            matched = 0
+            for entity_id in bucket.candidates(terms):
+                label, detail, words, norm_label = bucket.entries[entity_id]
+                if not all(any(w.startswith(t) for w in words) for t in terms):
+                    continue
+                rank = 0 if norm_label.startswith(whole) else 1 if words[0].startswith(terms[0]) else 2
+                hits.append((rank, len(label), norm_label, kind, entity_id, label, detail))
+                matched += 1
+                if matched >= limit * _CANDIDATE_FACTOR:
+                    break
+        hits.sort()
+        return [
+            {"type": kind, "id": entity_id, "label": label, "detail": detail}
+            for _, _, _, kind, entity_id, label, detail in hits[:limit]
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        types = {}
+        approx_bytes = 0
+        for kind, bucket in self._buckets.items():
+            size = sys.getsizeof(bucket.keys) + sys.getsizeof(bucket.entries)
+            size += sum(sys.getsizeof(word) + 64 for word, _ in bucket.keys)
+            size += sum(sys.getsizeof(e[0]) + sys.getsizeof(e[1]) + sys.getsizeof(e[3]) + 96 for e in bucket.entries.values())
+            approx_bytes += size
+            types[kind] = {"entries": len(bucket.entries), "words": len(bucket.keys), "truncated": bucket.truncated}
+        return {
+            "types": types,
+            "approx_bytes": approx_bytes,
+            "build_seconds": round(self.build_seconds, 4),
+            "max_entries": self.max_entries,
+        }
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session: Session, flush_context) -> None:
+    changes = []
+    kinds = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        kind = _TYPE_BY_MODEL.get(type(obj))
+        if kind is None:
+            continue
+        # Same test app.versioning uses to decide whether this flush bumps the table
+        if obj in session.new or obj in session.deleted or session.is_modified(obj, include_collections=False):
+            kinds.add(kind)
+        if obj in session.deleted:
+            changes.append((kind, obj.id, None))
+            continue
+        _, label, detail = _SOURCES[kind]
+        changes.append((kind, obj.id, _entry(kind, getattr(obj, label), getattr(obj, detail) if detail else None)))
+    if changes:
+        session.info.setdefault(_PENDING, []).extend(changes)
+        session.info.setdefault(_FLUSHES, Counter()).update(kinds)
+
+
+@event.listens_for(Session, "before_commit")
+def _read_versions(session: Session) -> None:
+    if not typeahead.built:
+        return
+    if any(type(obj) in _TYPE_BY_MODEL for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.flush()  # commit would flush after this hook; the bump has to be in first
+    flushes = session.info.get(_FLUSHES)
+    if not flushes:
+        return
+    table = TableVersion.__table__
+    result = session.connection().execute(
+        select(table.c.table_name, table.c.version).where(
+            table.c.table_name.in_([_SOURCES[kind][0].__tablename__ for kind in flushes])
+        )
+    )
+    tables = {model.__tablename__: kind for kind, (model, _, _) in _SOURCES.items()}
+    session.info[_VERSIONS] = {tables[name]: version for name, version in result.all()}
+
+
+@event.listens_for(Session, "after_commit")
+def _apply(session: Session) -> None:
+    changes = session.info.pop(_PENDING, None)
+    flushes = session.info.pop(_FLUSHES, None) or Counter()
+    versions = session.info.pop(_VERSIONS, None) or {}
+    if changes and typeahead.built:
+        typeahead.apply(changes, versions, flushes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+    session.info.pop(_FLUSHES, None)
+    session.info.pop(_VERSIONS, None)
+
+
+typeahead = TypeaheadIndex(settings.typeahead_max_entries, settings.typeahead_refresh_seconds)
@@ -0,0 +1,173 @@
+"""Per-table version counters and conditional GET for list endpoints.
+
+Every write that goes through an ORM ``Session`` bumps ``table_versions.version``
+for the tables it touched, inside the writer's own transaction. List responses are
+tagged with an ETag derived from those versions and the request's query string, so
+``If-None-Match`` can be answered from the one-row-per-table ``table_versions``
+lookup without querying the listed table at all.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .config import settings
+from .db import engine, request_engine
+from .expand import expansion_tables
+from .models import Assignment, Base, License, PurchaseOrder, TableVersion
+
+VERSIONS_TABLE = TableVersion.__table__
+VERSIONED_TABLES = frozenset(t for t in Base.metadata.tables if t != VERSIONS_TABLE.name)
+
+# GET path -> tables whose content the response is built from
+VERSIONED_PATHS: dict[str, tuple[str, ...]] = {
+    "/vendors": ("vendors",),
+    "/products": ("products",),
+    "/licenses": ("licenses",),
+    "/assignments": ("assignments", "assignments_archive"),
+    "/purchase-orders": ("purchase_orders",),
+    "/memos": ("memos",),
+}
+# Extra tables that ``?expand=`` can pull into the response
+EXPANDED_PATHS: dict[str, tuple[str, ...]] = {
+    "/licenses": expansion_tables(License),
+    "/assignments": expansion_tables(Assignment),
+    "/purchase-orders": expansion_tables(PurchaseOrder),
+}
+
+response_cache = TTLCache(maxsize=settings.response_cache_size, ttl=settings.response_cache_ttl_seconds)
+
+
+def _bump(session: Session, tables: Iterable[str]) -> None:
+    names = sorted(set(tables) & VERSIONED_TABLES)
+    if not names:
+        return
+    # One statement, rows locked in key order, so concurrent writers can't deadlock on it
+    session.connection().execute(
+        update(VERSIONS_TABLE)
+        .where(VERSIONS_TABLE.c.table_name.in_(names))
+        .values(version=VERSIONS_TABLE.c.version + 1)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_after_flush(session: Session, flush_context) -> None:
+    tables = {
+        obj.__table__.name
+        for obj in (*session.new, *session.deleted, *session.dirty)
+        if obj in session.new or obj in session.deleted or session.is_modified(obj, include_collections=False)
+    }
+    _bump(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_after_dml(state) -> None:
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    if table is None or table.name not in VERSIONED_TABLES:
+        return
+    result = state.invoke_statement()
+    _bump(state.session, [table.name])
+    return result
+
+
+async def ensure_version_rows(conn: AsyncConnection) -> None:
+    existing = set((await conn.execute(select(VERSIONS_TABLE.c.table_name))).scalars())
+    missing = VERSIONED_TABLES - existing
+    if not missing:
+        return
+    # Seed from the clock so a recreated database never reuses an old ETag
+    seed = int(time.time() * 1000)
+    try:
+        async with conn.begin_nested():
+            await conn.execute(insert(VERSIONS_TABLE), [{"table_name": t, "version": seed} for t in sorted(missing)])
+    except IntegrityError:
+        pass  # another worker seeded them first
+
+
+async def read_versions(tables: Iterable[str], db: AsyncEngine = engine) -> dict[str, int]:
+    async with db.connect() as conn:
+        result = await conn.execute(
+            select(VERSIONS_TABLE.c.table_name, VERSIONS_TABLE.c.version).where(
+                VERSIONS_TABLE.c.table_name.in_(list(tables))
+            )
+        )
+        return {name: version for name, version in result.all()}
+
+
+def compute_etag(path: str, query: str, versions: dict[str, int]) -> str:
+    params = "&".join(sorted(query.split("&"))) if query else ""
+    material = f"{path}?{params}|" + ",".join(f"{t}={versions.get(t)}" for t in sorted(versions))
+    return '"' + hashlib.sha256(material.encode()).hexdigest()[:32] + '"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip() == etag for candidate in header.split(","))
+
+
+class ConditionalGetMiddleware:
+    """ETag / If-None-Match / body cache for the paths in ``VERSIONED_PATHS``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] not in VERSIONED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        query = scope.get("query_string", b"").decode("latin-1")
+        tables = VERSIONED_PATHS[path]
+        if "expand=" in query:
+            tables = (*tables, *EXPANDED_PATHS.get(path, ()))
+        # Same engine as the handler will get, so the ETag matches the body
+        versions = await read_versions(tables, request_engine(scope))
+        etag = compute_etag(path, query, versions)
+        etag_header = (b"etag", etag.encode())
+        request_headers = dict(scope["headers"])
+
+        if _etag_matches(request_headers.get(b"if-none-match", b"").decode("latin-1"), etag):
+            await send({"type": "http.response.start", "status": 304, "headers": [etag_header]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        cached = response_cache.get(etag)
+        if cached is not None:
+            headers, body = cached
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start: dict = {}
+        chunks: list[bytes] = []
+        size = 0
+
+        async def capture(message):
+            nonlocal size
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), etag_header]
+                start.update(message)
+            elif message["type"] == "http.response.body" and start.get("status") == 200:
+                size += len(message.get("body", b""))
+                if size <= settings.response_cache_max_bytes:
+                    chunks.append(message.get("body", b""))
+                if not message.get("more_body") and size <= settings.response_cache_max_bytes:
+                    response_cache.set(etag, (start["headers"], b"".join(chunks)))
+            await send(message)
+
+        await self.app(scope, receive, capture)
@@ -0,0 +1,4 @@
+"""Reproducible benchmarks: seeded synthetic data plus an in-process load driver.
+
+    python -m bench.run --scale 1k
+"""
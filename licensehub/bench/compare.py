@@ -0,0 +1,62 @@
+"""Compare a benchmark report with a stored baseline."""
+
+from __future__ import annotations
+
+from typing import Any
+
+# Latency metrics get the relative tolerance; query counts are deterministic, so any
+# increase beyond rounding noise from background writers counts as a regression.
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+QUERY_SLACK = 0.5
+MEMORY_METRIC = "peak_rss_kb"
+
+
+def _mismatched_meta(current: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    keys = ("assignments", "seed", "requests", "concurrency", "ldap_latency_ms")
+    return [k for k in keys if current["meta"].get(k) != baseline.get("meta", {}).get(k)]
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[dict[str, Any]]:
+    regressions: list[dict[str, Any]] = []
+    mismatched = _mismatched_meta(current, baseline)
+    if mismatched:
+        regressions.append({"endpoint": None, "metric": "meta", "detail": f"run settings differ: {', '.join(mismatched)}"})
+
+    for name, now in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if before.get(metric) and now[metric] > before[metric] * (1 + tolerance):
+                regressions.append(_entry(name, metric, before[metric], now[metric]))
+        if now["throughput_rps"] < before.get("throughput_rps", 0) * (1 - tolerance):
+            regressions.append(_entry(name, "throughput_rps", before["throughput_rps"], now["throughput_rps"]))
+        if now["queries_per_request"] > before.get("queries_per_request", 0) + QUERY_SLACK:
+            regressions.append(_entry(name, "queries_per_request", before["queries_per_request"], now["queries_per_request"]))
+        if now["errors"] > before.get("errors", 0):
+            regressions.append(_entry(name, "errors", before.get("errors", 0), now["errors"]))
+        if before.get(MEMORY_METRIC) and now.get(MEMORY_METRIC, 0) > before[MEMORY_METRIC] * (1 + tolerance):
+            regressions.append(_entry(name, MEMORY_METRIC, before[MEMORY_METRIC], now[MEMORY_METRIC]))
+    return regressions
+
+
+def _entry(endpoint: str, metric: str, before: float, after: float) -> dict[str, Any]:
+    change = (after - before) / before if before else None
+    return {
+        "endpoint": endpoint,
+        "metric": metric,
+        "baseline": before,
+        "current": after,
+        "change": round(change, 3) if change is not None else None,
+    }
+
+
+def format_regressions(regressions: list[dict[str, Any]]) -> str:
+    lines = [f"{len(regressions)} regression(s) against baseline:"]
+    for r in regressions:
+        if r["metric"] == "meta":
+            lines.append(f"  {r['detail']}")
+            continue
+        change = f" ({r['change']:+.0%})" if r["change"] is not None else ""
+        lines.append(f"  {r['endpoint']}: {r['metric']} {r['baseline']} -> {r['current']}{change}")
+    return "\n".join(lines)
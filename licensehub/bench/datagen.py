@@ -0,0 +1,220 @@
+"""Seeded synthetic data for every table in ``app.models``.
+
+The same ``(scale, seed)`` always produces the same rows, so runs on different
+builds are comparable. Rows go in through Core ``executemany`` inserts, which
+skip the ORM and its session listeners (audit, search sync, typeahead).
+Startup rebuilds whatever derived state it needs afterwards.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Iterator
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models import (
+    Assignment,
+    AssignmentStatus,
+    FxRate,
+    License,
+    LicenseType,
+    Memo,
+    PurchaseOrder,
+    SoftwareProduct,
+    User,
+    Vendor,
+)
+
+# Scale name -> number of assignments; the other tables are sized from it
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+CHUNK = 5000
+EPOCH = date(2024, 1, 1)
+
+_WORDS = (
+    "adobe autodesk microsoft oracle jetbrains atlassian renewal true-up audit invoice quote "
+    "enterprise campus seat floating concurrent subscription perpetual maintenance support "
+    "creative cloud office visual studio database server design engineering finance legal"
+).split()
+_DEPARTMENTS = ["IT", "Finance", "Engineering", "Design", "Legal", "Sales", "HR", None]
+_CATEGORIES = ["Graphics", "Office", "Development", "Database", "CAD", "Security", None]
+_CURRENCIES = ["USD", "USD", "USD", "EUR", "GBP", None]
+
+
+def parse_scale(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value)
+
+
+def sizes(assignments: int) -> dict[str, int]:
+    return {
+        "users": max(50, assignments // 20),
+        "vendors": max(10, assignments // 1000),
+        "products": max(20, assignments // 200),
+        "purchase_orders": max(20, assignments // 100),
+        "licenses": max(100, assignments // 10),
+        "assignments": assignments,
+        "memos": max(50, assignments // 10),
+    }
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _chunks(rows: Iterator[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    chunk: list[dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _insert(engine: AsyncEngine, model, rows: Iterator[dict[str, Any]]) -> int:
+    count = 0
+    for chunk in _chunks(rows):
+        async with engine.begin() as conn:
+            await conn.execute(insert(model.__table__), chunk)
+        count += len(chunk)
+    return count
+
+
+async def generate(engine: AsyncEngine, assignments: int, seed: int = 42) -> dict[str, Any]:
+    """Fill an empty schema; returns row counts and the time taken."""
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    n = sizes(assignments)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    await _insert(engine, FxRate, iter([{"currency": "EUR", "rate": 1.08}, {"currency": "GBP", "rate": 1.27}]))
+    await _insert(
+        engine,
+        User,
+        (
+            {
+                "id": i,
+                "sam_account_name": f"user{i:07d}",
+                "display_name": f"{rng.choice(_WORDS).title()} User{i}",
+                "email": f"user{i}@example.test",
+                "department": rng.choice(_DEPARTMENTS),
+                "is_admin": i == 1,
+            }
+            for i in range(1, n["users"] + 1)
+        ),
+    )
+    await _insert(
+        engine,
+        Vendor,
+        ({"id": i, "name": f"{rng.choice(_WORDS).title()} Vendor {i}", "notes": _text(rng, 8)} for i in range(1, n["vendors"] + 1)),
+    )
+    await _insert(
+        engine,
+        SoftwareProduct,
+        (
+            {
+                "id": i,
+                "name": f"{rng.choice(_WORDS).title()} Product {i}",
+                "category": rng.choice(_CATEGORIES),
+                "notes": _text(rng, 8),
+                "vendor_id": rng.randint(1, n["vendors"]),
+            }
+            for i in range(1, n["products"] + 1)
+        ),
+    )
+    await _insert(
+        engine,
+        PurchaseOrder,
+        (
+            {
+                "id": i,
+                "number": f"PO-{i:08d}",
+                "vendor_id": rng.randint(1, n["vendors"]),
+                "requestor_user_id": rng.randint(1, n["users"]),
+                "purchaser_user_id": rng.randint(1, n["users"]),
+                "requested_at": now - timedelta(days=rng.randint(0, 900)),
+                "total_cost": round(rng.uniform(100, 50000), 2),
+                "currency": rng.choice(_CURRENCIES),
+                "memo": _text(rng, 12),
+            }
+            for i in range(1, n["purchase_orders"] + 1)
+        ),
+    )
+
+    seat_counts = [0] * (n["licenses"] + 1)
+
+    def licenses() -> Iterator[dict[str, Any]]:
+        for i in range(1, n["licenses"] + 1):
+            start = EPOCH + timedelta(days=rng.randint(-365, 365))
+            end = start + timedelta(days=rng.choice([365, 730, 1095]))
+            seat_counts[i] = rng.randint(5, 40)
+            yield {
+                "id": i,
+                "product_id": rng.randint(1, n["products"]),
+                "license_key": f"BENCH-{i:09d}",
+                "license_type": rng.choice(list(LicenseType)),
+                "seat_count": seat_counts[i],
+                "seats_in_use": 0,
+                "start_date": start,
+                "end_date": end,
+                "maintenance_end_date": end - timedelta(days=rng.choice([0, 30, 90])),
+                "purchase_order_id": rng.randint(1, n["purchase_orders"]),
+                "owner_user_id": rng.randint(1, n["users"]),
+                "cost_total": round(rng.uniform(50, 20000), 2),
+                "currency": rng.choice(_CURRENCIES),
+                "notes": _text(rng, 10),
+            }
+
+    await _insert(engine, License, licenses())
+
+    in_use = [0] * (n["licenses"] + 1)
+
+    def assignments_rows() -> Iterator[dict[str, Any]]:
+        for i in range(1, n["assignments"] + 1):
+            license_id = rng.randint(1, n["licenses"])
+            status = rng.choice([AssignmentStatus.RETURNED, AssignmentStatus.EXPIRED])
+            if in_use[license_id] < seat_counts[license_id] and rng.random() < 0.7:
+                status = AssignmentStatus.ASSIGNED
+                in_use[license_id] += 1
+            assigned_at = now - timedelta(minutes=rng.randint(0, 600_000))
+            yield {
+                "id": i,
+                "license_id": license_id,
+                "assigned_to_user_id": rng.randint(1, n["users"]),
+                "assigned_machine": f"WS-{rng.randint(1, 99999):05d}",
+                "assigned_at": assigned_at,
+                "due_back_at": assigned_at + timedelta(days=rng.randint(7, 365)),
+                "status": status,
+            }
+
+    await _insert(engine, Assignment, assignments_rows())
+
+    table = License.__table__
+    counters = [{"lid": i, "n": c} for i, c in enumerate(in_use) if c]
+    stmt = update(table).where(table.c.id == bindparam("lid")).values(seats_in_use=bindparam("n"))
+    for start in range(0, len(counters), CHUNK):
+        async with engine.begin() as conn:
+            await conn.execute(stmt, counters[start : start + CHUNK])
+
+    related = [("license", n["licenses"]), ("product", n["products"]), ("purchase_order", n["purchase_orders"])]
+    await _insert(
+        engine,
+        Memo,
+        (
+            {
+                "id": i,
+                "author_user_id": rng.randint(1, n["users"]),
+                "related_type": kind,
+                "related_id": rng.randint(1, count),
+                "content": _text(rng, 25),
+            }
+            for i, (kind, count) in ((i, rng.choice(related)) for i in range(1, n["memos"] + 1))
+        ),
+    )
+
+    return {"rows": n, "seed": seed, "seconds": round(time.perf_counter() - started, 3)}
@@ -0,0 +1,334 @@
+"""Drive the app in-process against a generated SQLite database and report latency per endpoint.
+
+Run from the project root::
+
+    python -m bench.run --scale 1k --out bench-1k.json
+    python -m bench.run --scale 1k --baseline bench-1k.json      # exit 1 on regression
+    python -m bench.run --scale 100k --db /tmp/bench-100k.db --requests 500
+
+The app is imported only after ``DATABASE_URL`` points at the benchmark database.
+LDAP is replaced by an in-memory fake, so ``/auth/login`` measures our side of the
+login and not the directory's.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .compare import compare, format_regressions
+
+DATASET_KEY = "bench.dataset"
+
+
+class FakeLdap:
+    """Stands in for ``app.ldap_client.LdapClient``; every non-empty password is accepted."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def authenticate(self, username: str, password: str) -> dict[str, Optional[str]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not password:
+            return {}
+        return {"sam": username, "display_name": username.title(), "email": f"{username}@example.test", "department": "IT"}
+
+    def close(self) -> None:
+        pass
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    # (rng, table sizes) -> (path, query params, json body)
+    build: Callable[[random.Random, dict[str, int]], tuple[str, dict[str, Any], Any]]
+
+
+def _pick(rng: random.Random, sizes: dict[str, int], table: str) -> int:
+    return rng.randint(1, sizes[table])
+
+
+_SEARCH_TERMS = ["adobe", "renewal", "office", "audit", "creative cloud", "enterprise seat", "micro"]
+
+ENDPOINTS = [
+    Endpoint("healthz", "GET", lambda rng, n: ("/healthz", {}, None)),
+    Endpoint("auth_me", "GET", lambda rng, n: ("/auth/me", {}, None)),
+    Endpoint(
+        "auth_login",
+        "POST",
+        lambda rng, n: ("/auth/login", {}, {"username": f"user{_pick(rng, n, 'users'):07d}", "password": "x"}),
+    ),
+    Endpoint("licenses_page", "GET", lambda rng, n: ("/licenses", {"product_id": _pick(rng, n, "products")}, None)),
+    Endpoint(
+        "licenses_by_end_date",
+        "GET",
+        lambda rng, n: ("/licenses", {"sort": "-end_date", "limit": rng.choice([20, 50, 100])}, None),
+    ),
+    Endpoint(
+        "licenses_expanded",
+        "GET",
+        lambda rng, n: ("/licenses", {"expand": "product.vendor,owner,purchase_order", "limit": 100}, None),
+    ),
+    Endpoint(
+        "assignments_by_license",
+        "GET",
+        lambda rng, n: ("/assignments", {"license_id": _pick(rng, n, "licenses"), "status": "assigned"}, None),
+    ),
+    Endpoint(
+        "license_availability",
+        "GET",
+        lambda rng, n: (f"/licenses/{_pick(rng, n, 'licenses')}/availability", {}, None),
+    ),
+    Endpoint(
+        "memos_for_license",
+        "GET",
+        lambda rng, n: ("/memos", {"related_type": "license", "related_id": _pick(rng, n, "licenses")}, None),
+    ),
+    Endpoint("search", "GET", lambda rng, n: ("/search", {"q": rng.choice(_SEARCH_TERMS), "limit": 20}, None)),
+    Endpoint("suggest", "GET", lambda rng, n: ("/suggest", {"q": rng.choice(["ad", "micro", "user1", "of", "vend"])}, None)),
+    Endpoint(
+        "report_spend",
+        "GET",
+        lambda rng, n: ("/reports/spend", {"group_by": rng.choice(["vendor", "category,fiscal_year", "department"])}, None),
+    ),
+    Endpoint(
+        "report_renewals",
+        "GET",
+        lambda rng, n: ("/reports/renewals", {"from": "2025-01-01", "horizon_days": rng.choice([30, 90, 365])}, None),
+    ),
+]
+
+
+def _rss_kb() -> Optional[int]:
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB elsewhere
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+class QueryCounter:
+    def __init__(self, engine) -> None:
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+async def measure(client, endpoint: Endpoint, sizes, *, requests: int, concurrency: int, warmup: int, seed: int, counter):
+    rng = random.Random(f"{seed}:{endpoint.name}")
+    calls = [endpoint.build(rng, sizes) for _ in range(warmup + requests)]
+
+    async def call(path, params, body):
+        started = time.perf_counter()
+        response = await client.request(endpoint.method, path, params=params, json=body)
+        await response.aread()
+        return time.perf_counter() - started, response.status_code
+
+    for path, params, body in calls[:warmup]:
+        await call(path, params, body)
+
+    pending = iter(calls[warmup:])
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def worker():
+        for path, params, body in pending:
+            seconds, status = await call(path, params, body)
+            latencies.append(seconds)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    queries = counter.count - queries_before
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": sum(c for s, c in statuses.items() if s >= 400),
+        "statuses": {str(s): c for s, c in sorted(statuses.items())},
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "max_ms": round(ms[-1], 3) if ms else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "queries_per_request": round(queries / len(latencies), 2) if latencies else 0.0,
+        "rss_kb": _rss_kb(),
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def _configure_environment(db_path: Path) -> None:
+    # Must happen before anything imports app.config
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["SCHEMA_STARTUP_MODE"] = "create"
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    os.environ.setdefault("AD_SERVER_URI", "ldap://bench.invalid")
+    os.environ.setdefault("AD_BASE_DN", "DC=bench,DC=invalid")
+
+
+async def _prepare_dataset(engine, assignments: int, seed: int) -> dict[str, Any]:
+    from sqlalchemy import select
+
+    from app.models import Base, JobState
+
+    from .datagen import generate, sizes
+
+    wanted = f"{assignments}:{seed}"
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        existing = await conn.scalar(select(JobState.value).where(JobState.name == DATASET_KEY))
+    if existing == wanted:
+        return {"rows": sizes(assignments), "seed": seed, "seconds": 0.0, "reused": True}
+    if existing is not None:
+        raise SystemExit(f"{engine.url.database} holds dataset {existing}, not {wanted}; use another --db")
+
+    info = await generate(engine, assignments, seed)
+    async with engine.begin() as conn:
+        await conn.execute(JobState.__table__.insert().values(name=DATASET_KEY, value=wanted))
+    return {**info, "reused": False}
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    from .datagen import parse_scale
+
+    assignments = parse_scale(args.scale)
+    tmp = None
+    if args.db:
+        db_path = Path(args.db).resolve()
+    else:
+        tmp = tempfile.TemporaryDirectory(prefix="licensehub-bench-")
+        db_path = Path(tmp.name) / "bench.db"
+    _configure_environment(db_path)
+
+    import httpx
+    import sqlalchemy
+
+    from app import ldap_client
+    from app.db import engine
+    from app.main import app
+
+    try:
+        dataset = await _prepare_dataset(engine, assignments, args.seed)
+        ldap_client._client = FakeLdap(args.ldap_latency_ms / 1000)  # type: ignore[assignment]
+        counter = QueryCounter(engine)
+
+        selected = [e for e in ENDPOINTS if not args.endpoint or e.name in args.endpoint]
+        results: dict[str, Any] = {}
+        async with app.router.lifespan_context(app):
+            startup = getattr(app.state, "startup_report", None)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                login = await client.post("/auth/login", json={"username": "user0000001", "password": "x"})
+                login.raise_for_status()
+                client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+                for endpoint in selected:
+                    results[endpoint.name] = await measure(
+                        client,
+                        endpoint,
+                        dataset["rows"],
+                        requests=args.requests,
+                        concurrency=args.concurrency,
+                        warmup=args.warmup,
+                        seed=args.seed,
+                        counter=counter,
+                    )
+        await engine.dispose()
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    return {
+        "meta": {
+            "scale": args.scale,
+            "assignments": assignments,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "ldap_latency_ms": args.ldap_latency_ms,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "dataset": dataset,
+        "startup": startup,
+        "endpoints": results,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m bench.run")
+    parser.add_argument("--scale", default="1k", help="1k, 10k, 100k, 1m or a number of assignments")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Keep the generated database here and reuse it on later runs")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ldap-latency-ms", type=float, default=0.0, help="Simulated directory bind time")
+    parser.add_argument("--endpoint", action="append", help="Only run this endpoint (repeatable)")
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Compare against this earlier report")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    report = asyncio.run(run(args))
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(report, baseline, args.tolerance)
+        report["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance, "regressions": regressions}
+        if regressions:
+            print(format_regressions(regressions), file=sys.stderr)
+            exit_code = 1
+
+    text = json.dumps(report, indent=2, default=lambda v: v.isoformat() if isinstance(v, date) else str(v))
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# Settings are read at import time, so point the app at a scratch database first
+_DB_DIR = tempfile.mkdtemp(prefix="licensehub-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_DIR}/test.db"
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("AD_SERVER_URI", "ldap://localhost")
+os.environ.setdefault("AD_BASE_DN", "DC=test,DC=local")
+os.environ["DATABASE_READ_URLS"] = ""
+os.environ["RESPONSE_CACHE_SIZE"] = "0"
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
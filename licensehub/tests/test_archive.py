@@ -0,0 +1,85 @@
+"""Archived rows keep their ids, so new rows must never be given one of them again."""
+
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.schema import CreateTable
+
+from app.archive import archive_assignments
+from app.auth import get_current_user
+from app.db import AsyncSessionLocal
+from app.main import app
+from app.models import Assignment, AssignmentArchive, AssignmentStatus, Base, License, SoftwareProduct, User
+from app.startup import _rebuild_for_autoincrement, prepare_schema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def client():
+    await prepare_schema("create")
+    async with AsyncSessionLocal() as session:
+        user = User(sam_account_name="archive-user", display_name="Archive User")
+        session.add(user)
+        await session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def test_new_rows_do_not_reuse_archived_ids(client):
+    async with AsyncSessionLocal() as session:
+        user = await session.get(User, app.dependency_overrides[get_current_user]().id)
+        license = License(
+            product=SoftwareProduct(name="Archive Product"),
+            license_key="ARCHIVE-KEY",
+            seat_count=5,
+            end_date=date(2030, 1, 1),
+        )
+        old = Assignment(
+            license=license,
+            assigned_to_user=user,
+            status=AssignmentStatus.RETURNED,
+            updated_at=datetime.now(timezone.utc) - timedelta(days=400),
+        )
+        session.add(old)
+        await session.commit()
+        license_id, old_id = license.id, old.id
+
+        # The archived row was the newest, the one SQLite would otherwise hand out again
+        assert (await archive_assignments(session, 30, 100))["rows"] >= 1
+        new = Assignment(license_id=license_id, assigned_to_user_id=user.id)
+        session.add(new)
+        await session.commit()
+        assert new.id > old_id
+
+    response = await client.get("/assignments", params={"license_id": license_id, "include_archived": "true"})
+    assert response.status_code == 200, response.text
+    assert sorted(item["id"] for item in response.json()["items"]) == [old_id, new.id]
+    response = await client.get(f"/assignments/{old_id}", params={"include_archived": "true"})
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "returned"
+
+
+def test_existing_table_is_rebuilt_above_the_archive(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    table = Assignment.__table__
+    now = datetime.now(timezone.utc)
+    row = {"license_id": 1, "assigned_to_user_id": 1, "assigned_at": now, "status": AssignmentStatus.RETURNED}
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        # The table as earlier builds created it, without AUTOINCREMENT
+        conn.execute(text(f"DROP TABLE {table.name}"))
+        conn.exec_driver_sql(str(CreateTable(table).compile(dialect=conn.dialect)).replace(" AUTOINCREMENT", ""))
+        conn.execute(insert(table).values(id=3, **row))
+        conn.execute(insert(AssignmentArchive.__table__).values(id=7, archived_at=now, **row))
+
+        assert table.name in _rebuild_for_autoincrement(conn)
+        assert conn.execute(text(f"SELECT id FROM {table.name}")).scalars().all() == [3]
+        conn.execute(insert(table).values(**row))
+        assert conn.execute(text(f"SELECT MAX(id) FROM {table.name}")).scalar() == 8
+        assert _rebuild_for_autoincrement(conn) == []
+    engine.dispose()
@@ -0,0 +1,33 @@
+"""The change feed is only served to signed-in users."""
+
+import httpx
+import pytest
+
+from app.auth import get_current_user
+from app.main import app
+from app.models import User
+from app.startup import prepare_schema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client():
+    await prepare_schema("create")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize("path", ["/changes", "/changes?since=0", "/changes/stream"])
+async def test_anonymous_requests_are_refused(client, path):
+    assert (await client.get(path)).status_code == 401
+
+
+async def test_signed_in_user_gets_the_head(client):
+    app.dependency_overrides[get_current_user] = lambda: User(sam_account_name="feed-reader")
+    try:
+        response = await client.get("/changes")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200, response.text
+    assert response.json()["items"] == [] and response.json()["cursor"] >= 0
@@ -0,0 +1,152 @@
+"""Directory sync against an in-memory ldap3 directory (``MOCK_SYNC``)."""
+
+from typing import Iterator
+
+import httpx
+import pytest
+from ldap3 import MOCK_SYNC, MODIFY_REPLACE, OFFLINE_AD_2012_R2, Connection, Server
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import directory_sync as sync_module
+from app.auth import get_current_user
+from app.config import settings
+from app.directory_sync import ACCOUNTDISABLE, sync_directory
+from app.ldap_client import LdapClient
+from app.main import app
+from app.models import User
+from app.startup import prepare_schema
+
+BASE_DN = "ou=people,dc=example,dc=com"
+SERVICE_DN = "cn=licensehub,dc=example,dc=com"
+ACCOUNTS = 25
+DISABLED_EVERY = 5  # every fifth account is disabled in AD
+
+pytestmark = pytest.mark.anyio
+
+
+def _accounts(count: int) -> Iterator[tuple[str, dict]]:
+    for i in range(count):
+        flags = 512 | (ACCOUNTDISABLE if i % DISABLED_EVERY == 0 else 0)
+        yield f"cn=user{i},{BASE_DN}", {
+            "objectClass": ["top", "person", "organizationalPerson", "user"],
+            "objectCategory": "person",
+            "sAMAccountName": f"user{i}",
+            "displayName": f"User {i}",
+            "mail": f"user{i}@example.com",
+            "department": "IT" if i % 2 else "Finance",
+            "userAccountControl": flags,
+            "uSNChanged": 1000 + i,
+        }
+
+
+@pytest.fixture
+def directory(monkeypatch):
+    server = Server("mock-dc", get_info=OFFLINE_AD_2012_R2)
+    admin = Connection(server, user=SERVICE_DN, password="secret", client_strategy=MOCK_SYNC)
+    admin.strategy.add_entry(SERVICE_DN, {"userPassword": "secret", "sAMAccountName": "licensehub"})
+    for dn, attrs in _accounts(ACCOUNTS):
+        admin.strategy.add_entry(dn, attrs)
+    admin.bind()  # for the tests' own modify/delete calls
+    # Small pages and batches, so a run spans several of each
+    monkeypatch.setattr(settings, "directory_sync_page_size", 10)
+    monkeypatch.setattr(settings, "directory_sync_batch_size", 7)
+    client = LdapClient(
+        "mock-dc",
+        BASE_DN,
+        service_account_dn=SERVICE_DN,
+        service_account_password="secret",
+        client_strategy=MOCK_SYNC,
+        server=server,
+    )
+    yield admin, client
+    client.close()
+    admin.unbind()
+
+
+@pytest.fixture
+async def session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'directory.db'}")
+    await prepare_schema("create", engine)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def _users(session: AsyncSession) -> dict[str, User]:
+    await session.rollback()
+    return {u.sam_account_name: u for u in (await session.execute(select(User))).scalars()}
+
+
+async def test_full_run_upserts_every_account(directory, session):
+    _, client = directory
+    result = await sync_directory(session, client)
+
+    assert result["mode"] == "full"
+    assert result["synced"] == ACCOUNTS
+    assert result["disabled"] == len(range(0, ACCOUNTS, DISABLED_EVERY))
+    assert result["watermark"] == 1000 + ACCOUNTS - 1
+    users = await _users(session)
+    assert len(users) == ACCOUNTS
+    assert users["user3"].display_name == "User 3" and users["user3"].email == "user3@example.com"
+    assert users["user3"].is_active and not users["user5"].is_active
+    assert all(u.directory_synced_at is not None for u in users.values())
+
+
+async def test_incremental_run_with_unchanged_watermark_fetches_nothing(directory, session):
+    _, client = directory
+    first = await sync_directory(session, client)
+    second = await sync_directory(session, client)
+
+    assert second["mode"] == "incremental"
+    assert second["synced"] == 0
+    assert second["watermark"] == first["watermark"]
+    assert len(await _users(session)) == ACCOUNTS
+
+
+async def test_incremental_run_picks_up_changed_entries(directory, session):
+    admin, client = directory
+    await sync_directory(session, client)
+    changes = {"displayName": [(MODIFY_REPLACE, ["Renamed"])], "uSNChanged": [(MODIFY_REPLACE, [2000])]}
+    assert admin.modify(f"cn=user3,{BASE_DN}", changes)
+
+    result = await sync_directory(session, client)
+    assert (result["mode"], result["synced"], result["watermark"]) == ("incremental", 1, 2000)
+    assert (await _users(session))["user3"].display_name == "Renamed"
+
+
+async def test_full_run_deactivates_removed_users(directory, session):
+    admin, client = directory
+    session.add(User(sam_account_name="local-only", display_name="Never in AD"))
+    await session.commit()
+    await sync_directory(session, client)
+    assert admin.delete(f"cn=user7,{BASE_DN}")
+
+    # A deleted entry doesn't match an incremental search, so only a full run notices
+    assert (await sync_directory(session, client))["deactivated"] == 0
+    assert (await _users(session))["user7"].is_active
+    result = await sync_directory(session, client, full=True)
+
+    assert result["mode"] == "full"
+    assert result["deactivated"] == 1
+    users = await _users(session)
+    assert not users["user7"].is_active and not users["local-only"].is_active
+    assert users["user3"].is_active
+
+
+async def test_endpoint_is_admin_only(monkeypatch):
+    async def run(full: bool = False) -> dict:
+        return {"mode": "full" if full else "incremental"}
+
+    monkeypatch.setattr(sync_module.directory_sync, "run", run)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        try:
+            app.dependency_overrides[get_current_user] = lambda: User(sam_account_name="someone", is_admin=False)
+            assert (await client.post("/auth/directory-sync")).status_code == 403
+            app.dependency_overrides[get_current_user] = lambda: User(sam_account_name="admin", is_admin=True)
+            response = await client.post("/auth/directory-sync", params={"full": "true"})
+        finally:
+            app.dependency_overrides.clear()
+    assert response.status_code == 200, response.text
+    assert response.json() == {"mode": "full"}
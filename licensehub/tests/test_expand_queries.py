@@ -0,0 +1,82 @@
+"""``?expand=`` must cost the same number of queries whatever the page size (no N+1)."""
+
+from datetime import date
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+from app.auth import get_current_user
+from app.db import AsyncSessionLocal, engine
+from app.expand import ASSIGNMENT_EXPANSIONS, LICENSE_EXPANSIONS, _paths
+from app.main import app
+from app.models import Assignment, License, PurchaseOrder, SoftwareProduct, User, Vendor
+from app.startup import prepare_schema
+
+PAGE_SIZES = (1, 10, 100)
+ROWS = 120  # more than the largest page, so every page is full
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def client():
+    await prepare_schema("create")
+    async with AsyncSessionLocal() as session:
+        # Every relationship is set on every row: selectinload skips its query
+        # when a page has no keys to load, which would skew the counts
+        users = [User(sam_account_name=f"user{i}", display_name=f"User {i}") for i in range(ROWS)]
+        vendors = [Vendor(name=f"Vendor {i}") for i in range(ROWS)]
+        products = [SoftwareProduct(name=f"Product {i}", vendor=vendors[i]) for i in range(ROWS)]
+        orders = [PurchaseOrder(number=f"PO-{i}", vendor=vendors[i]) for i in range(ROWS)]
+        licenses = [
+            License(
+                product=products[i],
+                license_key=f"KEY-{i}",
+                seat_count=5,
+                end_date=date(2030, 1, 1),
+                owner_user=users[i],
+                purchase_order=orders[i],
+            )
+            for i in range(ROWS)
+        ]
+        session.add_all(users + vendors + products + orders + licenses)
+        session.add_all(Assignment(license=licenses[i], assigned_to_user=users[(i + 1) % ROWS]) for i in range(ROWS))
+        await session.commit()
+        owner = users[0]
+
+    app.dependency_overrides[get_current_user] = lambda: owner
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def _count_queries(client: httpx.AsyncClient, path: str, params: dict) -> int:
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = await client.get(path, params=params)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    assert response.status_code == 200, response.text
+    assert len(response.json()["items"]) == params["limit"]
+    return len(statements)
+
+
+@pytest.mark.parametrize(
+    "path, expand",
+    [("/licenses", e) for e in [None, *_paths(LICENSE_EXPANSIONS)]]
+    + [("/assignments", e) for e in [None, *_paths(ASSIGNMENT_EXPANSIONS)]],
+)
+async def test_query_count_does_not_grow_with_page_size(client, path, expand):
+    counts = {}
+    for size in PAGE_SIZES:
+        params = {"limit": size}
+        if expand:
+            params["expand"] = expand
+        counts[size] = await _count_queries(client, path, params)
+    assert len(set(counts.values())) == 1, counts
@@ -0,0 +1,63 @@
+"""Floating and concurrent seats are checked out, never assigned; other types the other way round."""
+
+from datetime import date
+
+import httpx
+import pytest
+
+from app.auth import get_current_user
+from app.db import AsyncSessionLocal
+from app.main import app
+from app.models import LEASED_TYPES, License, LicenseType, SoftwareProduct, User
+from app.routers.assignments import LEASED_DETAIL
+from app.startup import prepare_schema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def seeded():
+    await prepare_schema("create")
+    async with AsyncSessionLocal() as session:
+        user = User(sam_account_name="lease-user", display_name="Lease User")
+        product = SoftwareProduct(name="Lease Product")
+        licenses = {
+            kind: License(
+                product=product,
+                license_key=f"LEASE-{kind.value}",
+                license_type=kind,
+                seat_count=2,
+                end_date=date(2030, 1, 1),
+            )
+            for kind in LicenseType
+        }
+        session.add_all([user, *licenses.values()])
+        await session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client, user, {kind: lic.id for kind, lic in licenses.items()}
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("kind", sorted(LEASED_TYPES, key=lambda k: k.value))
+async def test_leased_types_refuse_named_assignments(seeded, kind):
+    client, user, ids = seeded
+    item = {"license_id": ids[kind], "assigned_to_user_id": user.id}
+
+    response = await client.post("/assignments", json=item)
+    assert response.status_code == 400
+    assert response.json()["detail"] == LEASED_DETAIL
+    response = await client.post("/assignments/bulk", json={"items": [item]})
+    assert response.status_code == 200, response.text
+    assert response.json()["results"][0]["error"] == "License is checked out, not assigned"
+
+
+@pytest.mark.parametrize("kind", [k for k in LicenseType if k not in LEASED_TYPES])
+async def test_other_types_are_assigned_not_checked_out(seeded, kind):
+    client, user, ids = seeded
+
+    response = await client.post(f"/licenses/{ids[kind]}/checkout", json={})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Only floating and concurrent licenses are checked out"
+    response = await client.post("/assignments", json={"license_id": ids[kind], "assigned_to_user_id": user.id})
+    assert response.status_code == 200, response.text
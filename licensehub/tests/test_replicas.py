@@ -0,0 +1,77 @@
+"""GETs read a replica unless the client asked for, or just wrote to, the primary."""
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import db
+from app.auth import get_current_user
+from app.db import STICKY_COOKIE, AsyncSessionLocal, ReplicaSet
+from app.main import app
+from app.models import User, Vendor
+from app.startup import prepare_schema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def replica(tmp_path_factory):
+    # A second SQLite file with different contents stands in for a lagging replica
+    await prepare_schema("create")
+    async with AsyncSessionLocal() as session:
+        user = User(sam_account_name="replica-user", display_name="Replica User")
+        session.add_all([user, Vendor(name="Only On Primary")])
+        await session.commit()
+    url = f"sqlite+aiosqlite:///{tmp_path_factory.mktemp('replica') / 'replica.db'}"
+    replica_engine = create_async_engine(url)
+    await prepare_schema("create", replica_engine)
+    async with AsyncSession(replica_engine) as session:
+        session.add(Vendor(name="Only On Replica"))
+        await session.commit()
+    await replica_engine.dispose()
+
+    replicas = ReplicaSet([url], check_interval=5)
+    app.dependency_overrides[get_current_user] = lambda: user
+    yield replicas
+    app.dependency_overrides.clear()
+    await replicas.stop()
+
+
+@pytest.fixture
+async def client(replica, monkeypatch):
+    monkeypatch.setattr(db, "replicas", replica)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def _vendors(client: httpx.AsyncClient, **headers: str) -> set[str]:
+    response = await client.get("/vendors", params={"sort": "-id", "limit": 20}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {item["name"] for item in response.json()["items"]}
+
+
+async def test_get_reads_the_replica(client):
+    names = await _vendors(client)
+    assert "Only On Replica" in names and "Only On Primary" not in names
+
+
+@pytest.mark.parametrize("value", ["1", "true", "TRUE"])
+async def test_read_primary_header(client, value):
+    names = await _vendors(client, **{"X-Read-Primary": value})
+    assert "Only On Primary" in names and "Only On Replica" not in names
+
+
+@pytest.mark.parametrize("value", ["0", "false", "no", ""])
+async def test_read_primary_header_ignores_other_values(client, value):
+    assert "Only On Replica" in await _vendors(client, **{"X-Read-Primary": value})
+
+
+async def test_write_sends_the_next_reads_to_the_primary(client):
+    response = await client.post("/vendors", json={"name": "Just Written"})
+    assert response.status_code == 200, response.text
+    assert STICKY_COOKIE in response.cookies
+
+    names = await _vendors(client)
+    assert {"Just Written", "Only On Primary"} <= names and "Only On Replica" not in names
+    client.cookies.clear()
+    assert "Only On Replica" in await _vendors(client)
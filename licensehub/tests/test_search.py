@@ -0,0 +1,51 @@
+"""Every word of ``/search?q=`` must match whole, except the last, which is a prefix."""
+
+import httpx
+import pytest
+
+from app.auth import get_current_user
+from app.db import AsyncSessionLocal
+from app.main import app
+from app.models import User, Vendor
+from app.search import highlight
+from app.startup import prepare_schema
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def client():
+    await prepare_schema("create")
+    async with AsyncSessionLocal() as session:
+        user = User(sam_account_name="search-user", display_name="Search User")
+        session.add_all([user, Vendor(name="Quillwort Systems", notes="Annual renewal for the drafting suite")])
+        await session.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def _titles(client: httpx.AsyncClient, q: str) -> list[str]:
+    response = await client.get("/search", params={"q": q, "type": "vendors"})
+    assert response.status_code == 200, response.text
+    return [hit["title"] for hit in response.json()["items"]]
+
+
+@pytest.mark.parametrize(
+    "q, found",
+    [
+        ("quillwort renewal", True),
+        ("quillwort renew", True),  # the last word is still being typed
+        ("quill", True),
+        ("quill renewal", False),  # earlier words are finished, so they match whole
+        ("quillwort renew drafting", False),
+    ],
+)
+async def test_only_the_last_word_is_a_prefix(client, q, found):
+    assert ("Quillwort Systems" in await _titles(client, q)) is found
+
+
+def test_highlight_marks_whole_words_and_the_last_prefix():
+    snippet = highlight("Renewal of the renew plan", ["renew", "pla"])
+    assert snippet == "Renewal of the <mark>renew</mark> <mark>plan</mark>"